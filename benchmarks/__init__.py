@@ -0,0 +1,6 @@
+"""
+性能基准测试 (Benchmarks)
+
+在项目根目录下以模块方式运行，例如：
+    python -m benchmarks.bench_parser --lines 1000000
+"""
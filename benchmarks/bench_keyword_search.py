@@ -0,0 +1,112 @@
+"""
+关键词检索引擎（SQLite）基准
+
+测量KeywordSearchEngine的入库吞吐量（行/秒，逐批提交与bulk_load批量导入对比）
+和时间范围查询延迟，并检查两种入库方式的全文检索结果一致。
+
+用法:
+    python -m benchmarks.bench_keyword_search --lines 1000000 --queries 200
+
+作者: Log Analysis Team
+"""
+
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from loguru import logger
+
+from benchmarks.synthetic import generate_logcat
+from src.data_layer.parsers.logcat_parser import LogcatParser, epoch_ms_to_datetime
+from src.storage_layer.keyword_search import KeywordSearchEngine
+
+
+def bench_insert(engine: KeywordSearchEngine, batches: list, session_id: str, bulk: bool) -> tuple:
+    """入库预先解析好的批次，返回(行数, 耗时)（批量导入包括结束时建立全文索引的时间）"""
+    count = 0
+    start = time.perf_counter()
+    if bulk:
+        with engine.bulk_load(session_id):
+            for batch in batches:
+                count += engine.insert_logs(batch, session_id=session_id)
+    else:
+        for batch in batches:
+            count += engine.insert_logs(batch, session_id=session_id)
+    return count, time.perf_counter() - start
+
+
+def fts_fingerprint(engine: KeywordSearchEngine, session_id: str) -> list:
+    """几个关键词的全文检索命中数（用于比较两种入库方式）"""
+    with engine._using_shard(engine._session_key(session_id)) as shard:
+        return [
+            shard.reader().execute(
+                "SELECT COUNT(*) FROM logs_fts WHERE logs_fts MATCH ?", (keyword,)
+            ).fetchone()[0]
+            for keyword in ('error', 'camera', 'memory', 'bluetooth')
+        ]
+
+
+def bench_time_range(engine: KeywordSearchEngine, session_id: str, queries: int, window_ms: int) -> tuple:
+    """在会话的时间范围内随机查询固定宽度的时间窗口"""
+    with engine._using_shard(engine._session_key(session_id)) as shard:
+        row = shard.reader().execute("SELECT MIN(epoch_ms), MAX(epoch_ms) FROM logs").fetchone()
+    first_ms, last_ms = row[0], row[1]
+    rng = random.Random(0)
+
+    total_rows = 0
+    start = time.perf_counter()
+    for _ in range(queries):
+        begin = rng.randint(first_ms, max(first_ms, last_ms - window_ms))
+        results = engine.get_logs_by_time_range(
+            epoch_ms_to_datetime(begin).isoformat(),
+            epoch_ms_to_datetime(begin + window_ms).isoformat(),
+            session_id=session_id,
+            limit=100
+        )
+        total_rows += len(results)
+    return total_rows, time.perf_counter() - start
+
+
+def main():
+    """运行基准测试"""
+    arg_parser = argparse.ArgumentParser(description="KeywordSearchEngine benchmark")
+    arg_parser.add_argument('--lines', type=int, default=1_000_000, help="合成日志行数")
+    arg_parser.add_argument('--batch-size', type=int, default=10000, help="每次insert_logs的条数")
+    arg_parser.add_argument('--queries', type=int, default=200, help="时间范围查询次数")
+    arg_parser.add_argument('--window-ms', type=int, default=5000, help="时间范围查询的窗口宽度（毫秒）")
+    args = arg_parser.parse_args()
+
+    logger.remove()
+    logger.add(lambda msg: None, level="WARNING")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = str(Path(tmp_dir) / "synthetic_logcat.log")
+        print(f"Generating {args.lines:,} lines -> {path}")
+        generate_logcat(path, args.lines)
+
+        batches = list(LogcatParser().iter_log_batches(path, batch_size=args.batch_size))
+        session_id = "bench"
+
+        fingerprints = []
+        for bulk in (False, True):
+            name = "bulk_load" if bulk else "per-batch"
+            engine = KeywordSearchEngine(db_path=str(Path(tmp_dir) / f"bench_logs_{name}.db"))
+            count, insert_time = bench_insert(engine, batches, session_id, bulk)
+            print(f"insert_logs ({name:>9}): {count:,} rows in {insert_time:.2f}s "
+                  f"({count / insert_time:,.0f} rows/s)")
+            fingerprints.append(fts_fingerprint(engine, session_id))
+            if not bulk:
+                engine.close()
+        assert fingerprints[0] == fingerprints[1], "bulk load produced a different full-text index"
+
+        rows, query_time = bench_time_range(engine, session_id, args.queries, args.window_ms)
+        print(f"time range query: {args.queries} queries in {query_time:.3f}s "
+              f"({query_time / args.queries * 1000:.2f} ms/query, {rows:,} rows returned)")
+
+        engine.close()
+
+
+if __name__ == "__main__":
+    main()
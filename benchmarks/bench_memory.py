@@ -0,0 +1,63 @@
+"""
+日志批次内存占用基准
+
+对比同一批日志以LogEntry列表和列式LogBatch两种形式驻留内存时的占用。
+
+用法:
+    python -m benchmarks.bench_memory --lines 1000000
+
+作者: Log Analysis Team
+"""
+
+import argparse
+import gc
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+from loguru import logger
+
+from benchmarks.synthetic import generate_logcat
+from src.data_layer.log_batch import LogBatch
+from src.data_layer.parsers.logcat_parser import LogcatParser
+
+
+def measure(build) -> tuple:
+    """返回build()结果驻留的内存（字节）和条数"""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    count = len(result)
+    del result
+    return current, count
+
+
+def main():
+    """运行基准测试"""
+    arg_parser = argparse.ArgumentParser(description="LogEntry vs LogBatch memory benchmark")
+    arg_parser.add_argument('--lines', type=int, default=1_000_000, help="合成日志行数")
+    args = arg_parser.parse_args()
+
+    logger.remove()
+    logger.add(lambda msg: None, level="WARNING")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = str(Path(tmp_dir) / "synthetic_logcat.log")
+        print(f"Generating {args.lines:,} lines -> {path}")
+        generate_logcat(path, args.lines)
+
+        entries_bytes, entries_count = measure(lambda: LogcatParser().parse_file(path))
+        print(f"List[LogEntry]: {entries_count:,} entries, {entries_bytes / 1024 / 1024:,.1f} MB")
+
+        batch_bytes, batch_count = measure(
+            lambda: LogBatch.concat(list(LogcatParser().iter_log_batches(path))))
+        print(f"LogBatch      : {batch_count:,} entries, {batch_bytes / 1024 / 1024:,.1f} MB")
+
+        assert entries_count == batch_count, "representations hold a different number of entries"
+        print(f"reduction: {entries_bytes / batch_bytes:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+多源合并性能基准
+
+生成多个合成日志源（模拟AP、MCU、内核日志）：
+1. 内存中的日志列表：对比原来的"拼接后全量排序"与TimeAligner的k路堆归并的耗时，
+   并检查两者的输出顺序一致（每个源加入少量局部乱序，检验重排缓冲区）
+2. 直接从文件合并：对比"全部解析后排序"与边解析边归并的耗时和峰值内存
+
+用法:
+    python -m benchmarks.bench_merge --lines 200000 --sources 3
+
+作者: Log Analysis Team
+"""
+
+import argparse
+import random
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+from loguru import logger
+
+from benchmarks.synthetic import generate_logcat
+from src.data_layer.parsers.logcat_parser import LogcatParser
+from src.data_layer.time_aligner import TimeAligner
+
+
+def shuffle_locally(entries: list, swaps: int, distance: int, seed: int):
+    """随机交换距离不超过distance的日志，模拟源内的轻微乱序"""
+    rng = random.Random(seed)
+    for _ in range(swaps):
+        i = rng.randrange(len(entries) - distance)
+        j = i + rng.randrange(1, distance + 1)
+        entries[i], entries[j] = entries[j], entries[i]
+
+
+def measure(func) -> tuple:
+    """返回(结果, 耗时, 峰值内存字节数)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    """运行基准测试"""
+    arg_parser = argparse.ArgumentParser(description="TimeAligner merge benchmark")
+    arg_parser.add_argument('--lines', type=int, default=200_000, help="每个源的合成日志行数")
+    arg_parser.add_argument('--sources', type=int, default=3, help="日志源个数")
+    arg_parser.add_argument('--reorder-window', type=int, default=TimeAligner.DEFAULT_REORDER_WINDOW,
+                            help="重排缓冲区大小")
+    args = arg_parser.parse_args()
+
+    logger.remove()
+    logger.add(lambda msg: None, level="WARNING")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        paths = {}
+        for source_id in range(args.sources):
+            path = str(Path(tmp_dir) / f"source_{source_id}.log")
+            generate_logcat(path, args.lines, seed=source_id)
+            paths[f"source_{source_id}"] = path
+
+        sources = {}
+        for name, path in paths.items():
+            entries = LogcatParser().parse_file(path)
+            shuffle_locally(entries, len(entries) // 100, 8, len(sources))
+            sources[name] = entries
+        total = sum(len(entries) for entries in sources.values())
+        print(f"{args.sources} sources, {total:,} entries")
+
+        start = time.perf_counter()
+        merged = [entry for entries in sources.values() for entry in entries]
+        merged.sort(key=lambda e: e.datetime_obj if e.datetime_obj else datetime.min)
+        sort_time = time.perf_counter() - start
+        print(f"concat + sort : {sort_time:.2f}s ({total / sort_time:,.0f} lines/s)")
+
+        start = time.perf_counter()
+        heap_merged = TimeAligner().merge_and_sort(sources, reorder_window=args.reorder_window)
+        merge_time = time.perf_counter() - start
+        print(f"k-way merge   : {merge_time:.2f}s ({total / merge_time:,.0f} lines/s)")
+
+        assert list(map(id, heap_merged)) == list(map(id, merged)), "k-way merge produced a different order"
+        print(f"speedup: {sort_time / merge_time:.2f}x")
+        del sources, merged, heap_merged
+
+        def parse_and_sort():
+            entries = [entry for path in paths.values() for entry in LogcatParser().parse_file(path)]
+            entries.sort(key=lambda e: e.datetime_obj if e.datetime_obj else datetime.min)
+            return len(entries)
+
+        def stream_merge():
+            streams = {name: LogcatParser().iter_entries(path) for name, path in paths.items()}
+            return sum(1 for _ in TimeAligner().iter_merged(streams, reorder_window=args.reorder_window))
+
+        print("\nfrom files (parse + merge):")
+        count, sort_time, sort_peak = measure(parse_and_sort)
+        print(f"parse all + sort : {sort_time:.2f}s, peak {sort_peak / 1024 ** 2:,.1f} MiB")
+        stream_count, merge_time, merge_peak = measure(stream_merge)
+        print(f"streaming merge  : {merge_time:.2f}s, peak {merge_peak / 1024 ** 2:,.1f} MiB")
+        assert stream_count == count
+
+
+if __name__ == "__main__":
+    main()
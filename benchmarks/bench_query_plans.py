@@ -0,0 +1,211 @@
+"""
+KeywordSearchEngine查询计划回归检查和延迟基准
+
+构造多会话数据库（默认10个会话 x 100万行 = 1000万行，每个会话一个分片），对每种会话内查询：
+1. 通过分片连接的trace回调截获KeywordSearchEngine实际执行的SQL，
+   检查EXPLAIN QUERY PLAN使用了预期的索引，且没有全表扫描
+2. 随机参数重复查询，统计延迟；随后删除各分片的(level, epoch_ms)和line_number索引再测一次作为对照
+
+用法:
+    python -m benchmarks.bench_query_plans --sessions 10 --lines 1000000 --queries 200
+
+作者: Log Analysis Team
+"""
+
+import argparse
+import random
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+from loguru import logger
+
+from benchmarks.synthetic import generate_logcat
+from src.data_layer.parsers.logcat_parser import LogcatParser
+from src.data_layer.preprocessor import LogPreprocessor
+from src.storage_layer.keyword_search import KeywordSearchEngine
+
+# 对照组中删除的索引
+NEW_INDEXES = ('idx_level_epoch', 'idx_line')
+
+
+def build_database(engine: KeywordSearchEngine, path: str, sessions: int, batch_size: int):
+    """预处理一次合成日志，按会话重复批量导入"""
+    preprocessor = LogPreprocessor()
+    batches = list(preprocessor.process_stream(LogcatParser().iter_log_batches(path, batch_size=batch_size)))
+    for session in range(sessions):
+        start = time.perf_counter()
+        with engine.bulk_load(f"session_{session}"):
+            for batch in batches:
+                engine.insert_logs(batch, session_id=f"session_{session}")
+        print(f"  session_{session}: {sum(len(b) for b in batches):,} rows in {time.perf_counter() - start:.1f}s")
+
+
+def make_cases(engine: KeywordSearchEngine, sessions: int, seed: int) -> Dict[str, Callable[[], object]]:
+    """查询用例: {名称: 随机参数执行一次查询的函数}"""
+    rng = random.Random(seed)
+    bounds = {}
+    tags = set()
+    for session in range(sessions):
+        session_id = f"session_{session}"
+        with engine._using_shard(engine._session_key(session_id)) as shard:
+            conn = shard.reader()
+            row = conn.execute("SELECT MIN(epoch_ms), MAX(epoch_ms), MIN(id), MAX(id) FROM logs").fetchone()
+            bounds[session_id] = tuple(row)
+            tags.update(row[0] for row in conn.execute("SELECT tag FROM tags"))
+    tags = sorted(tags)
+
+    def random_window(window_ms: int = 60000):
+        session_id = rng.choice(list(bounds))
+        first_ms, last_ms = bounds[session_id][:2]
+        begin = rng.randint(first_ms, max(first_ms, last_ms - window_ms))
+        return session_id, begin, begin + window_ms
+
+    def time_range():
+        session_id, begin, end = random_window()
+        return engine.get_logs_by_time_range(begin, end, session_id=session_id, limit=100)
+
+    def time_range_level():
+        session_id, begin, end = random_window()
+        return engine.get_logs_by_time_range(begin, end, level='E', session_id=session_id, limit=100)
+
+    def context():
+        first_id, last_id = bounds[rng.choice(list(bounds))][2:]
+        return engine.get_context(rng.randint(first_id, last_id), window_size=50)
+
+    def category():
+        return engine.filter_by_category(0b111, session_id=rng.choice(list(bounds)), limit=100)
+
+    def tag():
+        # Tag的一段子串，模拟模糊匹配
+        name = rng.choice(tags)
+        start = rng.randrange(max(1, len(name) - 3))
+        return engine.filter_by_tag(name[start:start + 4], session_id=rng.choice(list(bounds)), limit=100)
+
+    def top_templates():
+        return engine.get_top_templates(session_id=rng.choice(list(bounds)), limit=10)
+
+    return {
+        'time_range': time_range,
+        'time_range_level': time_range_level,
+        'context': context,
+        'category': category,
+        'tag': tag,
+        'top_templates': top_templates,
+    }
+
+
+# 每个用例必须使用的索引
+EXPECTED_INDEXES = {
+    'time_range': 'idx_epoch_ms',
+    'time_range_level': 'idx_level_epoch',
+    'context': 'idx_line',
+    'category': 'idx_incident',
+    'tag': 'idx_tag_epoch',
+    'top_templates': 'idx_level_template',
+}
+
+# 只包含部分行的索引：按时间顺序扫描整个索引也不是全表扫描
+PARTIAL_INDEXES = ('idx_incident',)
+
+
+def query_plans(engine: KeywordSearchEngine, case: Callable[[], object]) -> List[str]:
+    """执行一次用例，返回其中访问logs表的SQL的查询计划（每步一行）"""
+    # 单个会话的查询在当前线程中执行，使用当前线程的分片读连接
+    statements: List[Tuple[sqlite3.Connection, str]] = []
+    conns = [shard.reader() for shard in list(engine._shards.values())]
+    for conn in conns:
+        conn.set_trace_callback(lambda sql, conn=conn: statements.append((conn, sql)))
+    try:
+        case()
+    finally:
+        for conn in conns:
+            conn.set_trace_callback(None)
+
+    plans = []
+    for conn, sql in statements:
+        if sql.lstrip().upper().startswith('SELECT') and ' logs' in sql:
+            plans.extend(row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}"))
+    return plans
+
+
+def check_plans(engine: KeywordSearchEngine, cases: Dict[str, Callable[[], object]]) -> bool:
+    """检查每个用例的查询计划，返回是否全部通过"""
+    ok = True
+    for name, case in cases.items():
+        plans = query_plans(engine, case)
+        uses_index = any(EXPECTED_INDEXES[name] in step for step in plans)
+        full_scan = [step for step in plans if (step.startswith('SCAN logs') or step.startswith('SCAN l '))
+                     and not any(index in step for index in PARTIAL_INDEXES)]
+        passed = uses_index and not full_scan
+        ok &= passed
+        print(f"  {'PASS' if passed else 'FAIL'} {name:<17} expects {EXPECTED_INDEXES[name]}")
+        if not passed:
+            for step in plans:
+                print(f"       {step}")
+    return ok
+
+
+def measure(cases: Dict[str, Callable[[], object]], queries: int) -> Dict[str, float]:
+    """每个用例执行queries次，返回平均延迟（毫秒）"""
+    latencies = {}
+    for name, case in cases.items():
+        start = time.perf_counter()
+        for _ in range(queries):
+            case()
+        latencies[name] = (time.perf_counter() - start) / queries * 1000
+    return latencies
+
+
+def main():
+    """运行基准测试"""
+    arg_parser = argparse.ArgumentParser(description="KeywordSearchEngine query plan benchmark")
+    arg_parser.add_argument('--sessions', type=int, default=10, help="会话数")
+    arg_parser.add_argument('--lines', type=int, default=1_000_000, help="每个会话的合成日志行数")
+    arg_parser.add_argument('--batch-size', type=int, default=10000, help="批大小")
+    arg_parser.add_argument('--queries', type=int, default=200, help="每种查询的执行次数")
+    args = arg_parser.parse_args()
+
+    logger.remove()
+    logger.add(lambda msg: None, level="WARNING")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = str(Path(tmp_dir) / "synthetic_logcat.log")
+        print(f"Generating {args.lines:,} lines -> {path}")
+        generate_logcat(path, args.lines)
+
+        engine = KeywordSearchEngine(db_path=str(Path(tmp_dir) / "bench_plans.db"))
+        # 所有分片保持打开，trace回调设置在已打开分片的读连接上
+        engine.MAX_OPEN_SHARDS = max(engine.MAX_OPEN_SHARDS, args.sessions)
+        print(f"Loading {args.sessions} sessions")
+        build_database(engine, path, args.sessions, args.batch_size)
+
+        cases = make_cases(engine, args.sessions, seed=0)
+        print("Query plans:")
+        plans_ok = check_plans(engine, cases)
+
+        after = measure(make_cases(engine, args.sessions, seed=1), args.queries)
+
+        # 对照组：删除各分片的复合索引和行号索引
+        def drop_indexes(conn):
+            for index in NEW_INDEXES:
+                conn.execute(f"DROP INDEX {index}")
+            conn.commit()
+
+        for session in range(args.sessions):
+            with engine._using_shard(engine._session_key(f"session_{session}")) as shard:
+                shard.write(drop_indexes)
+        before = measure(make_cases(engine, args.sessions, seed=1), args.queries)
+
+        print(f"\n{'query':<17} {'dropped (ms)':>12} {'indexed (ms)':>15} {'speedup':>8}")
+        for name in cases:
+            print(f"{name:<17} {before[name]:>12.2f} {after[name]:>15.2f} {before[name] / after[name]:>7.1f}x")
+
+        engine.close()
+        assert plans_ok, "query plan regression: expected index not used"
+
+
+if __name__ == "__main__":
+    main()
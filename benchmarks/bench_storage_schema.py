@@ -0,0 +1,248 @@
+"""
+日志存储格式基准：旧格式（逐行存储文本字段和原始行） vs 紧凑格式
+
+1. 同一批合成日志分别写入旧格式数据库和KeywordSearchEngine的紧凑格式数据库，比较文件大小
+2. 复制旧格式数据库并用KeywordSearchEngine打开，测量迁移耗时和迁移后的大小
+3. 比较两种格式下的常用查询延迟（旧格式执行旧版本的SQL，紧凑格式调用KeywordSearchEngine）
+
+用法:
+    python -m benchmarks.bench_storage_schema --lines 1000000 --queries 200
+
+作者: Log Analysis Team
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from loguru import logger
+
+from benchmarks.synthetic import generate_logcat
+from src.data_layer.log_batch import LogBatch
+from src.data_layer.parsers.logcat_parser import NO_EPOCH, LogcatParser, epoch_ms_to_datetime
+from src.data_layer.preprocessor import LogPreprocessor
+from src.storage_layer.keyword_search import KeywordSearchEngine
+
+# 旧格式的表、索引和FTS（与紧凑格式之前的KeywordSearchEngine相同）
+LEGACY_SCHEMA = """
+    CREATE TABLE logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp TEXT NOT NULL,
+        epoch_ms INTEGER,
+        pid INTEGER,
+        tid INTEGER,
+        level TEXT,
+        tag TEXT,
+        message TEXT,
+        raw_line TEXT,
+        line_number INTEGER,
+        session_id TEXT,
+        category INTEGER NOT NULL DEFAULT 0,
+        template_id INTEGER NOT NULL DEFAULT 0,
+        repeat_count INTEGER NOT NULL DEFAULT 1,
+        last_epoch_ms INTEGER,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE INDEX idx_epoch_ms ON logs(epoch_ms);
+    CREATE INDEX idx_session_epoch ON logs(session_id, epoch_ms);
+    CREATE INDEX idx_session_incident ON logs(session_id, epoch_ms) WHERE category != 0;
+    CREATE INDEX idx_session_level_template ON logs(session_id, level, template_id);
+    CREATE INDEX idx_session_level_epoch ON logs(session_id, level, epoch_ms);
+    CREATE INDEX idx_session_line ON logs(session_id, line_number);
+    CREATE INDEX idx_level ON logs(level);
+    CREATE INDEX idx_tag ON logs(tag);
+    CREATE VIRTUAL TABLE logs_fts USING fts5(tag, message, content='logs', content_rowid='id');
+"""
+
+
+def build_legacy(path: str, batches: List[LogBatch], session_id: str):
+    """按旧格式写入日志并建立全文索引"""
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.executescript(LEGACY_SCHEMA)
+    for batch in batches:
+        conn.executemany("""
+            INSERT INTO logs (timestamp, epoch_ms, pid, tid, level, tag, message, raw_line, line_number,
+                              session_id, category, template_id, repeat_count, last_epoch_ms)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, [
+            (timestamp, epoch_ms if epoch_ms != NO_EPOCH else None, pid, tid, level, tag, message,
+             batch.logcat_line_at(i), line_number, session_id, category, template_id, repeat_count,
+             last_epoch_ms if last_epoch_ms != NO_EPOCH else None)
+            for i, (timestamp, epoch_ms, pid, tid, level, tag, message, line_number,
+                    category, template_id, repeat_count, last_epoch_ms) in enumerate(batch.iter_rows())
+        ])
+    conn.execute("INSERT INTO logs_fts(logs_fts) VALUES('rebuild')")
+    conn.commit()
+    conn.close()
+
+
+def build_compact(path: str, batches: List[LogBatch], session_id: str):
+    """用KeywordSearchEngine（紧凑格式）写入日志"""
+    engine = KeywordSearchEngine(db_path=path)
+    with engine.bulk_load(session_id):
+        for batch in batches:
+            engine.insert_logs(batch, session_id=session_id)
+    engine.close()
+
+
+def file_size(path: str) -> int:
+    """数据库文件大小（连接关闭后WAL已合并），包括KeywordSearchEngine的会话分片文件"""
+    shard_dir = Path(path).parent / f"{Path(path).stem}_sessions"
+    databases = [path, *(str(p) for p in shard_dir.glob("*.db"))]
+    return sum(os.path.getsize(p) for db in databases for p in (db, db + "-wal") if os.path.exists(p))
+
+
+def legacy_cases(conn: sqlite3.Connection, session_id: str, rng: random.Random) -> Dict[str, Callable[[], object]]:
+    """旧格式上的查询用例（旧版本的SQL，结果同样转换为带ISO时间的字典）"""
+    conn.row_factory = sqlite3.Row
+    first_ms, last_ms, max_id = conn.execute(
+        "SELECT MIN(epoch_ms), MAX(epoch_ms), MAX(id) FROM logs WHERE session_id = ?", (session_id,)
+    ).fetchone()
+
+    def to_dicts(rows) -> List[Dict]:
+        logs = []
+        for row in rows:
+            log = dict(row)
+            log['datetime'] = epoch_ms_to_datetime(log['epoch_ms']).isoformat()
+            logs.append(log)
+        return logs
+
+    def window():
+        begin = rng.randint(first_ms, max(first_ms, last_ms - 60000))
+        return begin, begin + 60000
+
+    def time_range():
+        return to_dicts(conn.execute(
+            "SELECT * FROM logs WHERE epoch_ms >= ? AND epoch_ms <= ? AND session_id = ? "
+            "ORDER BY epoch_ms LIMIT 100", (*window(), session_id)))
+
+    def time_range_level():
+        return to_dicts(conn.execute(
+            "SELECT * FROM logs WHERE epoch_ms >= ? AND epoch_ms <= ? AND level = 'E' AND session_id = ? "
+            "ORDER BY epoch_ms LIMIT 100", (*window(), session_id)))
+
+    def context():
+        row = conn.execute("SELECT line_number, session_id FROM logs WHERE id = ?", (rng.randint(1, max_id),)).fetchone()
+        return to_dicts(conn.execute(
+            "SELECT * FROM logs WHERE session_id = ? AND line_number >= ? AND line_number <= ? ORDER BY line_number",
+            (row['session_id'], row['line_number'] - 50, row['line_number'] + 50)))
+
+    def keyword():
+        return to_dicts(conn.execute(
+            "SELECT l.* FROM logs l JOIN logs_fts fts ON l.id = fts.rowid "
+            "WHERE fts.logs_fts MATCH ? AND l.session_id = ? ORDER BY l.epoch_ms LIMIT 50",
+            (rng.choice(['camera', 'error', 'bluetooth']), session_id)))
+
+    def statistics():
+        return (conn.execute("SELECT COUNT(*) FROM logs WHERE session_id = ?", (session_id,)).fetchone(),
+                conn.execute("SELECT level, COUNT(*) FROM logs WHERE session_id = ? GROUP BY level",
+                             (session_id,)).fetchall(),
+                conn.execute("SELECT tag, COUNT(*) AS count FROM logs WHERE session_id = ? GROUP BY tag "
+                             "ORDER BY count DESC LIMIT 10", (session_id,)).fetchall(),
+                conn.execute("SELECT MIN(epoch_ms), MAX(epoch_ms) FROM logs WHERE session_id = ?",
+                             (session_id,)).fetchone())
+
+    return {'time_range': time_range, 'time_range_level': time_range_level, 'context': context,
+            'keyword': keyword, 'statistics': statistics}
+
+
+def compact_cases(engine: KeywordSearchEngine, session_id: str, rng: random.Random) -> Dict[str, Callable[[], object]]:
+    """紧凑格式上的同一组查询（KeywordSearchEngine的接口）"""
+    with engine._using_shard(engine._session_key(session_id)) as shard:
+        first_ms, last_ms, first_id, max_id = shard.reader().execute(
+            "SELECT MIN(epoch_ms), MAX(epoch_ms), MIN(id), MAX(id) FROM logs"
+        ).fetchone()
+
+    def window():
+        begin = rng.randint(first_ms, max(first_ms, last_ms - 60000))
+        return begin, begin + 60000
+
+    return {
+        'time_range': lambda: engine.get_logs_by_time_range(*window(), session_id=session_id, limit=100),
+        'time_range_level': lambda: engine.get_logs_by_time_range(*window(), level='E', session_id=session_id,
+                                                                   limit=100),
+        'context': lambda: engine.get_context(rng.randint(first_id, max_id), window_size=50),
+        'keyword': lambda: engine.search_keywords(rng.choice(['camera', 'error', 'bluetooth']),
+                                                  session_id=session_id, limit=50),
+        'statistics': lambda: engine.get_statistics(session_id=session_id),
+    }
+
+
+def measure(cases: Dict[str, Callable[[], object]], queries: int) -> Dict[str, float]:
+    """每个用例执行queries次，返回平均延迟（毫秒）"""
+    latencies = {}
+    for name, case in cases.items():
+        start = time.perf_counter()
+        for _ in range(queries):
+            case()
+        latencies[name] = (time.perf_counter() - start) / queries * 1000
+    return latencies
+
+
+def main():
+    """运行基准测试"""
+    arg_parser = argparse.ArgumentParser(description="Log storage schema benchmark")
+    arg_parser.add_argument('--lines', type=int, default=1_000_000, help="合成日志行数")
+    arg_parser.add_argument('--batch-size', type=int, default=10000, help="批大小")
+    arg_parser.add_argument('--queries', type=int, default=200, help="每种查询的执行次数")
+    args = arg_parser.parse_args()
+
+    logger.remove()
+    logger.add(lambda msg: None, level="WARNING")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = str(Path(tmp_dir) / "synthetic_logcat.log")
+        print(f"Generating {args.lines:,} lines -> {path}")
+        generate_logcat(path, args.lines)
+        source_size = os.path.getsize(path)
+
+        preprocessor = LogPreprocessor()
+        batches = list(preprocessor.process_stream(LogcatParser().iter_log_batches(path, batch_size=args.batch_size)))
+        rows = sum(len(batch) for batch in batches)
+        session_id = "bench"
+
+        legacy_path = str(Path(tmp_dir) / "legacy.db")
+        compact_path = str(Path(tmp_dir) / "compact.db")
+        migrated_path = str(Path(tmp_dir) / "migrated.db")
+
+        start = time.perf_counter()
+        build_legacy(legacy_path, batches, session_id)
+        legacy_time = time.perf_counter() - start
+        start = time.perf_counter()
+        build_compact(compact_path, batches, session_id)
+        compact_time = time.perf_counter() - start
+
+        shutil.copy(legacy_path, migrated_path)
+        start = time.perf_counter()
+        KeywordSearchEngine(db_path=migrated_path).close()
+        migrate_time = time.perf_counter() - start
+
+        print(f"\nsource file: {source_size / 2**20:,.1f} MiB, {rows:,} rows")
+        print(f"{'schema':<10} {'size (MiB)':>11} {'bytes/row':>10} {'x source':>9} {'build (s)':>10}")
+        for name, db_path, seconds in (("legacy", legacy_path, legacy_time),
+                                       ("compact", compact_path, compact_time),
+                                       ("migrated", migrated_path, migrate_time)):
+            size = file_size(db_path)
+            print(f"{name:<10} {size / 2**20:>11.1f} {size / rows:>10.0f} {size / source_size:>9.2f} {seconds:>10.1f}")
+
+        legacy_conn = sqlite3.connect(legacy_path)
+        before = measure(legacy_cases(legacy_conn, session_id, random.Random(0)), args.queries)
+        legacy_conn.close()
+        engine = KeywordSearchEngine(db_path=compact_path)
+        after = measure(compact_cases(engine, session_id, random.Random(0)), args.queries)
+        engine.close()
+
+        print(f"\n{'query':<17} {'legacy (ms)':>12} {'compact (ms)':>13}")
+        for name in before:
+            print(f"{name:<17} {before[name]:>12.2f} {after[name]:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+行解析（tokenizer）性能基准
+
+对比threadtime免正则快速路径与LOGCAT_PATTERN正则路径的单行解析吞吐量。
+日志行预先读入内存，排除磁盘IO的影响。
+
+用法:
+    python -m benchmarks.bench_tokenizer --lines 2000000
+
+作者: Log Analysis Team
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from loguru import logger
+
+from benchmarks.synthetic import generate_logcat
+from src.data_layer.parsers.logcat_parser import LogcatParser
+
+
+def bench(lines: list, use_fast_path: bool) -> tuple:
+    """逐行调用parse_line"""
+    parser = LogcatParser(use_fast_path=use_fast_path)
+    parse_line = parser.parse_line
+    start = time.perf_counter()
+    for line_number, line in enumerate(lines, start=1):
+        parse_line(line, line_number)
+    return parser.parsed_count, time.perf_counter() - start
+
+
+def main():
+    """运行基准测试"""
+    arg_parser = argparse.ArgumentParser(description="LogcatParser tokenizer benchmark")
+    arg_parser.add_argument('--lines', type=int, default=2_000_000, help="合成日志行数")
+    args = arg_parser.parse_args()
+
+    logger.remove()
+    logger.add(lambda msg: None, level="WARNING")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = str(Path(tmp_dir) / "synthetic_logcat.log")
+        print(f"Generating {args.lines:,} lines -> {path}")
+        generate_logcat(path, args.lines)
+        with open(path, 'r', encoding='utf-8') as f:
+            lines = f.readlines()
+
+    regex_count, regex_time = bench(lines, use_fast_path=False)
+    print(f"regex     : {regex_count:,} entries in {regex_time:.2f}s ({regex_count / regex_time:,.0f} lines/s)")
+
+    fast_count, fast_time = bench(lines, use_fast_path=True)
+    print(f"fast path : {fast_count:,} entries in {fast_time:.2f}s ({fast_count / fast_time:,.0f} lines/s)")
+
+    assert regex_count == fast_count, "fast path and regex parsed a different number of entries"
+    print(f"speedup: {regex_time / fast_time:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
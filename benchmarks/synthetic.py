@@ -0,0 +1,72 @@
+"""
+合成日志生成器
+
+以 tests/sample_logs 中的样本日志为模板，按递增时间戳放大生成任意行数的
+Logcat日志，供各个基准测试使用。
+
+作者: Log Analysis Team
+"""
+
+import random
+from pathlib import Path
+from typing import List
+
+from src.data_layer.parsers.logcat_parser import LogcatParser
+
+SAMPLE_PATH = Path(__file__).parent.parent / "tests" / "sample_logs" / "android_logcat_sample.log"
+
+
+def load_templates() -> List[tuple]:
+    """读取样本日志，提取(level, tag, message)模板
+
+    Returns:
+        模板列表
+    """
+    templates = []
+    with open(SAMPLE_PATH, 'r', encoding='utf-8') as f:
+        for line in f:
+            match = LogcatParser.LOGCAT_PATTERN.match(line.strip())
+            if match:
+                templates.append((match.group('level'), match.group('tag').strip(), match.group('message')))
+    return templates
+
+
+def generate_logcat(path: str, num_lines: int, seed: int = 42, lines_per_second: int = 500) -> str:
+    """生成合成Logcat日志文件
+
+    Args:
+        path: 输出文件路径
+        num_lines: 行数
+        seed: 随机种子
+        lines_per_second: 平均每秒日志行数
+
+    Returns:
+        输出文件路径
+    """
+    rng = random.Random(seed)
+    templates = load_templates()
+    pids = [rng.randint(100, 30000) for _ in range(64)]
+    step_ms = max(1, 1000 // lines_per_second)
+
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    epoch_ms = 0
+    buffer = []
+    with open(path, 'w', encoding='utf-8') as f:
+        for i in range(num_lines):
+            epoch_ms += rng.randint(0, step_ms * 2)
+            seconds, ms = divmod(epoch_ms, 1000)
+            minutes, sec = divmod(seconds, 60)
+            hours, minute = divmod(minutes, 60)
+            day, hour = divmod(hours, 24)
+            level, tag, message = templates[rng.randrange(len(templates))]
+            pid = pids[rng.randrange(len(pids))]
+            buffer.append(
+                f"11-{(1 + day) % 28 + 1:02d} {hour:02d}:{minute:02d}:{sec:02d}.{ms:03d} "
+                f"{pid:5d} {pid + rng.randint(0, 40):5d} {level} {tag}: {message}\n"
+            )
+            if len(buffer) >= 10000:
+                f.writelines(buffer)
+                buffer = []
+        f.writelines(buffer)
+
+    return path
@@ -7,8 +7,10 @@ Agent编排器
 """
 
 import os
+import threading
+from contextlib import nullcontext
 import yaml
-from typing import List, Dict, Optional
+from typing import BinaryIO, List, Dict, Optional, Union
 from pathlib import Path
 from loguru import logger
 
@@ -18,6 +20,7 @@ from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
 
 from src.agent_layer.tools.log_tools import ALL_TOOLS, init_tools
+from src.data_layer.incident_classifier import IncidentClassifier
 from src.storage_layer.keyword_search import KeywordSearchEngine
 from src.storage_layer.vector_search import VectorSearchEngine
 
@@ -52,6 +55,10 @@ class LogAnalysisAgent:
         # 当前会话ID（用于查询时过滤）
         self.current_session_id = None
 
+        # 事件分类器（预处理时写入category列，工具按类别名查询时换算为位掩码）
+        self.incident_keywords = self.config.get('parser', {}).get('incident_keywords')
+        self.incident_classifier = IncidentClassifier(self.incident_keywords)
+
         # 初始化工具
         init_tools(self.keyword_engine, self.vector_engine, self)
 
@@ -207,75 +214,85 @@ class LogAnalysisAgent:
 
     def load_logs(
         self,
-        log_file_path: str,
+        log_file_path: Union[str, BinaryIO],
         session_id: str = "default"
     ) -> Dict:
         """加载日志文件
 
         Args:
-            log_file_path: 日志文件路径
+            log_file_path: 日志文件路径或二进制文件对象（如上传的文件），
+                           支持gzip/bz2/xz/zip压缩格式，边解压边解析
             session_id: 会话ID
 
         Returns:
             加载结果字典
         """
+        from src.data_layer.content_hash import hash_log_source, ingest_cache_key
         from src.data_layer.parsers.logcat_parser import LogcatParser
-        from src.data_layer.preprocessor import LogPreprocessor
-
+        from src.data_layer.parsers.mmap_parser import MmapLogcatParser
         try:
             logger.info(f"Loading log file: {log_file_path}")
+            parser_config = self.config.get('parser', {})
+
+            # 入库缓存：相同内容的日志已按相同配置入库过时，新会话直接指向已有的数据和向量
+            cache_key = None
+            if parser_config.get('ingest_cache', True):
+                cache_key = ingest_cache_key(hash_log_source(log_file_path), {
+                    **self._preprocessor_settings(),
+                    'schema_version': KeywordSearchEngine.SCHEMA_VERSION,
+                })
+                cached_session = self.keyword_engine.find_ingest(cache_key)
+                if cached_session:
+                    return self._reuse_ingest(cached_session, session_id)
+
+            # 每批处理的最大行数（流式处理，内存占用与文件大小无关）
+            batch_size = parser_config.get('max_lines_per_batch', 10000)
+            parse_workers = parser_config.get('parse_workers', 1)
+            preprocess_workers = parser_config.get('preprocess_workers', 1)
+
+            if parser_config.get('backend', 'text') == 'mmap':
+                parser = MmapLogcatParser()
+            else:
+                parser = LogcatParser()
 
-            # 解析日志
-            parser = LogcatParser()
-            entries = parser.parse_file(log_file_path)
-
-            if not entries:
+            # 预处理（保留所有INFO及以上级别）
+            preprocessor = self._create_preprocessor()
+
+            # 解析 -> 预处理 -> 入库，逐批流水线执行
+            total_logs = 0
+            vector_logs = 0
+            batches = preprocessor.process_stream(
+                parser.iter_log_batches(log_file_path, batch_size=batch_size,
+                                        workers=parse_workers),
+                workers=preprocess_workers)
+
+            # 批量导入：整个文件入库结束后再一次性建立全文索引
+            bulk_load = self.config.get('storage', {}).get('bulk_load', True)
+            with self.keyword_engine.bulk_load(session_id) if bulk_load else nullcontext():
+                for processed_entries in batches:
+                    total_logs += len(processed_entries)
+                    vector_logs += self._index_batch(processed_entries, session_id, preprocessor)
+
+            if parser.parsed_count == 0:
                 return {
                     'success': False,
                     'message': '未能解析到有效的日志条目'
                 }
 
-            logger.info(f"Parsed {len(entries)} log entries")
-
-            # 预处理（保留所有INFO及以上级别）
-            preprocessor = LogPreprocessor(
-                enable_deduplication=True,
-                enable_pii_masking=True,
-                min_log_level='I'
-            )
-            processed_entries = preprocessor.process(entries)
-
-            logger.info(f"Preprocessed to {len(processed_entries)} entries")
-
-            # 存入关键词搜索引擎（索引所有日志，关键词搜索很快）
-            self.keyword_engine.insert_logs(
-                processed_entries, session_id=session_id)
-
-            # 向量数据库性能优化：只索引ERROR和WARN级别日志
-            # 原因：
-            # 1. 语义搜索主要用于分析问题和错误
-            # 2. INFO/DEBUG日志通过关键词搜索已足够
-            # 3. 可大幅提升写入速度（减少80%数据量）
-            important_entries = [
-                entry for entry in processed_entries
-                if entry.level in ['W', 'E', 'F']  # WARN, ERROR, FATAL
-            ]
-
-            logger.info(
-                f"Indexing {len(important_entries)} important logs (W/E/F) to vector database...")
+            logger.info(f"Parsed {parser.parsed_count} log entries")
+            logger.info(f"Preprocessed to {total_logs} entries")
 
-            if important_entries:
-                self.vector_engine.insert_logs(
-                    important_entries, session_id=session_id)
-            else:
+            if vector_logs == 0:
                 logger.warning(
                     "No ERROR/WARN logs found, skipping vector indexing")
 
             # 统计信息
-            total_logs = len(processed_entries)
-            vector_logs = len(important_entries)
-            logger.info(
-                f"📊 存储统计: 关键词索引={total_logs}, 向量索引={vector_logs} ({vector_logs/total_logs*100:.1f}%)")
+            if total_logs:
+                logger.info(
+                    f"📊 存储统计: 关键词索引={total_logs}, 向量索引={vector_logs} ({vector_logs/total_logs*100:.1f}%)")
+
+            if cache_key:
+                self.keyword_engine.record_ingest(cache_key, session_id, total_logs)
 
             # 获取统计信息
             stats = self.keyword_engine.get_statistics(session_id=session_id)
@@ -286,7 +303,7 @@ class LogAnalysisAgent:
 
             return {
                 'success': True,
-                'message': f'成功加载 {len(processed_entries)} 条日志',
+                'message': f'成功加载 {total_logs} 条日志',
                 'statistics': stats
             }
 
@@ -298,6 +315,156 @@ class LogAnalysisAgent:
                 'error': str(e)
             }
 
+    def _reuse_ingest(self, cached_session: str, session_id: str) -> Dict:
+        """复用已入库的相同内容：新会话作为别名指向已有会话，不再解析和索引
+
+        Args:
+            cached_session: 已入库该内容的会话ID
+            session_id: 新会话ID
+
+        Returns:
+            加载结果字典
+        """
+        self.keyword_engine.alias_session(session_id, cached_session)
+        stats = self.keyword_engine.get_statistics(session_id=session_id)
+
+        self.current_session_id = session_id
+        logger.info(f"✅ Reused ingest of session {cached_session}, current session set to: {session_id}")
+
+        return {
+            'success': True,
+            'message': f'日志内容已加载过，复用已有的解析和索引结果（{stats["total_count"]} 条日志）',
+            'statistics': stats,
+            'reused_session_id': cached_session
+        }
+
+    def _preprocessor_settings(self) -> Dict:
+        """影响预处理结果的配置（级别过滤、去重、脱敏、事件分类、模板挖掘），也是入库缓存键的一部分"""
+        parser_config = self.config.get('parser', {})
+        dedup_config = parser_config.get('dedup', {})
+        return {
+            'enable_deduplication': parser_config.get('enable_deduplication', True),
+            'enable_pii_masking': True,
+            'min_log_level': 'I',
+            'incident_keywords': self.incident_keywords,
+            'template_mining': dict(parser_config.get('template_mining', {})),
+            'dedup_mode': dedup_config.get('mode', 'consecutive'),
+            'dedup_window_lines': dedup_config.get('window_lines', 1000),
+            'dedup_window_ms': dedup_config.get('window_ms', 10000),
+        }
+
+    def _create_preprocessor(self):
+        """按配置创建预处理器（保留所有INFO及以上级别）"""
+        from src.data_layer.preprocessor import LogPreprocessor
+        from src.data_layer.template_miner import TemplateMiner
+
+        settings = self._preprocessor_settings()
+        mining_config = settings.pop('template_mining')
+        enable_template_mining = mining_config.pop('enabled', True)
+
+        return LogPreprocessor(
+            **settings,
+            enable_template_mining=enable_template_mining,
+            template_miner=TemplateMiner(**mining_config) if enable_template_mining else None,
+            message_cache_size=self.config.get('parser', {}).get('message_cache_size', 100000)
+        )
+
+    def _index_batch(self, processed_entries, session_id: str, preprocessor) -> int:
+        """将一批预处理后的日志写入关键词索引和向量索引
+
+        Args:
+            processed_entries: 预处理后的LogBatch
+            session_id: 会话ID
+            preprocessor: 产生该批次的预处理器（用于保存新增或变化的模板）
+
+        Returns:
+            写入向量数据库的条数
+        """
+        # 存入关键词搜索引擎（索引所有日志，关键词搜索很快）
+        self.keyword_engine.insert_logs(
+            processed_entries, session_id=session_id)
+        if preprocessor.template_miner is not None:
+            self.keyword_engine.save_templates(
+                session_id, preprocessor.template_miner.pop_changed())
+
+        # 向量数据库性能优化：只索引ERROR和WARN级别日志
+        # 原因：
+        # 1. 语义搜索主要用于分析问题和错误
+        # 2. INFO/DEBUG日志通过关键词搜索已足够
+        # 3. 可大幅提升写入速度（减少80%数据量）
+        important_entries = processed_entries.select_levels('WEF')  # WARN, ERROR, FATAL
+
+        if important_entries:
+            logger.info(
+                f"Indexing {len(important_entries)} important logs (W/E/F) to vector database...")
+            self.vector_engine.insert_logs(
+                important_entries, session_id=session_id)
+
+        return len(important_entries)
+
+    def follow_logs(
+        self,
+        source: Union[str, BinaryIO],
+        session_id: str = "default",
+        stop_event: Optional[threading.Event] = None
+    ) -> Dict:
+        """实时跟随日志文件或输入流，增量写入同一会话
+
+        新追加的日志按微批次解析、预处理并入库，Agent工具在约1秒内即可查询到，
+        无需重新加载整个文件。调用会一直阻塞到stop_event被设置（或输入流结束），
+        通常在后台线程中运行。
+
+        Args:
+            source: 持续增长的日志文件路径，或二进制输入流（'-'表示标准输入）
+            session_id: 会话ID
+            stop_event: 停止信号
+
+        Returns:
+            跟随结束时的结果字典
+        """
+        from src.data_layer.parsers.log_follower import LogFollower
+
+        follow_config = self.config.get('parser', {}).get('follow', {})
+        checkpoint_dir = follow_config.get('checkpoint_dir')
+        follower = LogFollower(
+            source,
+            batch_size=follow_config.get('batch_size', 1000),
+            flush_interval=follow_config.get('flush_interval', 0.5),
+            poll_interval=follow_config.get('poll_interval', 0.2),
+            checkpoint_path=str(Path(checkpoint_dir) / f"{session_id}.json") if checkpoint_dir else None
+        )
+        preprocessor = self._create_preprocessor()
+
+        # 跟随开始即切换到该会话，后续查询可以看到陆续写入的日志
+        self.current_session_id = session_id
+        logger.info(f"Following logs into session: {session_id}")
+
+        total_logs = 0
+        vector_logs = 0
+        try:
+            for processed_entries in preprocessor.process_stream(follower.iter_batches(stop_event)):
+                total_logs += len(processed_entries)
+                vector_logs += self._index_batch(processed_entries, session_id, preprocessor)
+                # 预处理器没有暂存的日志时，已读取的日志都已入库，推进检查点
+                if not preprocessor.pending_count:
+                    follower.commit()
+            follower.commit()
+        except Exception as e:
+            logger.error(f"Failed to follow logs: {e}")
+            return {
+                'success': False,
+                'message': f'跟随日志失败: {str(e)}',
+                'error': str(e)
+            }
+
+        logger.info(
+            f"📊 跟随结束: 关键词索引={total_logs}, 向量索引={vector_logs}")
+        return {
+            'success': True,
+            'message': f'共写入 {total_logs} 条日志',
+            'statistics': self.keyword_engine.get_statistics(session_id=session_id)
+        }
+
     def get_statistics(self, session_id: Optional[str] = None) -> Dict:
         """获取日志统计信息
 
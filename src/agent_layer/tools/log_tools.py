@@ -10,6 +10,8 @@ from typing import Optional, List, Dict, Any
 from langchain.tools import tool
 from loguru import logger
 
+from src.data_layer.incident_classifier import IncidentClassifier
+
 # 全局存储引擎实例（将在初始化时设置）
 _keyword_engine = None
 _vector_engine = None
@@ -187,6 +189,10 @@ def semantic_search_logs(query: str, n_results: int = 10) -> str:
         session_id = _orchestrator.current_session_id if _orchestrator else None
         logger.info(f"🔍 semantic_search_logs - session_id: {session_id}, query: {query}")
         
+        # 重复加载的日志会话指向首次入库的会话（向量只存了一份）
+        if _keyword_engine:
+            session_id = _keyword_engine.resolve_session(session_id)
+        
         results = _vector_engine.semantic_search(
             query=query,
             n_results=n_results,
@@ -270,6 +276,66 @@ def filter_logs_by_tag(tag: str, limit: int = 20) -> str:
         return f"过滤时发生错误: {str(e)}"
 
 
+@tool
+def filter_logs_by_category(categories: str, limit: int = 20) -> str:
+    """按事件类别过滤日志
+    
+    用于直接查看预处理时识别出的崩溃（CRASH）、无响应（ANR）、内存问题（MEMORY）等日志，
+    比用关键词全文搜索更快、更完整。
+    
+    Args:
+        categories: 类别名，多个用逗号分隔（如"CRASH"或"CRASH,ANR"，命中任意一个即返回）
+        limit: 返回结果数量限制
+        
+    Returns:
+        过滤结果的描述性文本
+    """
+    if not _keyword_engine:
+        return "错误：搜索引擎未初始化"
+    
+    try:
+        # 获取当前会话ID
+        session_id = _orchestrator.current_session_id if _orchestrator else None
+        logger.info(f"🔍 filter_logs_by_category - session_id: {session_id}, categories: {categories}")
+        
+        classifier = getattr(_orchestrator, 'incident_classifier', None) or IncidentClassifier()
+        try:
+            category_mask = classifier.mask_of(categories.split(','))
+        except ValueError:
+            return f"未知的事件类别 '{categories}'，可用类别: {', '.join(classifier.categories)}"
+        
+        results = _keyword_engine.filter_by_category(
+            category_mask, session_id=session_id, limit=limit)
+        
+        if not results:
+            return f"没有找到类别为 '{categories}' 的日志"
+        
+        # 格式化输出
+        output = [f"找到 {len(results)} 条 '{categories}' 类别日志：\n"]
+        
+        # 统计类别分布
+        category_count = {}
+        for log in results:
+            for name in classifier.names(log.get('category', 0)):
+                category_count[name] = category_count.get(name, 0) + 1
+        
+        output.append(f"类别分布: {category_count}\n\n")
+        
+        for i, log in enumerate(results, 1):
+            timestamp = log.get('timestamp', 'N/A')
+            lv = log.get('level', '?')
+            tag = log.get('tag', 'Unknown')
+            names = '/'.join(classifier.names(log.get('category', 0)))
+            msg = log.get('message', '')[:100]
+            output.append(f"{i}. [{timestamp}] [{names}] {lv}/{tag} (ID {log.get('id')}):\n   {msg}\n")
+        
+        return ''.join(output)
+        
+    except Exception as e:
+        logger.error(f"filter_logs_by_category error: {e}")
+        return f"按类别过滤时发生错误: {str(e)}"
+
+
 @tool
 def get_log_context(log_id: int, window_size: int = 20) -> str:
     """获取某条日志的上下文
@@ -364,12 +430,55 @@ def get_error_statistics(session_id: Optional[str] = None) -> str:
         return f"获取统计信息时发生错误: {str(e)}"
 
 
+@tool
+def get_top_error_templates(limit: int = 10) -> str:
+    """获取出现最多的错误日志模板
+    
+    预处理时把消息相似的日志归并为同一个模板（数字、ID等变化的部分显示为<*>），
+    用于快速了解主要是哪几类错误在反复出现，再按示例日志的ID或Tag深入查看。
+    
+    Args:
+        limit: 返回的模板数量
+        
+    Returns:
+        模板统计的描述性文本
+    """
+    if not _keyword_engine:
+        return "错误：搜索引擎未初始化"
+    
+    try:
+        session_id = _orchestrator.current_session_id if _orchestrator else None
+        logger.info(f"🔍 get_top_error_templates - session_id: {session_id}, limit: {limit}")
+        
+        results = _keyword_engine.get_top_templates(session_id=session_id, levels='EF', limit=limit)
+        
+        if not results:
+            return "没有找到错误日志模板"
+        
+        output = [f"出现最多的 {len(results)} 个错误模板（E/F级别）：\n\n"]
+        for i, row in enumerate(results, 1):
+            template = row.get('template') or row.get('example', '')
+            output.append(f"{i}. [模板 {row['template_id']}] {row['count']} 条"
+                          f"（该模板全部级别含去重合并共 {row.get('total_count') or row['count']} 条）:\n"
+                          f"   {template[:120]}\n"
+                          f"   示例: {row.get('level', '?')}/{row.get('tag', 'Unknown')}: "
+                          f"{row.get('example', '')[:100]}\n")
+        
+        return ''.join(output)
+        
+    except Exception as e:
+        logger.error(f"get_top_error_templates error: {e}")
+        return f"获取错误模板时发生错误: {str(e)}"
+
+
 # 导出所有工具
 ALL_TOOLS = [
     query_logs_by_time_range,
     search_error_keywords,
     semantic_search_logs,
     filter_logs_by_tag,
+    filter_logs_by_category,
+    get_top_error_templates,
     get_log_context,
     get_error_statistics
 ]
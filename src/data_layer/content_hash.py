@@ -0,0 +1,88 @@
+"""
+日志内容哈希
+
+流式计算日志文件（或上传的文件对象）的SHA-256，用作入库缓存的键：
+内容相同的日志无论文件名、上传次数如何，都得到相同的哈希值。
+入库结果还取决于预处理配置和流水线版本，ingest_cache_key将二者并入缓存键。
+
+作者: Log Analysis Team
+"""
+
+import hashlib
+import json
+from typing import BinaryIO, Dict, Union
+
+# 每次读取的字节数
+CHUNK_SIZE = 4 * 1024 * 1024
+
+# 解析和预处理流水线的版本：同样的内容和配置得到的入库结果改变时递增，使旧的缓存失效
+INGEST_PIPELINE_VERSION = 1
+
+
+def hash_log_source(source: Union[str, BinaryIO]) -> str:
+    """计算日志内容的SHA-256（十六进制）
+
+    文件按块读入同一个缓冲区，内存占用与文件大小无关；
+    内存中的文件对象（如BytesIO、Streamlit上传的文件）直接对其缓冲区计算，不复制数据。
+    文件对象的读取位置在计算后保持不变。
+
+    Args:
+        source: 文件路径或二进制文件对象（按原始字节计算，压缩文件不解压）
+
+    Returns:
+        内容哈希
+    """
+    digest = hashlib.sha256()
+
+    if isinstance(source, str):
+        with open(source, 'rb', buffering=0) as f:
+            _update_from_file(digest, f)
+        return digest.hexdigest()
+
+    if hasattr(source, 'getbuffer'):
+        with source.getbuffer() as buffer:
+            digest.update(buffer)
+        return digest.hexdigest()
+
+    position = source.tell()
+    source.seek(0)
+    _update_from_file(digest, source)
+    source.seek(position)
+    return digest.hexdigest()
+
+
+def _update_from_file(digest, f: BinaryIO):
+    """将文件剩余内容逐块送入digest（复用同一个缓冲区）"""
+    buffer = bytearray(CHUNK_SIZE)
+    view = memoryview(buffer)
+    readinto = getattr(f, 'readinto', None)
+
+    if readinto is None:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+        return
+
+    while True:
+        size = readinto(buffer)
+        if not size:
+            break
+        digest.update(view[:size])
+
+
+def ingest_cache_key(content_hash: str, settings: Dict) -> str:
+    """入库缓存的键：内容哈希加上影响入库结果的配置和流水线版本的摘要
+
+    内容相同但级别过滤、去重、脱敏等配置不同时得到不同的键，不会复用按旧配置处理的结果。
+
+    Args:
+        content_hash: hash_log_source计算的内容哈希
+        settings: 影响入库结果的配置（可JSON序列化；键的顺序也参与计算）
+
+    Returns:
+        缓存键
+    """
+    payload = json.dumps([INGEST_PIPELINE_VERSION, settings], ensure_ascii=False, default=str)
+    return f"{content_hash}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]}"
@@ -0,0 +1,132 @@
+"""
+事件分类器
+
+按可配置的关键词集合把日志消息归入崩溃、ANR、内存等事件类别。
+所有类别的关键词编译成一个按前缀树组织的多模式匹配器，每条消息只扫描一次，
+结果是类别位掩码（第i个类别对应第i位），存入数据库的category列和向量库的元数据，
+不再修改消息文本。
+
+作者: Log Analysis Team
+"""
+
+import re
+from typing import Dict, Iterable, List, Optional, Sequence
+
+# 默认关键词（匹配前统一转为小写）
+DEFAULT_KEYWORDS: Dict[str, List[str]] = {
+    'CRASH': ['crash', 'fatal', 'exception', 'sigabrt', 'sigsegv', 'tombstone'],
+    'ANR': ['anr', 'not responding'],
+    'MEMORY': ['outofmemory', 'oom', 'memory', 'allocation failed', 'allocationfailed'],
+}
+
+
+class IncidentClassifier:
+    """多模式关键词分类器
+
+    关键词按前缀树合并为一个正则，在消息的每个位置用前瞻匹配最长的关键词，
+    因此相互重叠的关键词也都能被发现；同一位置开始的较短关键词是较长关键词的子串，
+    其类别预先合并到较长关键词上。
+    """
+
+    def __init__(self, keywords: Optional[Dict[str, Sequence[str]]] = None):
+        """初始化分类器
+
+        Args:
+            keywords: {类别名: [关键词]}，按顺序分配位（None表示使用DEFAULT_KEYWORDS）
+        """
+        keywords = DEFAULT_KEYWORDS if keywords is None else keywords
+        self.categories = list(keywords)
+        self.bits = {category: 1 << i for i, category in enumerate(self.categories)}
+
+        # 关键词 -> 类别位掩码（包含它的子串关键词的类别）
+        masks: Dict[str, int] = {}
+        for category, words in keywords.items():
+            for word in words:
+                word = word.lower()
+                if word:
+                    masks[word] = masks.get(word, 0) | self.bits[category]
+        self._masks = {
+            word: mask | self._substring_mask(word, masks)
+            for word, mask in masks.items()
+        }
+
+        self._pattern = re.compile(f"(?=({_trie_regex(self._masks)}))") if self._masks else None
+
+    @staticmethod
+    def _substring_mask(word: str, masks: Dict[str, int]) -> int:
+        """word中包含的其他关键词的类别"""
+        mask = 0
+        for other, other_mask in masks.items():
+            if other != word and other in word:
+                mask |= other_mask
+        return mask
+
+    def classify(self, message: str) -> int:
+        """计算消息的类别位掩码
+
+        Args:
+            message: 日志消息
+
+        Returns:
+            类别位掩码（0表示不属于任何类别）
+        """
+        if self._pattern is None:
+            return 0
+        mask = 0
+        masks = self._masks
+        for word in self._pattern.findall(message.lower()):
+            mask |= masks[word]
+        return mask
+
+    def mask_of(self, categories: Iterable[str]) -> int:
+        """类别名 -> 位掩码（忽略大小写，未知的类别名抛出ValueError）"""
+        lookup = {category.upper(): bit for category, bit in self.bits.items()}
+        mask = 0
+        for category in categories:
+            bit = lookup.get(category.strip().upper())
+            if bit is None:
+                raise ValueError(f"Unknown incident category: {category} (available: {self.categories})")
+            mask |= bit
+        return mask
+
+    def names(self, mask: int) -> List[str]:
+        """位掩码 -> 类别名列表"""
+        return [category for category, bit in self.bits.items() if mask & bit]
+
+
+def _trie_regex(words: Iterable[str]) -> str:
+    """把关键词集合转换为按前缀树组织的正则（同一位置优先匹配最长的关键词）"""
+    trie: Dict = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = True
+
+    def build(node: Dict) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        # 当前节点本身是一个关键词的结尾：后续分支可选（贪婪，仍优先更长的关键词）
+        return f"(?:{body})?" if '' in node else body
+
+    return build(trie)
+
+
+def main():
+    """测试函数"""
+    classifier = IncidentClassifier()
+    samples = [
+        "Fatal exception in main thread",
+        "java.lang.OutOfMemoryError: Failed to allocate a 8294400 byte allocation",
+        "ANR in com.android.systemui (not responding)",
+        "Camera service ready",
+    ]
+    for message in samples:
+        mask = classifier.classify(message)
+        print(f"{mask:03b} {classifier.names(mask)}: {message}")
+
+
+if __name__ == "__main__":
+    main()
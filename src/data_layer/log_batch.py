@@ -0,0 +1,355 @@
+"""
+列式日志批次 (LogBatch)
+
+将一批日志按列存储：数值字段使用紧凑的array，Tag和Message使用字符串表
+（相同字符串只保存一份），时间统一为整数毫秒时间戳。
+相比每条日志一个LogEntry对象，百万行日志的内存占用可降低一个数量级。
+时间戳字符串和datetime只在按行读取时生成（同一秒内的行复用该秒的格式化结果）。
+不保存原始日志行；需要时可由各字段按threadtime格式重新生成一行（见format_logcat_line，
+列间空白为标准宽度、Message为预处理后的文本，不等同于原始行）。
+
+解析器 -> LogPreprocessor -> KeywordSearchEngine / VectorSearchEngine
+之间以LogBatch传递；需要行对象的调用方可以迭代LogBatch得到LogEntry。
+
+作者: Log Analysis Team
+"""
+
+from array import array
+from datetime import timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.data_layer.parsers.logcat_parser import (
+    EPOCH,
+    NO_EPOCH,
+    LogEntry,
+    datetime_to_epoch_ms,
+    epoch_ms_to_datetime,
+)
+
+
+# 日志级别编码（数值大小即优先级: V<D<I<W<E<F<A），也是KeywordSearchEngine中logs.level列的编码
+LEVEL_NAMES = 'VDIWEFA'
+LEVEL_CODES = {level: code for code, level in enumerate(LEVEL_NAMES)}
+
+
+def format_logcat_line(timestamp: str, pid: int, tid: int, level: str, tag: str, message: str) -> str:
+    """由字段按logcat threadtime格式生成日志行（"MM-DD HH:MM:SS.mmm  PID  TID L Tag: Message"）
+
+    不是原始行：列间空白按标准宽度生成，Message为传入的（通常已脱敏的）文本。
+    """
+    return f"{timestamp} {pid:5d} {tid:5d} {level} {tag}: {message}"
+
+
+class StringTable:
+    """字符串表：相同的字符串只保存一份，以整数ID引用"""
+
+    __slots__ = ('strings', '_index')
+
+    def __init__(self):
+        self.strings: List[str] = []
+        self._index: Dict[str, int] = {}
+
+    def intern(self, value: str) -> int:
+        """获取字符串的ID（不存在时添加）"""
+        string_id = self._index.get(value)
+        if string_id is None:
+            string_id = len(self.strings)
+            self._index[value] = string_id
+            self.strings.append(value)
+        return string_id
+
+    def __getitem__(self, string_id: int) -> str:
+        return self.strings[string_id]
+
+    def __len__(self) -> int:
+        return len(self.strings)
+
+    def __getstate__(self):
+        return self.strings
+
+    def __setstate__(self, strings):
+        self.strings = strings
+        self._index = {value: i for i, value in enumerate(strings)}
+
+
+class LogBatch:
+    """列式存储的一批日志
+
+    列：
+    - line_numbers / pids / tids / levels / epoch_ms: array
+    - categories: 事件类别位掩码（预处理时填写，见IncidentClassifier）
+    - template_ids: 日志模板ID（预处理时填写，见TemplateMiner）
+    - repeat_counts / last_epoch_ms: 窗口去重时代表的条数和最后一条的时间（见WindowDeduplicator）
+    - tag_ids / message_ids: 分别指向tags、messages字符串表
+
+    原始日志行不保存：iter_rows()不包含原始行；logcat_line_at()和迭代得到的LogEntry.raw_line
+    是由字段重新生成的行（见format_logcat_line），不等同于原始行。
+
+    select()/slice()得到的子批次与原批次共享字符串表。
+    """
+
+    def __init__(self, tags: Optional[StringTable] = None, messages: Optional[StringTable] = None):
+        """初始化空批次
+
+        Args:
+            tags: Tag字符串表（None表示新建）
+            messages: Message字符串表（None表示新建）
+        """
+        self.line_numbers = array('q')
+        self.pids = array('i')
+        self.tids = array('i')
+        self.levels = array('b')
+        self.epoch_ms = array('q')
+        self.tag_ids = array('i')
+        self.message_ids = array('i')
+        self.categories = array('i')
+        self.template_ids = array('i')
+        self.repeat_counts = array('i')
+        self.last_epoch_ms = array('q')
+        self.tags = tags if tags is not None else StringTable()
+        self.messages = messages if messages is not None else StringTable()
+        # 时间无法解析的行保留原始时间戳字符串 {行下标: timestamp}
+        self.raw_timestamps: Dict[int, str] = {}
+
+    def append(
+        self,
+        timestamp: str,
+        epoch_ms: int,
+        pid: int,
+        tid: int,
+        level: str,
+        tag: str,
+        message: str,
+        raw_line: str,
+        line_number: int,
+        category: int = 0,
+        template_id: int = 0,
+        repeat_count: int = 1,
+        last_epoch_ms: int = NO_EPOCH
+    ):
+        """追加一行（参数顺序与解析器产出的字段元组一致，raw_line不保存）
+
+        Raises:
+            ValueError: 日志级别不在LEVEL_CODES中
+        """
+        level_code = LEVEL_CODES.get(level)
+        if level_code is None:
+            raise ValueError(f"Unknown log level {level!r} at line {line_number}")
+        if epoch_ms == NO_EPOCH:
+            self.raw_timestamps[len(self.line_numbers)] = timestamp
+        self.line_numbers.append(line_number)
+        self.pids.append(pid)
+        self.tids.append(tid)
+        self.levels.append(level_code)
+        self.epoch_ms.append(epoch_ms)
+        self.tag_ids.append(self.tags.intern(tag))
+        self.message_ids.append(self.messages.intern(message))
+        self.categories.append(category)
+        self.template_ids.append(template_id)
+        self.repeat_counts.append(repeat_count)
+        self.last_epoch_ms.append(last_epoch_ms)
+
+    def append_entry(self, entry: LogEntry):
+        """追加一个LogEntry（或接口相同的行对象）"""
+        self.append(entry.timestamp, entry.epoch_ms, entry.pid, entry.tid, entry.level,
+                    entry.tag, entry.message, entry.raw_line, entry.line_number, entry.category,
+                    entry.template_id, entry.repeat_count, entry.last_epoch_ms)
+
+    @classmethod
+    def from_entries(cls, entries: Iterable[LogEntry]) -> 'LogBatch':
+        """由行对象构建批次"""
+        batch = cls()
+        for entry in entries:
+            batch.append_entry(entry)
+        return batch
+
+    def __len__(self) -> int:
+        return len(self.line_numbers)
+
+    def timestamp_at(self, index: int) -> str:
+        """第index行的时间戳字符串（MM-DD HH:MM:SS.mmm）"""
+        epoch_ms = self.epoch_ms[index]
+        if epoch_ms == NO_EPOCH:
+            return self.raw_timestamps[index]
+        return epoch_ms_to_datetime(epoch_ms).strftime("%m-%d %H:%M:%S.%f")[:-3]
+
+    def level_at(self, index: int) -> str:
+        """第index行的日志级别"""
+        return LEVEL_NAMES[self.levels[index]]
+
+    def tag_at(self, index: int) -> str:
+        """第index行的Tag"""
+        return self.tags[self.tag_ids[index]]
+
+    def message_at(self, index: int) -> str:
+        """第index行的Message"""
+        return self.messages[self.message_ids[index]]
+
+    def logcat_line_at(self, index: int) -> str:
+        """第index行由字段重新生成的日志行（不是原始行，见format_logcat_line）"""
+        return format_logcat_line(self.timestamp_at(index), self.pids[index], self.tids[index],
+                                  self.level_at(index), self.tag_at(index), self.message_at(index))
+
+    def set_message(self, index: int, message: str):
+        """修改第index行的Message"""
+        self.message_ids[index] = self.messages.intern(message)
+
+    def iter_rows(self) -> Iterator[Tuple]:
+        """按行产出字段元组，不创建LogEntry对象（不包含原始行）
+
+        Yields:
+            (timestamp, epoch_ms, pid, tid, level, tag, message, line_number, category, template_id,
+             repeat_count, last_epoch_ms)
+        """
+        tags = self.tags.strings
+        messages = self.messages.strings
+        last_second = None
+        second_prefix = None
+        for i in range(len(self)):
+            epoch_ms = self.epoch_ms[i]
+            if epoch_ms == NO_EPOCH:
+                timestamp = self.raw_timestamps[i]
+            else:
+                # 同一秒内的行复用该秒的 "MM-DD HH:MM:SS"
+                second, millisecond = divmod(epoch_ms, 1000)
+                if second != last_second:
+                    last_second = second
+                    second_prefix = (EPOCH + timedelta(seconds=second)).strftime("%m-%d %H:%M:%S")
+                timestamp = f"{second_prefix}.{millisecond:03d}"
+            yield (
+                timestamp,
+                epoch_ms,
+                self.pids[i],
+                self.tids[i],
+                LEVEL_NAMES[self.levels[i]],
+                tags[self.tag_ids[i]],
+                messages[self.message_ids[i]],
+                self.line_numbers[i],
+                self.categories[i],
+                self.template_ids[i],
+                self.repeat_counts[i],
+                self.last_epoch_ms[i]
+            )
+
+    def __iter__(self) -> Iterator[LogEntry]:
+        """按行产出LogEntry对象（raw_line为由字段重新生成的行，见format_logcat_line）"""
+        for row in self.iter_rows():
+            (timestamp, epoch_ms, pid, tid, level, tag, message, line_number,
+             category, template_id, repeat_count, last_epoch_ms) = row
+            yield LogEntry(timestamp, epoch_ms_to_datetime(epoch_ms), pid, tid, level,
+                           tag, message, format_logcat_line(timestamp, pid, tid, level, tag, message),
+                           line_number, category, template_id, repeat_count, last_epoch_ms)
+
+    def to_entries(self) -> List[LogEntry]:
+        """转换为LogEntry列表"""
+        return list(self)
+
+    def select(self, indices: Sequence[int]) -> 'LogBatch':
+        """按下标选取若干行，返回共享字符串表的新批次"""
+        batch = LogBatch(self.tags, self.messages)
+        for column in ('line_numbers', 'pids', 'tids', 'levels', 'epoch_ms', 'tag_ids', 'message_ids',
+                       'categories', 'template_ids', 'repeat_counts', 'last_epoch_ms'):
+            getattr(batch, column).extend(map(getattr(self, column).__getitem__, indices))
+        if self.raw_timestamps:
+            batch.raw_timestamps = {
+                new: self.raw_timestamps[old]
+                for new, old in enumerate(indices) if old in self.raw_timestamps
+            }
+        return batch
+
+    def slice(self, start: int, stop: Optional[int] = None) -> 'LogBatch':
+        """选取[start, stop)范围内的行，返回共享字符串表的新批次"""
+        stop = len(self) if stop is None else min(stop, len(self))
+        batch = LogBatch(self.tags, self.messages)
+        for column in ('line_numbers', 'pids', 'tids', 'levels', 'epoch_ms', 'tag_ids', 'message_ids',
+                       'categories', 'template_ids', 'repeat_counts', 'last_epoch_ms'):
+            setattr(batch, column, getattr(self, column)[start:stop])
+        if self.raw_timestamps:
+            batch.raw_timestamps = {
+                i - start: ts for i, ts in self.raw_timestamps.items() if start <= i < stop
+            }
+        return batch
+
+    def compact(self) -> 'LogBatch':
+        """返回只包含本批次用到的Tag/Message的副本
+
+        select()/slice()得到的子批次与原批次共享整个字符串表，
+        跨进程传递前先压缩，避免序列化未被引用的字符串。
+        """
+        batch = self.slice(0)
+        batch.tags, batch.messages = StringTable(), StringTable()
+        for column, source, target in (('tag_ids', self.tags, batch.tags),
+                                       ('message_ids', self.messages, batch.messages)):
+            remap: Dict[int, int] = {}
+            new_ids = array('i')
+            for i in getattr(self, column):
+                new_id = remap.get(i)
+                if new_id is None:
+                    new_id = remap[i] = target.intern(source[i])
+                new_ids.append(new_id)
+            setattr(batch, column, new_ids)
+        return batch
+
+    def select_levels(self, levels: str) -> 'LogBatch':
+        """选取指定级别的日志（如'WEF'）"""
+        codes = {LEVEL_CODES[level] for level in levels}
+        return self.select([i for i, code in enumerate(self.levels) if code in codes])
+
+    def shift_line_numbers(self, offset: int):
+        """所有行号加上offset（用于合并分片解析结果）"""
+        if offset:
+            self.line_numbers = array('q', (n + offset for n in self.line_numbers))
+
+    def shift_epoch_ms(self, offset_ms: int):
+        """所有时间（包括去重的最后时间）加上offset_ms毫秒，无法解析的时间保持不变（用于多源时间对齐）"""
+        if not offset_ms or not len(self):
+            return
+        for column in (self.epoch_ms, self.last_epoch_ms):
+            # 直接在array的缓冲区上原地修改
+            values = np.frombuffer(column, dtype=np.int64)
+            values[values != NO_EPOCH] += offset_ms
+            del values
+
+    @classmethod
+    def concat(cls, batches: List['LogBatch']) -> 'LogBatch':
+        """拼接多个批次
+
+        字符串表相同时直接拼接列，否则将Tag/Message重新映射到第一个批次的字符串表。
+        """
+        batches = [b for b in batches if len(b)]
+        if not batches:
+            return cls()
+        if len(batches) == 1:
+            return batches[0]
+
+        first = batches[0]
+        result = first.slice(0)
+        for batch in batches[1:]:
+            base = len(result)
+            for column in ('line_numbers', 'pids', 'tids', 'levels', 'epoch_ms', 'categories', 'template_ids',
+                           'repeat_counts', 'last_epoch_ms'):
+                getattr(result, column).extend(getattr(batch, column))
+
+            if batch.tags is result.tags:
+                result.tag_ids.extend(batch.tag_ids)
+            else:
+                remap = [result.tags.intern(tag) for tag in batch.tags.strings]
+                result.tag_ids.extend(remap[i] for i in batch.tag_ids)
+
+            if batch.messages is result.messages:
+                result.message_ids.extend(batch.message_ids)
+            else:
+                remap = {}
+                intern = result.messages.intern
+                for i in batch.message_ids:
+                    new_id = remap.get(i)
+                    if new_id is None:
+                        new_id = remap[i] = intern(batch.messages[i])
+                    result.message_ids.append(new_id)
+
+            for i, ts in batch.raw_timestamps.items():
+                result.raw_timestamps[base + i] = ts
+
+        return result
@@ -0,0 +1,59 @@
+"""
+消息结果缓存
+
+车机日志高度重复：一个会话的大部分日志来自几千条不同的消息。
+脱敏和事件分类的结果只取决于消息文本，按消息缓存后，重复的消息只需一次字典查找。
+缓存有容量上限，超出时淘汰最久未使用的消息。
+
+作者: Log Analysis Team
+"""
+
+from collections import OrderedDict
+from typing import Callable, Dict, Generic, TypeVar
+
+V = TypeVar('V')
+
+
+class LRUCache(Generic[V]):
+    """按消息缓存func(message)的结果，最近最少使用的条目优先淘汰"""
+
+    def __init__(self, func: Callable[[str], V], maxsize: int = 100000):
+        """初始化缓存
+
+        Args:
+            func: 计算函数（结果只能依赖于消息本身）
+            maxsize: 最大条数（0表示不缓存）
+        """
+        self.func = func
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: 'OrderedDict[str, V]' = OrderedDict()
+
+    def __call__(self, message: str) -> V:
+        """获取消息的结果（未缓存时计算并缓存）"""
+        data = self._data
+        value = data.get(message)
+        if value is not None:
+            data.move_to_end(message)
+            self.hits += 1
+            return value
+
+        self.misses += 1
+        value = self.func(message)
+        if self.maxsize > 0:
+            data[message] = value
+            if len(data) > self.maxsize:
+                data.popitem(last=False)
+        return value
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def clear(self):
+        """清空缓存（命中统计保持累计）"""
+        self._data.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """命中次数、未命中次数和当前条数"""
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._data)}
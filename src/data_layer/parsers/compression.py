@@ -0,0 +1,133 @@
+"""
+压缩日志的透明读取
+
+按文件头的魔数识别压缩格式（gzip / bzip2 / xz / zip），边解压边按行读取，
+不需要先解压到磁盘。支持传入文件路径或已打开的二进制文件对象（如上传的文件）。
+
+作者: Log Analysis Team
+"""
+
+import bz2
+import gzip
+import io
+import itertools
+import lzma
+import zipfile
+from contextlib import ExitStack, contextmanager
+from typing import BinaryIO, Iterable, Iterator, List, Optional, Union
+
+# 日志来源：文件路径或二进制文件对象
+LogSource = Union[str, BinaryIO]
+
+# 压缩格式魔数
+MAGIC_NUMBERS = (
+    (b'\x1f\x8b', 'gzip'),
+    (b'BZh', 'bz2'),
+    (b'\xfd7zXZ\x00', 'xz'),
+    (b'PK\x03\x04', 'zip'),
+    (b'PK\x05\x06', 'zip'),  # 空zip
+)
+
+# 流式解压格式：二进制文件对象 -> 解压后的二进制文件对象
+_DECOMPRESSORS = {
+    'gzip': lambda fileobj: gzip.GzipFile(fileobj=fileobj, mode='rb'),
+    'bz2': bz2.BZ2File,
+    'xz': lzma.LZMAFile,
+}
+
+
+def detect_compression(header: bytes) -> Optional[str]:
+    """根据文件头识别压缩格式
+
+    Args:
+        header: 文件开头的若干字节（至少6字节）
+
+    Returns:
+        'gzip' / 'bz2' / 'xz' / 'zip'，未压缩时返回None
+    """
+    for magic, name in MAGIC_NUMBERS:
+        if header.startswith(magic):
+            return name
+    return None
+
+
+def _read_header(fileobj: BinaryIO) -> bytes:
+    """读取文件头且不移动读取位置"""
+    if hasattr(fileobj, 'peek'):
+        return fileobj.peek(6)[:6]
+    position = fileobj.tell()
+    header = fileobj.read(6)
+    fileobj.seek(position)
+    return header
+
+
+def source_compression(source: LogSource) -> Optional[str]:
+    """识别日志来源的压缩格式
+
+    Args:
+        source: 文件路径或二进制文件对象
+
+    Returns:
+        压缩格式名称，未压缩时返回None
+    """
+    if isinstance(source, str):
+        with open(source, 'rb') as f:
+            return detect_compression(f.read(6))
+    return detect_compression(_read_header(source))
+
+
+def zip_members(source: Union[LogSource, zipfile.ZipFile]) -> List[str]:
+    """列出zip中的日志文件（按在压缩包中的顺序，跳过目录）"""
+    if isinstance(source, zipfile.ZipFile):
+        return [info.filename for info in source.infolist() if not info.is_dir()]
+    with zipfile.ZipFile(source) as archive:
+        return zip_members(archive)
+
+
+def _text(stream: BinaryIO) -> io.TextIOWrapper:
+    """二进制流 -> 按行读取的文本流（与open(..., 'r')的换行和解码规则一致）"""
+    return io.TextIOWrapper(stream, encoding='utf-8', errors='ignore')
+
+
+@contextmanager
+def open_log_lines(source: LogSource) -> Iterator[Iterable[str]]:
+    """打开日志来源，返回按行迭代的文本（压缩格式边读边解压）
+
+    zip中的多个日志文件按顺序依次读取，每个文件的最后一行不会与下一个文件的首行相连。
+
+    Args:
+        source: 文件路径或二进制文件对象（文件对象不会被关闭）
+
+    Yields:
+        行迭代器
+    """
+    with ExitStack() as stack:
+        if isinstance(source, str):
+            raw = stack.enter_context(open(source, 'rb'))
+        else:
+            raw = source
+
+        compression = detect_compression(_read_header(raw))
+        if compression is None:
+            stream = _text(raw)
+            stack.callback(stream.detach)
+            yield stream
+        elif compression == 'zip':
+            archive = stack.enter_context(zipfile.ZipFile(raw))
+            yield itertools.chain.from_iterable(
+                _iter_member_lines(archive, name) for name in zip_members(archive)
+            )
+        else:
+            stream = _text(stack.enter_context(_DECOMPRESSORS[compression](raw)))
+            stack.callback(stream.detach)
+            yield stream
+
+
+def _iter_member_lines(archive: zipfile.ZipFile, name: str) -> Iterator[str]:
+    """逐行读取zip中的一个文件"""
+    with archive.open(name) as member:
+        stream = _text(member)
+        try:
+            yield from stream
+        finally:
+            stream.detach()
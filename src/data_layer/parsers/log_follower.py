@@ -0,0 +1,276 @@
+"""
+实时跟随（follow / tail）日志解析
+
+持续读取不断增长的日志文件或管道（如 adb logcat | ...），只解析新追加的字节，
+按条数或等待时间切分为小批次（LogBatch），供下游增量入库。
+文件模式下，下游处理完产出的批次后调用commit()把读取位置写入检查点，重启后从断点继续。
+
+作者: Log Analysis Team
+"""
+
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import BinaryIO, Iterator, Optional, Union
+
+from loguru import logger
+
+from src.data_layer.log_batch import LogBatch
+from src.data_layer.parsers.logcat_parser import LogcatParser
+
+
+class LogFollower:
+    """增量跟随日志文件或输入流
+
+    - 文件：轮询新追加的数据；文件被截断或轮转（inode变化）时从新文件开头继续
+    - 流（stdin/管道）：后台线程读取，流结束时输出剩余数据并停止
+    - 只解析完整的行，行尾未写完的部分留到下次读取
+    - 行号在整个跟随过程中连续递增
+    - 检查点不随产出批次自动保存，由下游在批次入库后调用commit()
+    """
+
+    # 单次读取的最大字节数
+    READ_SIZE = 1024 * 1024
+
+    def __init__(
+        self,
+        source: Union[str, BinaryIO],
+        parser: Optional[LogcatParser] = None,
+        batch_size: int = 1000,
+        flush_interval: float = 0.5,
+        poll_interval: float = 0.2,
+        checkpoint_path: Optional[str] = None
+    ):
+        """初始化跟随器
+
+        Args:
+            source: 日志文件路径，或二进制输入流（'-'表示标准输入）
+            parser: 日志解析器（None表示新建LogcatParser）
+            batch_size: 每个微批次的最大条数
+            flush_interval: 微批次最长等待时间（秒），超过后即使未满也立即输出
+            poll_interval: 无新数据时的轮询间隔（秒）
+            checkpoint_path: 检查点文件路径（仅文件模式，None表示不记录）
+        """
+        if source == '-':
+            source = sys.stdin.buffer
+        self.source = source
+        self.parser = parser or LogcatParser()
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.poll_interval = poll_interval
+        self.checkpoint_path = checkpoint_path if isinstance(source, str) else None
+
+        # 已处理到的字节偏移量（只计完整的行）和行号
+        self.offset = 0
+        self.line_number = 0
+        # 已读取但尚未构成完整一行的数据
+        self._pending = b''
+
+        self._stop = threading.Event()
+        self._load_checkpoint()
+
+        logger.info(f"LogFollower initialized (source={source}, batch_size={batch_size}, "
+                   f"flush_interval={flush_interval}s)")
+
+    def stop(self):
+        """停止跟随（iter_batches会在输出剩余数据后结束）"""
+        self._stop.set()
+
+    def iter_batches(self, stop_event: Optional[threading.Event] = None) -> Iterator[LogBatch]:
+        """持续产出新日志的微批次
+
+        暂时没有新数据时会产出一个空批次，通知下游立即处理手头的数据
+        （如LogPreprocessor输出去重时暂存的末尾日志）。
+
+        Args:
+            stop_event: 外部停止信号（与stop()等效）
+
+        Yields:
+            LogBatch对象
+        """
+        if stop_event is not None:
+            self._stop = stop_event
+        stop_event = self._stop
+        chunks = self._iter_file_chunks(stop_event) if isinstance(self.source, str) \
+            else self._iter_stream_chunks(stop_event)
+
+        self._pending = b''
+        batch = LogBatch()
+        batch_started = 0.0
+        idle_notified = True
+
+        for chunk in chunks:
+            if chunk:
+                pending = self._pending + chunk
+                end = pending.rfind(b'\n') + 1
+                if end:
+                    if not len(batch):
+                        batch_started = time.monotonic()
+                    self._parse_lines(pending[:end], batch)
+                    self.offset += end
+                self._pending = pending[end:]
+            elif chunk is None and self._pending:
+                # 流结束：最后一行没有换行符
+                self._parse_lines(self._pending, batch)
+                self.offset += len(self._pending)
+                self._pending = b''
+
+            # 条数已满、等待超时或数据源暂时没有新数据时输出
+            if len(batch) and (len(batch) >= self.batch_size or not chunk
+                               or time.monotonic() - batch_started >= self.flush_interval):
+                yield batch
+                batch = LogBatch()
+                idle_notified = False
+            elif not chunk and not idle_notified:
+                yield LogBatch()
+                idle_notified = True
+
+        if len(batch):
+            yield batch
+
+        logger.info(f"Follow stopped: {self.line_number} lines, "
+                   f"{self.parser.parsed_count} entries parsed, offset={self.offset}")
+
+    def _parse_lines(self, data: bytes, batch: LogBatch):
+        """解析若干完整的行并追加到批次"""
+        parse_row = self.parser._parse_row
+        line_number = self.line_number
+        lines = data.decode('utf-8', errors='ignore').split('\n')
+        if not lines[-1]:
+            lines.pop()
+        for line in lines:
+            line_number += 1
+            row = parse_row(line, line_number)
+            if row:
+                batch.append(*row)
+        self.line_number = line_number
+
+    def _iter_file_chunks(self, stop_event: threading.Event) -> Iterator[Optional[bytes]]:
+        """轮询读取文件新追加的数据（没有新数据时产出b''）"""
+        path = self.source
+        f = None
+        try:
+            while not stop_event.is_set():
+                if f is None:
+                    if not os.path.exists(path):
+                        yield b''
+                        stop_event.wait(self.poll_interval)
+                        continue
+                    f = open(path, 'rb')
+                    f.seek(self.offset)
+                    logger.info(f"Following {path} from offset {self.offset}")
+
+                data = f.read(self.READ_SIZE)
+                if data:
+                    yield data
+                    continue
+
+                # 没有新数据：检查文件是否被截断或轮转
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    stat = None
+                if stat is None or stat.st_ino != os.fstat(f.fileno()).st_ino or stat.st_size < self.offset:
+                    logger.info(f"{path} was truncated or rotated, restarting from the beginning")
+                    f.close()
+                    f = None
+                    self.offset = 0
+                    self._pending = b''
+                    continue
+
+                yield b''
+                stop_event.wait(self.poll_interval)
+        finally:
+            if f is not None:
+                f.close()
+
+    def _iter_stream_chunks(self, stop_event: threading.Event) -> Iterator[Optional[bytes]]:
+        """在后台线程中读取输入流（没有新数据时产出b''，流结束时产出None）"""
+        chunks: "queue.Queue[Optional[bytes]]" = queue.Queue()
+        stream = self.source
+        read = getattr(stream, 'read1', stream.read)
+
+        def reader():
+            try:
+                while True:
+                    data = read(self.READ_SIZE)
+                    if not data:
+                        break
+                    chunks.put(data)
+            finally:
+                chunks.put(None)
+
+        threading.Thread(target=reader, name="LogFollowerReader", daemon=True).start()
+
+        while not stop_event.is_set():
+            try:
+                data = chunks.get(timeout=self.poll_interval)
+            except queue.Empty:
+                yield b''
+                continue
+            yield data
+            if data is None:
+                break
+
+    def _load_checkpoint(self):
+        """从检查点恢复读取位置（文件比检查点短时视为新文件，从头开始）"""
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return
+        try:
+            with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+                checkpoint = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Failed to load checkpoint {self.checkpoint_path}: {e}")
+            return
+
+        if checkpoint.get('source') != os.path.abspath(self.source):
+            return
+        if os.path.exists(self.source) and os.path.getsize(self.source) >= checkpoint.get('offset', 0):
+            self.offset = checkpoint.get('offset', 0)
+            self.line_number = checkpoint.get('line_number', 0)
+            logger.info(f"Resuming from checkpoint: offset={self.offset}, line={self.line_number}")
+
+    def commit(self):
+        """把已产出批次的读取位置写入检查点（先写临时文件再替换，避免写到一半时中断）
+
+        在iter_batches产出的批次都已入库后调用。下游可能暂存部分日志
+        （如LogPreprocessor.process_stream去重时的末尾日志，见pending_count），
+        应等这些日志也输出并入库后再调用，否则重启后它们不会被重新读取。
+        """
+        if not self.checkpoint_path:
+            return
+        Path(self.checkpoint_path).parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'source': os.path.abspath(self.source),
+                'offset': self.offset,
+                'line_number': self.line_number
+            }, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+
+def main():
+    """测试函数：跟随日志文件或标准输入并打印新日志
+
+    用法:
+        python -m src.data_layer.parsers.log_follower /path/to/growing.log
+        adb logcat -v threadtime | python -m src.data_layer.parsers.log_follower -
+    """
+    source = sys.argv[1] if len(sys.argv) > 1 else '-'
+    follower = LogFollower(source)
+
+    try:
+        for batch in follower.iter_batches():
+            for entry in batch:
+                print(f"[{entry.timestamp}] {entry.level}/{entry.tag}: {entry.message}")
+    except KeyboardInterrupt:
+        follower.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -7,16 +7,52 @@ MM-DD HH:MM:SS.mmm  PID  TID Level Tag: Message
 作者: Log Analysis Team
 """
 
+import os
 import re
-from datetime import datetime
-from typing import Dict, List, Optional
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 from dataclasses import dataclass
 from loguru import logger
 
+from src.data_layer.parsers.compression import (
+    LogSource,
+    open_log_lines,
+    source_compression,
+    zip_members,
+)
 
-@dataclass
+
+# 毫秒时间戳的基准（Logcat时间不带时区，按本地时间原样换算）
+EPOCH = datetime(1970, 1, 1)
+_ONE_MS = timedelta(milliseconds=1)
+
+# 无法解析为datetime的日志行使用的占位时间戳
+NO_EPOCH = -(1 << 63)
+
+
+def datetime_to_epoch_ms(datetime_obj: Optional[datetime]) -> int:
+    """datetime -> 毫秒时间戳（None返回NO_EPOCH）"""
+    if datetime_obj is None:
+        return NO_EPOCH
+    return (datetime_obj - EPOCH) // _ONE_MS
+
+
+def epoch_ms_to_datetime(epoch_ms: int) -> Optional[datetime]:
+    """毫秒时间戳 -> datetime（NO_EPOCH返回None）"""
+    if epoch_ms == NO_EPOCH:
+        return None
+    return EPOCH + timedelta(milliseconds=epoch_ms)
+
+
+@dataclass(slots=True)
 class LogEntry:
-    """标准化的日志条目对象"""
+    """标准化的日志条目对象
+    
+    使用__slots__以减少单个对象的内存占用；大批量日志请使用列式的LogBatch，
+    LogEntry主要作为需要行对象的调用方的视图。
+    """
     timestamp: str  # 原始时间戳字符串
     datetime_obj: Optional[datetime]  # 解析后的datetime对象
     pid: int  # 进程ID
@@ -26,6 +62,16 @@ class LogEntry:
     message: str  # 日志消息
     raw_line: str  # 原始日志行
     line_number: int  # 行号（在原文件中的位置）
+    category: int = 0  # 事件类别位掩码（见IncidentClassifier，预处理时填写）
+    template_id: int = 0  # 日志模板ID（见TemplateMiner，预处理时填写，0表示未挖掘）
+    repeat_count: int = 1  # 窗口去重时本条代表的日志条数（见WindowDeduplicator）
+    last_epoch_ms: int = NO_EPOCH  # 窗口去重时最后一条重复日志的毫秒时间戳
+    source_id: int = 0  # 多源合并时的日志源编号（见TimeAligner.merge_and_sort）
+    
+    @property
+    def epoch_ms(self) -> int:
+        """毫秒时间戳（datetime_obj为None时返回NO_EPOCH）"""
+        return datetime_to_epoch_ms(self.datetime_obj)
     
     def to_dict(self) -> Dict:
         """转换为字典格式，便于存储"""
@@ -38,7 +84,13 @@ class LogEntry:
             'tag': self.tag,
             'message': self.message,
             'raw_line': self.raw_line,
-            'line_number': self.line_number
+            'line_number': self.line_number,
+            'category': self.category,
+            'template_id': self.template_id,
+            'repeat_count': self.repeat_count,
+            'last_datetime': (epoch_ms_to_datetime(self.last_epoch_ms).isoformat()
+                              if self.last_epoch_ms != NO_EPOCH else None),
+            'source_id': self.source_id
         }
 
 
@@ -49,7 +101,12 @@ class LogcatParser:
     1. 解析标准Logcat格式
     2. 提取关键字段（时间、PID、级别、Tag、Message）
     3. 处理多行日志（如堆栈信息）
-    4. 支持批量解析和流式解析
+    4. 支持批量解析和流式解析（iter_entries / iter_batches / parse_stream）
+    5. 支持直接产出列式批次（iter_log_batches），不创建逐行对象
+    6. 透明读取gzip/bz2/xz/zip压缩日志（按魔数识别，边解压边解析）
+    
+    内部按行产出的字段元组中时间为整数毫秒时间戳（epoch_ms），
+    同一秒内的日志复用该秒的基准值，只有构造LogEntry时才转换为datetime。
     """
     
     # Logcat标准格式正则表达式
@@ -64,17 +121,35 @@ class LogcatParser:
         r'(?P<message>.*)$'  # Message
     )
     
-    def __init__(self, current_year: int = 2025):
+    # threadtime格式中固定宽度时间戳 "MM-DD HH:MM:SS" 的分隔符（下标2/5/8/11）
+    THREADTIME_SEPARATORS = '- ::'
+    
+    # 合法的日志级别
+    LOG_LEVELS = frozenset('IWEFVD')
+    
+    # 并行解析时单个分片的目标大小（字节），小于该大小的文件按单进程解析
+    SHARD_SIZE_BYTES = 32 * 1024 * 1024
+    
+    def __init__(self, current_year: int = 2025, use_fast_path: bool = True):
         """初始化解析器
         
         Args:
             current_year: 当前年份（Logcat不包含年份信息，需要指定）
+            use_fast_path: 是否启用threadtime格式的免正则快速解析
+                           （无法处理的行自动回退到正则）
         """
         self.current_year = current_year
+        self.use_fast_path = use_fast_path
         self.parsed_count = 0
         self.failed_count = 0
         
-        logger.info(f"LogcatParser initialized (year={current_year})")
+        # 每秒缓存：上一行的 "MM-DD HH:MM:SS"、该秒的毫秒时间戳基准值
+        # 以及日期非法时的错误信息（此时基准值为None）
+        self._last_second_prefix = None
+        self._last_second_base = None
+        self._last_second_error = None
+        
+        logger.info(f"LogcatParser initialized (year={current_year}, fast_path={use_fast_path})")
     
     def parse_line(self, line: str, line_number: int) -> Optional[LogEntry]:
         """解析单行日志
@@ -86,94 +161,227 @@ class LogcatParser:
         Returns:
             LogEntry对象，如果解析失败返回None
         """
+        row = self._parse_row(line, line_number)
+        return self._row_to_entry(row) if row else None
+    
+    @staticmethod
+    def _row_to_entry(row: Tuple) -> LogEntry:
+        """字段元组 -> LogEntry（毫秒时间戳转换为datetime）"""
+        timestamp, epoch_ms, pid, tid, level, tag, message, raw_line, line_number = row
+        return LogEntry(timestamp, epoch_ms_to_datetime(epoch_ms), pid, tid, level,
+                        tag, message, raw_line, line_number)
+    
+    def _parse_row(self, line: str, line_number: int) -> Optional[Tuple]:
+        """解析单行日志为字段元组（不创建LogEntry对象）
+        
+        Args:
+            line: 日志行文本
+            line_number: 行号
+            
+        Returns:
+            (timestamp, epoch_ms, pid, tid, level, tag, message, raw_line, line_number)，
+            如果解析失败返回None
+        """
         line = line.strip()
         
         # 跳过空行
         if not line:
             return None
         
-        # 尝试匹配Logcat格式
-        match = self.LOGCAT_PATTERN.match(line)
-        if not match:
+        try:
+            # 提取各字段（快速路径内联调用，避免多一层函数调用）
+            fields = self._split_threadtime(line, line_number) if self.use_fast_path else None
+            if fields is None:
+                fields = self._parse_fields(line, line_number, use_fast_path=False)
+            
+        except Exception as e:
+            self.failed_count += 1
+            logger.error(f"Error parsing line {line_number}: {e}")
+            logger.debug(f"Problematic line: {line}")
+            return None
+        
+        if fields is None:
             self.failed_count += 1
             logger.debug(f"Line {line_number} doesn't match Logcat pattern: {line[:50]}...")
             return None
         
-        try:
-            # 提取各字段
-            groups = match.groupdict()
-            
-            # 构建时间戳字符串
-            timestamp = f"{groups['month']}-{groups['day']} {groups['hour']}:{groups['minute']}:{groups['second']}.{groups['millisecond']}"
+        self.parsed_count += 1
+        return fields + (line, line_number)
+    
+    def _parse_fields(self, line: str, line_number: int, use_fast_path: bool = True) -> Optional[Tuple]:
+        """从已strip的日志行中提取字段（先走快速路径，失败时回退到正则）
+        
+        Args:
+            line: 已去除首尾空白的日志行
+            line_number: 行号
+            use_fast_path: 是否尝试快速路径（同时受self.use_fast_path控制）
             
-            # 解析为datetime对象
-            datetime_obj = None
-            try:
-                datetime_obj = datetime(
-                    year=self.current_year,
-                    month=int(groups['month']),
-                    day=int(groups['day']),
-                    hour=int(groups['hour']),
-                    minute=int(groups['minute']),
-                    second=int(groups['second']),
-                    microsecond=int(groups['millisecond']) * 1000  # 毫秒转微秒
-                )
-            except ValueError as e:
-                logger.warning(f"Invalid datetime at line {line_number}: {e}")
+        Returns:
+            (timestamp, epoch_ms, pid, tid, level, tag, message)，不匹配时返回None
+        """
+        if use_fast_path and self.use_fast_path:
+            fields = self._split_threadtime(line, line_number)
+            if fields is not None:
+                return fields
+        
+        # 尝试匹配Logcat格式
+        match = self.LOGCAT_PATTERN.match(line)
+        if not match:
+            return None
+        
+        return self._extract_fields(match.groupdict(), line_number)
+    
+    def _split_threadtime(self, line: str, line_number: int) -> Optional[Tuple]:
+        """threadtime格式的快速解析（按固定宽度切片，不使用正则）
+        
+        只接受与LOGCAT_PATTERN完全等价的规整行：日期与时间之间恰好一个空格、
+        字段之间为空白分隔。其余情况（包括任何不确定的行）返回None，交给正则处理。
+        
+        Args:
+            line: 已去除首尾空白的日志行
+            line_number: 行号
             
-            # 创建LogEntry对象
-            entry = LogEntry(
-                timestamp=timestamp,
-                datetime_obj=datetime_obj,
-                pid=int(groups['pid']),
-                tid=int(groups['tid']),
-                level=groups['level'],
-                tag=groups['tag'].strip(),
-                message=groups['message'],
-                raw_line=line,
-                line_number=line_number
+        Returns:
+            (timestamp, epoch_ms, pid, tid, level, tag, message)，无法快速解析时返回None
+        """
+        # ".mmm" + 空白
+        if line[14:15] != '.' or not line[15:18].isdecimal() or not line[18:19].isspace():
+            return None
+        
+        # "MM-DD HH:MM:SS"：相邻日志大多在同一秒内，复用上一行该秒的基准值
+        prefix = line[:14]
+        if prefix != self._last_second_prefix:
+            # 分隔符位于下标2/5/8/11，数字位于下标0/3/6/9/12和1/4/7/10/13
+            if line[2:12:3] != self.THREADTIME_SEPARATORS or not (line[0:14:3] + line[1:14:3]).isdecimal():
+                return None
+            self._last_second_base, self._last_second_error = self._second_base(
+                int(line[0:2]), int(line[3:5]), int(line[6:8]), int(line[9:11]), int(line[12:14])
             )
+            self._last_second_prefix = prefix
+        
+        parts = line[18:].split(None, 3)
+        if len(parts) != 4:
+            return None
+        
+        pid, tid, level, rest = parts
+        if level not in self.LOG_LEVELS or not pid.isdecimal() or not tid.isdecimal():
+            return None
+        
+        colon = rest.find(':')
+        if colon <= 0:
+            return None
+        
+        base = self._last_second_base
+        if base is None:
+            epoch_ms = NO_EPOCH
+            logger.warning(f"Invalid datetime at line {line_number}: {self._last_second_error}")
+        else:
+            epoch_ms = base + int(line[15:18])
+        
+        return (line[:18], epoch_ms, int(pid), int(tid), level,
+                rest[:colon].strip(), rest[colon + 1:].lstrip())
+    
+    def _extract_fields(self, groups: Dict[str, str], line_number: int) -> Tuple:
+        """将正则分组转换为日志字段
+        
+        Args:
+            groups: LOGCAT_PATTERN的命名分组
+            line_number: 行号（用于日志提示）
             
-            self.parsed_count += 1
-            return entry
+        Returns:
+            (timestamp, epoch_ms, pid, tid, level, tag, message)
+        """
+        # 构建时间戳字符串
+        timestamp = f"{groups['month']}-{groups['day']} {groups['hour']}:{groups['minute']}:{groups['second']}.{groups['millisecond']}"
+        
+        return self._make_fields(
+            timestamp,
+            int(groups['month']), int(groups['day']),
+            int(groups['hour']), int(groups['minute']), int(groups['second']), int(groups['millisecond']),
+            int(groups['pid']), int(groups['tid']), groups['level'],
+            groups['tag'].strip(), groups['message'],
+            line_number
+        )
+    
+    def _make_fields(
+        self,
+        timestamp: str,
+        month: int, day: int,
+        hour: int, minute: int, second: int, millisecond: int,
+        pid: int, tid: int, level: str,
+        tag: str, message: str,
+        line_number: int
+    ) -> Tuple:
+        """组装正则路径解析出的日志字段
+        
+        Returns:
+            (timestamp, epoch_ms, pid, tid, level, tag, message)
+        """
+        base, error = self._second_base(month, day, hour, minute, second)
+        if base is None:
+            epoch_ms = NO_EPOCH
+            logger.warning(f"Invalid datetime at line {line_number}: {error}")
+        else:
+            epoch_ms = base + millisecond
+        
+        return (timestamp, epoch_ms, pid, tid, level, tag, message)
+    
+    def _second_base(self, month: int, day: int, hour: int, minute: int, second: int) -> Tuple[Optional[int], Optional[str]]:
+        """计算某一秒的毫秒时间戳基准值
+        
+        Returns:
+            (基准值, None)；日期非法时返回(None, 错误信息)
+        """
+        try:
+            datetime_obj = datetime(self.current_year, month, day, hour, minute, second)
+        except ValueError as e:
+            return None, str(e)
+        return (datetime_obj - EPOCH) // _ONE_MS, None
+    
+    def iter_entries(self, file_path: LogSource, max_lines: Optional[int] = None) -> Iterator[LogEntry]:
+        """流式解析日志文件，逐条产出LogEntry
+        
+        与parse_file不同，不会在内存中保留全部结果，适合GB级别的大文件
+        
+        Args:
+            file_path: 日志文件路径或二进制文件对象（可以是gzip/bz2/xz/zip压缩格式）
+            max_lines: 最大解析行数（None表示解析全部）
             
-        except Exception as e:
-            self.failed_count += 1
-            logger.error(f"Error parsing line {line_number}: {e}")
-            logger.debug(f"Problematic line: {line}")
-            return None
+        Yields:
+            LogEntry对象
+        """
+        for row in self._iter_rows(file_path, max_lines=max_lines):
+            yield self._row_to_entry(row)
     
-    def parse_file(self, file_path: str, max_lines: Optional[int] = None) -> List[LogEntry]:
-        """解析整个日志文件
+    def _iter_rows(self, file_path: LogSource, max_lines: Optional[int] = None) -> Iterator[Tuple]:
+        """流式解析日志文件，逐条产出字段元组
         
         Args:
-            file_path: 日志文件路径
+            file_path: 日志文件路径或二进制文件对象（压缩格式边读边解压）
             max_lines: 最大解析行数（None表示解析全部）
             
-        Returns:
-            LogEntry对象列表
+        Yields:
+            (timestamp, epoch_ms, pid, tid, level, tag, message, raw_line, line_number)
         """
         logger.info(f"Parsing log file: {file_path}")
-        entries = []
         
         try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                for line_number, line in enumerate(f, start=1):
+            with open_log_lines(file_path) as lines:
+                for line_number, line in enumerate(lines, start=1):
                     # 达到最大行数限制
                     if max_lines and line_number > max_lines:
                         logger.info(f"Reached max_lines limit: {max_lines}")
                         break
                     
-                    entry = self.parse_line(line, line_number)
-                    if entry:
-                        entries.append(entry)
+                    row = self._parse_row(line, line_number)
+                    if row:
+                        yield row
                     
                     # 每10000行输出一次进度
                     if line_number % 10000 == 0:
                         logger.info(f"Processed {line_number} lines, parsed {self.parsed_count} entries")
             
             logger.info(f"Parsing complete: {self.parsed_count} entries parsed, {self.failed_count} lines failed")
-            return entries
             
         except FileNotFoundError:
             logger.error(f"File not found: {file_path}")
@@ -182,6 +390,249 @@ class LogcatParser:
             logger.error(f"Error reading file {file_path}: {e}")
             raise
     
+    def parse_stream(self, lines: Iterable[str], start_line_number: int = 1) -> Iterator[LogEntry]:
+        """流式解析任意行迭代器（如管道、socket、已打开的文件）
+        
+        Args:
+            lines: 日志行迭代器
+            start_line_number: 起始行号
+            
+        Yields:
+            LogEntry对象
+        """
+        for line_number, line in enumerate(lines, start=start_line_number):
+            entry = self.parse_line(line, line_number)
+            if entry:
+                yield entry
+    
+    def iter_entries_parallel(self, file_path: str, workers: int = 0) -> Iterator[LogEntry]:
+        """多进程并行解析日志文件
+        
+        按换行符对齐的字节范围切分文件（zip压缩包则按其中的文件切分），
+        每个分片在进程池中独立解析，再按分片顺序修正全局行号，
+        保证line_number与单进程解析结果一致。
+        同时在途的分片数有上限，内存占用不随文件大小增长。
+        
+        Args:
+            file_path: 日志文件路径
+            workers: 进程数（0表示使用全部CPU核心）
+            
+        Yields:
+            LogEntry对象（顺序与单进程解析一致）
+        """
+        workers = workers or os.cpu_count() or 1
+        tasks = self._shard_tasks(file_path, workers)
+        # 文件太小或无法分片时直接逐行解析，不经过列式批次
+        if len(tasks) <= 1:
+            yield from self.iter_entries(file_path)
+            return
+        
+        for batch in self._run_shard_tasks(file_path, tasks, workers):
+            yield from batch
+    
+    def _iter_shard_batches(self, file_path: LogSource, workers: int = 0) -> Iterator['LogBatch']:
+        """多进程并行解析日志文件，按分片顺序产出列式批次
+        
+        未压缩的文件按字节范围分片；zip压缩包以其中的每个文件为一个分片。
+        gzip/bz2/xz等流式压缩格式以及文件对象无法分片，使用单进程解析。
+        
+        Args:
+            file_path: 日志文件路径或二进制文件对象
+            workers: 进程数（0表示使用全部CPU核心）
+            
+        Yields:
+            每个分片的LogBatch（行号已修正为全局行号）
+        """
+        workers = workers or os.cpu_count() or 1
+        tasks = self._shard_tasks(file_path, workers)
+        # 文件太小、无法分片或只有一个进程时，直接单进程解析
+        if len(tasks) <= 1:
+            yield from self.iter_log_batches(file_path, workers=1)
+            return
+        
+        yield from self._run_shard_tasks(file_path, tasks, workers)
+    
+    def _shard_tasks(self, file_path: LogSource, workers: int) -> List[Tuple]:
+        """并行解析的分片任务
+        
+        Returns:
+            [(解析函数, 参数), ...]，不值得或无法并行时为空列表
+        """
+        compression = source_compression(file_path) if isinstance(file_path, str) else None
+        
+        tasks = []
+        if workers > 1 and isinstance(file_path, str):
+            if compression is None:
+                # 每个分片约SHARD_SIZE_BYTES：小于一个分片的文件启动进程池得不偿失，按单进程解析
+                file_size = os.path.getsize(file_path)
+                if file_size >= self.SHARD_SIZE_BYTES:
+                    shard_count = -(-file_size // self.SHARD_SIZE_BYTES)
+                    tasks = [(_parse_shard, (file_path, start, end))
+                             for start, end in self._split_shards(file_path, shard_count)]
+            elif compression == 'zip':
+                tasks = [(_parse_zip_member, (file_path, name)) for name in zip_members(file_path)]
+        return tasks
+    
+    def _run_shard_tasks(self, file_path: LogSource, tasks: List[Tuple], workers: int) -> Iterator['LogBatch']:
+        """在进程池中执行分片任务，按分片顺序产出行号已修正的LogBatch"""
+        logger.info(f"Parsing log file in parallel: {file_path} "
+                   f"({len(tasks)} shards, {workers} workers)")
+        
+        line_offset = 0
+        task_iter = iter(tasks)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = deque()
+            for func, args in task_iter:
+                pending.append(executor.submit(func, *args, self.current_year, self.use_fast_path))
+                if len(pending) >= workers * 2:
+                    break
+            
+            while pending:
+                batch, line_count, parsed, failed = pending.popleft().result()
+                
+                # 保持固定数量的分片在途
+                next_task = next(task_iter, None)
+                if next_task:
+                    func, args = next_task
+                    pending.append(executor.submit(func, *args, self.current_year, self.use_fast_path))
+                
+                # 分片内行号从1开始，加上前序分片的总行数即为全局行号
+                batch.shift_line_numbers(line_offset)
+                yield batch
+                
+                line_offset += line_count
+                self.parsed_count += parsed
+                self.failed_count += failed
+                logger.info(f"Processed {line_offset} lines, parsed {self.parsed_count} entries")
+        
+        logger.info(f"Parsing complete: {self.parsed_count} entries parsed, {self.failed_count} lines failed")
+    
+    def parse_file_parallel(self, file_path: str, workers: int = 0) -> List[LogEntry]:
+        """多进程并行解析整个日志文件
+        
+        Args:
+            file_path: 日志文件路径
+            workers: 进程数（0表示使用全部CPU核心）
+            
+        Returns:
+            LogEntry对象列表
+        """
+        return list(self.iter_entries_parallel(file_path, workers=workers))
+    
+    @staticmethod
+    def _split_shards(file_path: str, shard_count: int) -> List[Tuple[int, int]]:
+        """将文件切分为按换行符对齐的字节范围
+        
+        Args:
+            file_path: 日志文件路径
+            shard_count: 期望的分片数
+            
+        Returns:
+            [(起始偏移, 结束偏移), ...]，每个分片只包含完整的行
+        """
+        file_size = os.path.getsize(file_path)
+        boundaries = [0]
+        
+        with open(file_path, 'rb') as f:
+            for i in range(1, shard_count):
+                target = file_size * i // shard_count
+                if target <= boundaries[-1]:
+                    continue
+                # 移动到下一个行首
+                f.seek(target)
+                f.readline()
+                boundary = min(f.tell(), file_size)
+                if boundary > boundaries[-1]:
+                    boundaries.append(boundary)
+        
+        if file_size > boundaries[-1]:
+            boundaries.append(file_size)
+        
+        return list(zip(boundaries[:-1], boundaries[1:]))
+    
+    def iter_batches(
+        self,
+        file_path: LogSource,
+        batch_size: int = 10000,
+        max_lines: Optional[int] = None,
+        workers: int = 1
+    ) -> Iterator[List[LogEntry]]:
+        """按批流式解析日志文件
+        
+        每次最多产出batch_size条日志，内存占用与文件大小无关
+        
+        Args:
+            file_path: 日志文件路径或二进制文件对象（可以是gzip/bz2/xz/zip压缩格式）
+            batch_size: 每批的最大条数（对应配置 parser.max_lines_per_batch）
+            max_lines: 最大解析行数（None表示解析全部，指定时只能单进程解析）
+            workers: 解析进程数（1表示单进程，0表示使用全部CPU核心）
+            
+        Yields:
+            LogEntry对象列表
+        """
+        if workers != 1 and not max_lines:
+            source = self.iter_entries_parallel(file_path, workers=workers)
+        else:
+            source = self.iter_entries(file_path, max_lines=max_lines)
+        
+        batch = []
+        for entry in source:
+            batch.append(entry)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        
+        if batch:
+            yield batch
+    
+    def iter_log_batches(
+        self,
+        file_path: LogSource,
+        batch_size: int = 10000,
+        max_lines: Optional[int] = None,
+        workers: int = 1
+    ) -> Iterator['LogBatch']:
+        """按批流式解析日志文件，直接产出列式LogBatch（不创建逐行的LogEntry对象）
+        
+        Args:
+            file_path: 日志文件路径或二进制文件对象（可以是gzip/bz2/xz/zip压缩格式）
+            batch_size: 每批的最大条数（对应配置 parser.max_lines_per_batch）
+            max_lines: 最大解析行数（None表示解析全部，指定时只能单进程解析）
+            workers: 解析进程数（1表示单进程，0表示使用全部CPU核心）
+            
+        Yields:
+            LogBatch对象
+        """
+        from src.data_layer.log_batch import LogBatch
+        
+        if workers != 1 and not max_lines:
+            for shard_batch in self._iter_shard_batches(file_path, workers=workers):
+                for start in range(0, len(shard_batch), batch_size):
+                    yield shard_batch.slice(start, start + batch_size)
+            return
+        
+        batch = LogBatch()
+        for row in self._iter_rows(file_path, max_lines=max_lines):
+            batch.append(*row)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = LogBatch()
+        
+        if len(batch):
+            yield batch
+    
+    def parse_file(self, file_path: LogSource, max_lines: Optional[int] = None) -> List[LogEntry]:
+        """解析整个日志文件
+        
+        Args:
+            file_path: 日志文件路径或二进制文件对象（可以是gzip/bz2/xz/zip压缩格式）
+            max_lines: 最大解析行数（None表示解析全部）
+            
+        Returns:
+            LogEntry对象列表
+        """
+        return list(self.iter_entries(file_path, max_lines=max_lines))
+    
     def parse_batch(self, lines: List[str], start_line_number: int = 1) -> List[LogEntry]:
         """批量解析日志行
         
@@ -192,14 +643,7 @@ class LogcatParser:
         Returns:
             LogEntry对象列表
         """
-        entries = []
-        for i, line in enumerate(lines):
-            line_number = start_line_number + i
-            entry = self.parse_line(line, line_number)
-            if entry:
-                entries.append(entry)
-        
-        return entries
+        return list(self.parse_stream(lines, start_line_number=start_line_number))
     
     def get_statistics(self) -> Dict:
         """获取解析统计信息
@@ -218,6 +662,84 @@ class LogcatParser:
         }
 
 
+def _parse_shard(
+    file_path: str,
+    start: int,
+    end: int,
+    current_year: int,
+    use_fast_path: bool = True
+) -> Tuple['LogBatch', int, int, int]:
+    """解析文件的一个字节范围（在子进程中执行）
+    
+    结果以列式LogBatch返回，跨进程序列化的开销远小于LogEntry列表
+    
+    Args:
+        file_path: 日志文件路径
+        start: 起始字节偏移（行首）
+        end: 结束字节偏移（行首或文件末尾）
+        current_year: 年份
+        use_fast_path: 是否启用快速解析路径
+        
+    Returns:
+        (日志批次, 分片总行数, 解析成功数, 解析失败数)，日志行号从1开始计
+    """
+    from src.data_layer.log_batch import LogBatch
+    
+    parser = LogcatParser(current_year=current_year, use_fast_path=use_fast_path)
+    batch = LogBatch()
+    line_count = 0
+    position = start
+    
+    with open(file_path, 'rb') as f:
+        f.seek(start)
+        for raw in f:
+            line_count += 1
+            row = parser._parse_row(raw.decode('utf-8', errors='ignore'), line_count)
+            if row:
+                batch.append(*row)
+            
+            position += len(raw)
+            if position >= end:
+                break
+    
+    return batch, line_count, parser.parsed_count, parser.failed_count
+
+
+def _parse_zip_member(
+    file_path: str,
+    member: str,
+    current_year: int,
+    use_fast_path: bool = True
+) -> Tuple['LogBatch', int, int, int]:
+    """解析zip压缩包中的一个日志文件（在子进程中执行）
+    
+    Args:
+        file_path: zip文件路径
+        member: 压缩包内的文件名
+        current_year: 年份
+        use_fast_path: 是否启用快速解析路径
+        
+    Returns:
+        (日志批次, 文件总行数, 解析成功数, 解析失败数)，日志行号从1开始计
+    """
+    import io
+    import zipfile
+    from src.data_layer.log_batch import LogBatch
+    
+    parser = LogcatParser(current_year=current_year, use_fast_path=use_fast_path)
+    batch = LogBatch()
+    line_count = 0
+    
+    with zipfile.ZipFile(file_path) as archive, archive.open(member) as f:
+        for line in io.TextIOWrapper(f, encoding='utf-8', errors='ignore'):
+            line_count += 1
+            row = parser._parse_row(line, line_count)
+            if row:
+                batch.append(*row)
+    
+    return batch, line_count, parser.parsed_count, parser.failed_count
+
+
 def main():
     """测试函数"""
     from pathlib import Path
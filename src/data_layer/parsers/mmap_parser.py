@@ -0,0 +1,372 @@
+"""
+基于mmap的零拷贝Logcat解析后端
+
+将日志文件映射到内存，直接在字节缓冲区上运行编译好的bytes正则，
+每行只记录其在缓冲区中的偏移量。message、raw_line等字符串字段
+只有在真正被访问（入库、展示、脱敏）时才解码，
+被LogPreprocessor按级别过滤掉的日志行不会产生任何字符串对象。
+
+作者: Log Analysis Team
+"""
+
+import mmap
+import os
+import re
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+from loguru import logger
+
+from src.data_layer.parsers.compression import LogSource, detect_compression
+from src.data_layer.parsers.logcat_parser import (
+    NO_EPOCH,
+    LogcatParser,
+    LogEntry,
+    datetime_to_epoch_ms,
+    epoch_ms_to_datetime,
+)
+
+
+# 行首允许出现的空白字符（对应str.strip()）
+_LEADING_WHITESPACE = frozenset(b' \t\r\x0b\x0c')
+
+# 日志级别字节 -> 字符串（复用同一个str对象）
+_LEVEL_BY_BYTE = {ord(level): level for level in 'IWEFVD'}
+
+# 行结束符（与文本路径的通用换行规则一致：\r\n、单独的\r和\n都结束一行）
+_LINE_END = re.compile(rb'\r\n?|\n')
+
+
+class LazyLogEntry:
+    """延迟解码的日志条目
+
+    只保存映射缓冲区的引用和行的偏移量，级别在扫描时直接读取单个字节；
+    其余字段在首次访问时一次性解码并缓存。接口与LogEntry保持一致，
+    字段同样支持赋值（预处理和时间对齐会修改message、tag等字段）。
+    """
+
+    __slots__ = (
+        '_buf', '_parser', '_start', '_end', 'line_number', 'level', 'category', 'template_id',
+        'repeat_count', 'last_epoch_ms', 'source_id', '_decoded',
+        '_timestamp', '_epoch_ms', '_pid', '_tid', '_tag', '_message'
+    )
+
+    def __init__(self, buf: mmap.mmap, parser: LogcatParser, start: int, end: int,
+                 line_number: int, level: str):
+        self._buf = buf
+        self._parser = parser
+        self._start = start
+        self._end = end
+        self.line_number = line_number
+        self.level = level
+        self.category = 0
+        self.template_id = 0
+        self.repeat_count = 1
+        self.last_epoch_ms = NO_EPOCH
+        self.source_id = 0
+        self._decoded = False
+
+    def _decode(self):
+        """解码整行并缓存各字段"""
+        line = self.raw_line
+        fields = self._parser._parse_fields(line, self.line_number)
+        if fields:
+            (self._timestamp, self._epoch_ms, self._pid, self._tid,
+             self.level, self._tag, self._message) = fields
+        else:
+            # bytes正则已匹配，解码后不匹配只可能来自非法UTF-8字节
+            self._timestamp, self._epoch_ms = '', NO_EPOCH
+            self._pid, self._tid, self._tag, self._message = 0, 0, '', line
+        self._decoded = True
+
+    def _field(name: str):
+        slot = f'_{name}'
+
+        def getter(self):
+            if not self._decoded:
+                self._decode()
+            return getattr(self, slot)
+
+        def setter(self, value):
+            if not self._decoded:
+                self._decode()
+            setattr(self, slot, value)
+
+        return property(getter, setter)
+
+    timestamp = _field('timestamp')
+    epoch_ms = _field('epoch_ms')
+    pid = _field('pid')
+    tid = _field('tid')
+    tag = _field('tag')
+    message = _field('message')
+    del _field
+
+    @property
+    def datetime_obj(self):
+        """解析后的datetime对象（由毫秒时间戳换算）"""
+        return epoch_ms_to_datetime(self.epoch_ms)
+
+    @datetime_obj.setter
+    def datetime_obj(self, value):
+        self.epoch_ms = datetime_to_epoch_ms(value)
+
+    @property
+    def raw_line(self) -> str:
+        """原始日志行（每次访问时从映射缓冲区解码）"""
+        return self._buf[self._start:self._end].decode('utf-8', errors='ignore').strip()
+
+    def to_entry(self) -> LogEntry:
+        """转换为普通的LogEntry对象（不再依赖映射缓冲区）"""
+        return LogEntry(
+            timestamp=self.timestamp,
+            datetime_obj=self.datetime_obj,
+            pid=self.pid,
+            tid=self.tid,
+            level=self.level,
+            tag=self.tag,
+            message=self.message,
+            raw_line=self.raw_line,
+            line_number=self.line_number,
+            category=self.category,
+            template_id=self.template_id,
+            repeat_count=self.repeat_count,
+            last_epoch_ms=self.last_epoch_ms,
+            source_id=self.source_id
+        )
+
+    def to_dict(self) -> Dict:
+        """转换为字典格式，便于存储"""
+        return self.to_entry().to_dict()
+
+    def __reduce__(self):
+        # mmap无法序列化，跨进程传递时转换为普通LogEntry
+        return (LogEntry, (self.timestamp, self.datetime_obj, self.pid, self.tid, self.level,
+                           self.tag, self.message, self.raw_line, self.line_number, self.category,
+                           self.template_id, self.repeat_count, self.last_epoch_ms,
+                           self.source_id))
+
+    def __repr__(self) -> str:
+        return f"LazyLogEntry(line_number={self.line_number}, level={self.level!r}, raw_line={self.raw_line!r})"
+
+
+class MmapLogcatParser(LogcatParser):
+    """基于mmap + bytes正则的Logcat解析器
+
+    与LogcatParser输出相同的字段和统计信息，但：
+    1. 不逐行解码和strip，直接在映射缓冲区上匹配
+    2. 产出LazyLogEntry，字符串字段按需解码
+
+    LazyLogEntry引用映射缓冲区，只在产出它的生成器结束之前有效：iter_entries遍历结束
+    （或生成器被关闭）时释放映射，之后访问尚未解码的字段会抛出ValueError。
+    需要保留的条目应先调用to_entry()转换；parse_file返回的就是转换后的LogEntry，
+    iter_batches/iter_log_batches在最后一批被使用完之后才释放映射。
+
+    注：iter_entries_parallel的子进程仍使用文本解析路径。
+    iter_log_batches产出的是LazyLogEntry列表而不是LogBatch：转换为列式批次
+    需要解码全部字段，由LogPreprocessor在级别过滤之后再转换，以保留延迟解码的收益。
+    """
+
+    # 与LOGCAT_PATTERN等价的bytes版本
+    # 只匹配到级别字节为止（message部分总能匹配到行尾），匹配结束位置的前一个字节即为级别
+    LOGCAT_PATTERN_BYTES = re.compile(
+        rb'\d{2}-\d{2}\s+'  # 日期: MM-DD
+        rb'\d{2}:\d{2}:\d{2}\.\d{3}\s+'  # 时间
+        rb'\d+\s+'  # PID
+        rb'\d+\s+'  # TID
+        rb'[IWEFVD]'  # Level
+        rb'(?=\s+[^:\n]+:)'  # Tag
+    )
+
+    @contextmanager
+    def _open_mapped(self, file_path: LogSource) -> Iterator[Optional[mmap.mmap]]:
+        """只读映射日志文件，退出时释放映射
+
+        压缩文件、文件对象和空文件无法映射，此时返回None（调用方改用文本解析路径）
+        """
+        if not isinstance(file_path, str):
+            yield None
+            return
+
+        try:
+            with open(file_path, 'rb') as f:
+                mappable = detect_compression(f.read(6)) is None and f.seek(0, 2) > 0
+                buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if mappable else None
+        except FileNotFoundError:
+            logger.error(f"File not found: {file_path}")
+            raise
+        except Exception as e:
+            logger.error(f"Error reading file {file_path}: {e}")
+            raise
+
+        try:
+            yield buf
+        finally:
+            if buf is not None:
+                buf.close()
+
+    def iter_entries(self, file_path: LogSource, max_lines: Optional[int] = None) -> Iterator[LazyLogEntry]:
+        """流式解析日志文件（mmap零拷贝）
+
+        压缩文件和文件对象无法映射，此时使用文本解析路径（产出LogEntry）。
+        产出的LazyLogEntry在遍历结束后失效（见类说明）。
+
+        Args:
+            file_path: 日志文件路径或二进制文件对象
+            max_lines: 最大解析行数（None表示解析全部）
+
+        Yields:
+            LazyLogEntry对象
+        """
+        with self._open_mapped(file_path) as buf:
+            if buf is None:
+                yield from super().iter_entries(file_path, max_lines=max_lines)
+            else:
+                logger.info(f"Parsing log file (mmap): {file_path}")
+                yield from self._iter_mapped(buf, max_lines)
+
+    def _iter_mapped(self, buf: mmap.mmap, max_lines: Optional[int]) -> Iterator[LazyLogEntry]:
+        """在映射缓冲区上逐行匹配，产出LazyLogEntry"""
+        size = len(buf)
+        find = buf.find
+        match = self.LOGCAT_PATTERN_BYTES.match
+        # 没有\r的文件（绝大多数）只需按\n查找行尾
+        line_end = _LINE_END.search if find(b'\r') >= 0 else None
+        position = 0
+        line_number = 0
+
+        while position < size:
+            if line_end is None:
+                eol = find(b'\n', position)
+                if eol < 0:
+                    eol = size
+                next_position = eol + 1
+            else:
+                m = line_end(buf, position)
+                eol, next_position = (m.start(), m.end()) if m else (size, size)
+            line_number += 1
+
+            # 达到最大行数限制
+            if max_lines and line_number > max_lines:
+                logger.info(f"Reached max_lines limit: {max_lines}")
+                break
+
+            start = position
+            m = match(buf, start, eol)
+            if m is None and start < eol and buf[start] in _LEADING_WHITESPACE:
+                # 行首有空白时跳过空白后重试
+                while start < eol and buf[start] in _LEADING_WHITESPACE:
+                    start += 1
+                m = match(buf, start, eol)
+
+            if m:
+                self.parsed_count += 1
+                yield LazyLogEntry(buf, self, start, eol, line_number, _LEVEL_BY_BYTE[buf[m.end() - 1]])
+            elif buf[start:eol].strip():
+                # 跳过空行，其余不匹配的行计为失败
+                self.failed_count += 1
+                logger.debug(f"Line {line_number} doesn't match Logcat pattern")
+
+            # 每10000行输出一次进度
+            if line_number % 10000 == 0:
+                logger.info(f"Processed {line_number} lines, parsed {self.parsed_count} entries")
+
+            position = next_position
+
+        logger.info(f"Parsing complete: {self.parsed_count} entries parsed, {self.failed_count} lines failed")
+
+    def iter_entries_parallel(self, file_path: str, workers: int = 0) -> Iterator[LogEntry]:
+        """多进程并行解析日志文件（子进程使用文本解析路径）
+
+        不值得分片的小文件同样按文本路径单进程解析，产出的LogEntry不依赖映射缓冲区
+
+        Args:
+            file_path: 日志文件路径
+            workers: 进程数（0表示使用全部CPU核心）
+
+        Yields:
+            LogEntry对象（顺序与单进程解析一致）
+        """
+        if len(self._shard_tasks(file_path, workers or os.cpu_count() or 1)) <= 1:
+            yield from super().iter_entries(file_path)
+            return
+        yield from super().iter_entries_parallel(file_path, workers=workers)
+
+    def parse_file(self, file_path: LogSource, max_lines: Optional[int] = None) -> List[LogEntry]:
+        """解析整个日志文件
+
+        映射在返回前释放，因此返回转换后的LogEntry而不是LazyLogEntry
+
+        Args:
+            file_path: 日志文件路径或二进制文件对象
+            max_lines: 最大解析行数（None表示解析全部）
+
+        Returns:
+            LogEntry对象列表
+        """
+        return [entry.to_entry() if isinstance(entry, LazyLogEntry) else entry
+                for entry in self.iter_entries(file_path, max_lines=max_lines)]
+
+    def iter_batches(
+        self,
+        file_path: LogSource,
+        batch_size: int = 10000,
+        max_lines: Optional[int] = None,
+        workers: int = 1
+    ) -> Iterator[List[LazyLogEntry]]:
+        """按批流式解析日志文件
+
+        映射在最后一批被使用完（调用方请求下一批）之后才释放
+
+        Args:
+            file_path: 日志文件路径
+            batch_size: 每批的最大条数
+            max_lines: 最大解析行数（None表示解析全部）
+            workers: 解析进程数（大于1时使用文本解析的分片并行路径，产出LogEntry）
+
+        Yields:
+            LazyLogEntry列表
+        """
+        if workers != 1 and not max_lines:
+            yield from super().iter_batches(file_path, batch_size=batch_size, workers=workers)
+            return
+
+        with self._open_mapped(file_path) as buf:
+            if buf is None:
+                yield from super().iter_batches(file_path, batch_size=batch_size, max_lines=max_lines)
+                return
+
+            logger.info(f"Parsing log file (mmap): {file_path}")
+            batch = []
+            for entry in self._iter_mapped(buf, max_lines):
+                batch.append(entry)
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+
+    def iter_log_batches(
+        self,
+        file_path: LogSource,
+        batch_size: int = 10000,
+        max_lines: Optional[int] = None,
+        workers: int = 1
+    ) -> Iterator[List[LazyLogEntry]]:
+        """按批流式解析日志文件
+
+        与iter_batches相同，产出延迟解码的行对象列表（见类说明）
+
+        Args:
+            file_path: 日志文件路径
+            batch_size: 每批的最大条数
+            max_lines: 最大解析行数（None表示解析全部）
+            workers: 解析进程数（大于1时使用文本解析的分片并行路径，产出LogBatch）
+
+        Yields:
+            LazyLogEntry列表
+        """
+        if workers != 1 and not max_lines:
+            yield from super().iter_log_batches(file_path, batch_size=batch_size, workers=workers)
+            return
+        yield from self.iter_batches(file_path, batch_size=batch_size, max_lines=max_lines)
@@ -0,0 +1,70 @@
+"""
+PII脱敏引擎
+
+绝大多数日志消息不含个人信息。先用一次扫描判断消息是否可能包含PII，
+只有可能包含时才依次执行各类别的替换，并统计每个类别替换掉的片段数。
+
+作者: Log Analysis Team
+"""
+
+import re
+from typing import Optional, Pattern, Sequence, Tuple
+
+# 敏感信息正则模式
+PHONE_PATTERN = re.compile(r'1[3-9]\d{9}')  # 中国手机号
+EMAIL_PATTERN = re.compile(r'[\w\.-]+@[\w\.-]+\.\w+')  # 邮箱
+IP_PATTERN = re.compile(r'\b(?:\d{1,3}\.){3}\d{1,3}\b')  # IP地址
+COORD_PATTERN = re.compile(r'[-+]?\d{1,3}\.\d{6,}')  # 经纬度坐标
+
+# 预筛选：任何一类PII都必然包含其中之一
+# '@'（邮箱）、"数字.数字"（IP、坐标）、手机号本身
+PREFILTER_PATTERN = re.compile(r'@|\d\.\d|1[3-9]\d{9}')
+
+# (类别, 正则, 替换文本)，按顺序依次替换
+DEFAULT_RULES = (
+    ('PHONE', PHONE_PATTERN, '[PHONE]'),
+    ('EMAIL', EMAIL_PATTERN, '[EMAIL]'),
+    ('IP', IP_PATTERN, '[IP]'),
+    ('COORD', COORD_PATTERN, '[COORD]'),
+)
+
+
+class PIIMasker:
+    """按类别依次替换PII，带预筛选
+
+    替换顺序与规则顺序一致，后面的规则匹配的是前面替换后的文本。
+    预筛选不匹配时所有规则都不可能匹配，直接返回原文本，只扫描一次。
+    """
+
+    def __init__(
+        self,
+        rules: Sequence[Tuple[str, Pattern, str]] = DEFAULT_RULES,
+        prefilter: Optional[Pattern] = PREFILTER_PATTERN
+    ):
+        """初始化脱敏引擎
+
+        Args:
+            rules: [(类别, 正则, 替换文本)]
+            prefilter: 预筛选正则，必须能匹配任何一条规则可能匹配的文本（None表示不预筛选）
+        """
+        self.rules = [(pattern, replacement) for _, pattern, replacement in rules]
+        self.categories = tuple(category for category, _, _ in rules)
+        self.prefilter = prefilter
+
+    def mask(self, text: str) -> Tuple[str, Tuple[int, ...]]:
+        """脱敏一条文本
+
+        Args:
+            text: 原始文本
+
+        Returns:
+            (脱敏后的文本, 各类别替换的片段数)。没有任何替换时片段数为空元组
+        """
+        if self.prefilter is not None and self.prefilter.search(text) is None:
+            return text, ()
+
+        spans = []
+        for pattern, replacement in self.rules:
+            text, count = pattern.subn(replacement, text)
+            spans.append(count)
+        return text, (tuple(spans) if any(spans) else ())
@@ -9,12 +9,20 @@
 作者: Log Analysis Team
 """
 
-from typing import List, Set, Dict, Optional
-from collections import Counter
+import os
+from typing import Iterable, Iterator, List, Set, Dict, Optional, Tuple, Union
+from array import array
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
 from loguru import logger
-import re
 
+from src.data_layer import pii_masker
+from src.data_layer.incident_classifier import IncidentClassifier
+from src.data_layer.log_batch import LEVEL_CODES, LEVEL_NAMES, LogBatch
+from src.data_layer.message_cache import LRUCache
 from src.data_layer.parsers.logcat_parser import LogEntry
+from src.data_layer.template_miner import TemplateMiner
+from src.data_layer.window_dedup import DedupGroup, WindowDeduplicator, normalize_message
 
 
 class LogPreprocessor:
@@ -24,10 +32,10 @@ class LogPreprocessor:
     """
     
     # 敏感信息正则模式
-    PHONE_PATTERN = re.compile(r'1[3-9]\d{9}')  # 中国手机号
-    EMAIL_PATTERN = re.compile(r'[\w\.-]+@[\w\.-]+\.\w+')  # 邮箱
-    IP_PATTERN = re.compile(r'\b(?:\d{1,3}\.){3}\d{1,3}\b')  # IP地址
-    COORD_PATTERN = re.compile(r'[-+]?\d{1,3}\.\d{6,}')  # 经纬度坐标
+    PHONE_PATTERN = pii_masker.PHONE_PATTERN  # 中国手机号
+    EMAIL_PATTERN = pii_masker.EMAIL_PATTERN  # 邮箱
+    IP_PATTERN = pii_masker.IP_PATTERN  # IP地址
+    COORD_PATTERN = pii_masker.COORD_PATTERN  # 经纬度坐标
     
     # 常见的"噪音"Tag（可根据实际情况调整）
     NOISY_TAGS = {
@@ -36,28 +44,57 @@ class LogPreprocessor:
         'QC-QMI',  # 高通底层通信
     }
     
+    # 去重方式: consecutive - 合并连续重复的日志；window - 合并滑动窗口内不连续的重复日志
+    DEDUP_MODES = ('consecutive', 'window')
+    
+    # 多进程预处理行对象列表时每批的条数
+    PARALLEL_BATCH_SIZE = 10000
+    
     def __init__(
         self,
         enable_deduplication: bool = True,
         enable_pii_masking: bool = True,
         min_log_level: str = 'I',  # I, W, E, F
-        filter_tags: Optional[Set[str]] = None
+        filter_tags: Optional[Set[str]] = None,
+        incident_keywords: Optional[Dict[str, List[str]]] = None,
+        enable_template_mining: bool = True,
+        template_miner: Optional[TemplateMiner] = None,
+        dedup_mode: str = 'consecutive',
+        dedup_window_lines: int = 1000,
+        dedup_window_ms: int = 10000,
+        message_cache_size: int = 100000
     ):
         """初始化预处理器
         
         Args:
             enable_deduplication: 是否启用去重
             enable_pii_masking: 是否启用PII脱敏
-            min_log_level: 最小日志级别（D<V<I<W<E<F）
+            min_log_level: 最小日志级别（V<D<I<W<E<F<A）
             filter_tags: 要过滤的Tag集合
+            incident_keywords: 事件分类关键词 {类别名: [关键词]}（None表示使用默认的CRASH/ANR/MEMORY）
+            enable_template_mining: 是否为每条日志挖掘模板ID
+            template_miner: 模板挖掘器（None表示使用默认参数新建）
+            dedup_mode: 去重方式（consecutive或window，见DEDUP_MODES）
+            dedup_window_lines: window模式下一组重复日志的行数窗口
+            dedup_window_ms: window模式下一组重复日志的时间窗口（毫秒）
+            message_cache_size: 脱敏、分类结果缓存各自的最大消息条数（0表示不缓存）
         """
+        if dedup_mode not in self.DEDUP_MODES:
+            raise ValueError(f"Unknown dedup mode: {dedup_mode} (available: {self.DEDUP_MODES})")
+        
         self.enable_deduplication = enable_deduplication
+        self.dedup_mode = dedup_mode
+        self.dedup_window_lines = dedup_window_lines
+        self.dedup_window_ms = dedup_window_ms
         self.enable_pii_masking = enable_pii_masking
         self.min_log_level = min_log_level
         self.filter_tags = filter_tags or self.NOISY_TAGS.copy()
+        self.classifier = IncidentClassifier(incident_keywords)
+        # 模板在脱敏后、去重前挖掘，被去重合并的日志也计入模板条数
+        self.template_miner = (template_miner or TemplateMiner()) if enable_template_mining else None
         
-        # 日志级别优先级
-        self.level_priority = {'D': 0, 'V': 1, 'I': 2, 'W': 3, 'E': 4, 'F': 5}
+        # 日志级别优先级（与LogBatch的级别编码一致）
+        self.level_priority = dict(LEVEL_CODES)
         self.min_priority = self.level_priority.get(min_log_level, 2)
         
         # 统计信息
@@ -65,9 +102,24 @@ class LogPreprocessor:
         self.filtered_count = 0
         self.deduplicated_count = 0
         self.masked_count = 0
+        # process_stream暂存（去重段尚未结束）、还没有输出的日志条数
+        self.pending_count = 0
+        
+        # PII脱敏引擎，及各类别累计替换的片段数
+        self.pii_masker = pii_masker.PIIMasker()
+        self.masked_spans: Dict[str, int] = dict.fromkeys(self.pii_masker.categories, 0)
+        
+        # 按消息缓存脱敏和分类结果（跨批次有效，命中统计保持累计）
+        self.message_cache_size = message_cache_size
+        self.mask_cache = LRUCache(self.pii_masker.mask, message_cache_size)
+        self.category_cache = LRUCache(self.classifier.classify, message_cache_size)
         
-        logger.info(f"LogPreprocessor initialized (dedup={enable_deduplication}, "
-                   f"pii_mask={enable_pii_masking}, min_level={min_log_level})")
+        # 最近一次预处理输出中每个(级别, Tag)组合的条数（预处理时顺带累计，分析时无需再遍历日志）
+        self._output_counts: Counter = Counter()
+        
+        logger.info(f"LogPreprocessor initialized (dedup={enable_deduplication}/{dedup_mode}, "
+                   f"pii_mask={enable_pii_masking}, min_level={min_log_level}, "
+                   f"templates={enable_template_mining})")
     
     def filter_by_level(self, entry: LogEntry) -> bool:
         """根据日志级别过滤
@@ -104,35 +156,35 @@ class LogPreprocessor:
         if not self.enable_pii_masking:
             return text
         
-        masked = text
-        
-        # 替换手机号
-        if self.PHONE_PATTERN.search(masked):
-            masked = self.PHONE_PATTERN.sub('[PHONE]', masked)
-            self.masked_count += 1
+        masked, spans = self.mask_cache(text)
+        if spans:
+            self._count_masked(spans)
         
-        # 替换邮箱
-        if self.EMAIL_PATTERN.search(masked):
-            masked = self.EMAIL_PATTERN.sub('[EMAIL]', masked)
-            self.masked_count += 1
-        
-        # 替换IP地址
-        if self.IP_PATTERN.search(masked):
-            masked = self.IP_PATTERN.sub('[IP]', masked)
-            self.masked_count += 1
+        return masked
+    
+    def _count_masked(self, spans: Tuple[int, ...]):
+        """累计脱敏计数
         
-        # 替换坐标
-        if self.COORD_PATTERN.search(masked):
-            masked = self.COORD_PATTERN.sub('[COORD]', masked)
-            self.masked_count += 1
+        masked_count按"条目×类别"计数（一条日志含多个手机号只计1次），
+        masked_spans按类别记录实际替换的片段数
         
-        return masked
+        Args:
+            spans: PIIMasker.mask返回的各类别片段数
+        """
+        masked_spans = self.masked_spans
+        for category, count in zip(self.pii_masker.categories, spans):
+            if count:
+                self.masked_count += 1
+                masked_spans[category] += count
     
     def deduplicate_logs(self, entries: List[LogEntry]) -> List[LogEntry]:
         """去除重复日志
         
-        策略：如果连续多条日志的(tag, message)完全相同，只保留第一条和最后一条，
-              并在第一条的message中添加"(repeated N times)"标记
+        策略：
+        - consecutive: 如果连续多条日志的(tag, message)完全相同，只保留第一条和最后一条，
+          并在第一条的message中添加"(repeated N times)"标记
+        - window: 滑动窗口内(tag, 归一化message)相同的日志只保留第一条，
+          在其message中添加同样的标记，并填写repeat_count和last_epoch_ms
         
         Args:
             entries: 日志条目列表
@@ -143,48 +195,122 @@ class LogPreprocessor:
         if not self.enable_deduplication or len(entries) < 2:
             return entries
         
+        if self.dedup_mode == 'window':
+            merged = []
+            window = self._new_window()
+            for entry in entries:
+                key = (entry.tag, normalize_message(entry.message))
+                merged.extend(self._merge_group(group) for group in window.add(key, entry.epoch_ms, entry))
+            merged.extend(self._merge_group(group) for group in window.flush())
+            
+            deduplicated = []
+            for entry, repeat_count in merged:
+                if repeat_count:
+                    entry.message = f"{entry.message} (repeated {repeat_count} times)"
+                deduplicated.append(entry)
+        else:
+            deduplicated, _ = self._deduplicate(entries, flush=True)
+        
+        logger.info(f"Deduplication removed {self.deduplicated_count} redundant logs")
+        return deduplicated
+    
+    def _deduplicate(
+        self,
+        entries: List[LogEntry],
+        flush: bool
+    ) -> Tuple[List[LogEntry], List[LogEntry]]:
+        """去重核心逻辑，支持跨批次的连续重复
+        
+        Args:
+            entries: 日志条目列表
+            flush: 是否为最后一批。为False时，末尾尚未结束的重复段不会输出，
+                   而是作为carry返回，由调用方拼接到下一批的开头
+            
+        Returns:
+            (去重后的日志列表, 需要延后处理的末尾日志)
+        """
+        # 创建去重键（tag + message前100字符）
+        keys = [(entry.tag, entry.message[:100]) for entry in entries]
+        plan, carry_start = self._dedup_plan(keys, flush)
+        
         deduplicated = []
+        for index, repeat_count in plan:
+            entry = entries[index]
+            if repeat_count:
+                # 修改第一条的message
+                entry.message = f"{entry.message} (repeated {repeat_count} times)"
+            deduplicated.append(entry)
+        
+        return deduplicated, entries[carry_start:]
+    
+    def _dedup_plan(self, keys: List, flush: bool) -> Tuple[List[Tuple[int, int]], int]:
+        """计算去重方案
+        
+        策略：如果连续多条日志的去重键相同且超过3次，只保留第一条和最后一条
+        
+        Args:
+            keys: 每条日志的去重键
+            flush: 是否为最后一批（见_deduplicate）
+            
+        Returns:
+            ([(保留的下标, 重复次数)], carry起始下标)。重复次数非0表示该条需要添加
+            "(repeated N times)"标记；没有carry时carry起始下标等于len(keys)
+        """
+        plan = []
+        total = len(keys)
         i = 0
         
-        while i < len(entries):
-            current = entries[i]
-            # 创建去重键（tag + message前100字符）
-            dedup_key = (current.tag, current.message[:100])
+        while i < total:
+            dedup_key = keys[i]
             
             # 查找连续重复的日志
-            repeat_count = 1
             j = i + 1
-            while j < len(entries) and j - i < 1000:  # 最多检查1000行
-                next_entry = entries[j]
-                next_key = (next_entry.tag, next_entry.message[:100])
-                
-                if next_key == dedup_key:
-                    repeat_count += 1
-                    j += 1
-                else:
-                    break
+            while j < total and j - i < 1000 and keys[j] == dedup_key:  # 最多检查1000行
+                j += 1
+            repeat_count = j - i
             
-            # 如果有重复（超过3次），添加标记
+            # 重复段延伸到了本批末尾，可能在下一批继续
+            if not flush and j == total and repeat_count < 1000:
+                return plan, i
+            
+            # 如果有重复（超过3次），只保留第一条和最后一条
             if repeat_count > 3:
-                # 修改第一条的message
-                current.message = f"{current.message} (repeated {repeat_count} times)"
-                deduplicated.append(current)
-                
-                # 只保留最后一条
-                if j - 1 < len(entries):
-                    deduplicated.append(entries[j - 1])
-                
+                plan.append((i, repeat_count))
+                plan.append((j - 1, 0))
                 self.deduplicated_count += (repeat_count - 2)
                 i = j
             else:
-                deduplicated.append(current)
+                plan.append((i, 0))
                 i += 1
         
-        logger.info(f"Deduplication removed {self.deduplicated_count} redundant logs")
-        return deduplicated
+        return plan, total
+    
+    def _new_window(self) -> WindowDeduplicator:
+        """新建窗口去重器"""
+        return WindowDeduplicator(self.dedup_window_lines, self.dedup_window_ms)
+    
+    def _close_group(self, group: DedupGroup) -> int:
+        """结束一个窗口去重组，返回代表日志需要标记的重复次数（0表示没有重复）"""
+        if group.count > 1:
+            self.deduplicated_count += group.count - 1
+            return group.count
+        return 0
+    
+    def _merge_group(self, group: DedupGroup) -> Tuple[LogEntry, int]:
+        """结束一个窗口去重组，把重复次数和最后出现的时间记录到代表日志上
+        
+        Returns:
+            (代表日志, 重复次数)，重复次数为0表示不添加标记
+        """
+        entry = group.item
+        repeat_count = self._close_group(group)
+        if repeat_count:
+            entry.repeat_count = repeat_count
+            entry.last_epoch_ms = group.last_ms
+        return entry, repeat_count
     
     def annotate_log(self, entry: LogEntry) -> LogEntry:
-        """标注日志（添加分类信息）
+        """标注日志（填写事件类别位掩码，不修改消息文本）
         
         Args:
             entry: 日志条目
@@ -192,94 +318,499 @@ class LogPreprocessor:
         Returns:
             标注后的日志条目
         """
-        # 检测是否为崩溃相关
-        crash_keywords = ['crash', 'fatal', 'exception', 'sigabrt', 'sigsegv', 'tombstone']
-        if any(keyword in entry.message.lower() for keyword in crash_keywords):
-            entry.message = f"[CRASH] {entry.message}"
-        
-        # 检测是否为ANR（Application Not Responding）
-        if 'anr' in entry.message.lower() or 'not responding' in entry.message.lower():
-            entry.message = f"[ANR] {entry.message}"
-        
-        # 检测是否为内存相关
-        memory_keywords = ['outofmemory', 'oom', 'memory', 'allocation failed']
-        if any(keyword in entry.message.lower().replace(' ', '') for keyword in memory_keywords):
-            entry.message = f"[MEMORY] {entry.message}"
-        
+        entry.category = self.category_cache(entry.message)
         return entry
     
-    def process(self, entries: List[LogEntry]) -> List[LogEntry]:
+    def process(self, entries: List[LogEntry], workers: int = 1) -> List[LogEntry]:
         """执行完整的预处理流程
         
         Args:
             entries: 原始日志条目列表
+            workers: 预处理进程数（1表示单进程，0表示使用全部CPU核心）。
+                     多进程时按PARALLEL_BATCH_SIZE分批交给process_stream，返回新的LogEntry对象
             
         Returns:
             预处理后的日志列表
         """
-        self.total_count = len(entries)
-        logger.info(f"Starting preprocessing {self.total_count} log entries")
+        logger.info(f"Starting preprocessing {len(entries)} log entries")
+        if workers != 1:
+            size = self.PARALLEL_BATCH_SIZE
+            chunks = (entries[i:i + size] for i in range(0, len(entries), size))
+            processed = [entry for batch in self.process_stream(chunks, workers=workers) for entry in batch]
+        else:
+            processed = list(self.iter_process(entries))
+        logger.info(f"Preprocessing complete: {len(processed)} entries remaining "
+                   f"({self.filtered_count} filtered, {self.deduplicated_count} deduplicated)")
+        return processed
+    
+    def iter_process(self, entries: Iterable[LogEntry]) -> Iterator[LogEntry]:
+        """单趟执行预处理流程
+        
+        每条日志只经过一次：过滤、脱敏、模板挖掘、去重、标注和分布统计在同一个循环中完成，
+        不构建中间列表。连续重复段结束后才输出该段保留的日志，因此输出会比输入略有延迟。
+        输出和计数与依次执行各步骤一致。
+        
+        Args:
+            entries: 原始日志条目（可以是任意迭代器）
+            
+        Yields:
+            预处理后的日志条目
+        """
+        self._reset_counters()
+        level_priority = self.level_priority
+        min_priority = self.min_priority
+        filter_tags = self.filter_tags
+        mask = self.mask_pii if self.enable_pii_masking else None
+        mine = self.template_miner.add if self.template_miner is not None else None
+        dedup = self.enable_deduplication
+        window = self._new_window() if dedup and self.dedup_mode == 'window' else None
+        
+        # 当前连续重复段（超过3条后只保留首尾两条）
+        run: List[LogEntry] = []
+        run_key = None
+        run_count = 0
+        
+        for entry in entries:
+            self.total_count += 1
+            
+            # 1-2. 过滤低级别日志和噪音Tag
+            if level_priority.get(entry.level, 0) < min_priority or entry.tag in filter_tags:
+                self.filtered_count += 1
+                continue
+            
+            # 3. PII脱敏
+            if mask is not None:
+                entry.message = mask(entry.message)
+            if mine is not None:
+                entry.template_id = mine(entry.message)
+            
+            if not dedup:
+                yield self._emit_entry(entry, 0)
+                continue
+            
+            # 4. 窗口去重（去重键: tag + 归一化message），输出已结束的组
+            if window is not None:
+                key = (entry.tag, normalize_message(entry.message))
+                for group in window.add(key, entry.epoch_ms, entry):
+                    yield self._emit_entry(*self._merge_group(group))
+                continue
+            
+            # 4. 去重（去重键: tag + message前100字符，最多合并1000行）
+            key = (entry.tag, entry.message[:100])
+            if run_count and key == run_key and run_count < 1000:
+                run_count += 1
+                if run_count <= 3:
+                    run.append(entry)
+                else:
+                    run[1:] = [entry]
+                continue
+            
+            # 5. 标注并输出已结束的重复段
+            for member, repeat_count in self._close_run(run, run_count):
+                yield self._emit_entry(member, repeat_count)
+            run = [entry]
+            run_key = key
+            run_count = 1
+        
+        for member, repeat_count in self._close_run(run, run_count):
+            yield self._emit_entry(member, repeat_count)
+        if window is not None:
+            for group in window.flush():
+                yield self._emit_entry(*self._merge_group(group))
+    
+    def _close_run(self, run: List, run_count: int) -> List[Tuple]:
+        """结束一个连续重复段，返回需要输出的[(日志, 重复次数)]
         
-        # 1. 过滤低级别日志
-        filtered = [e for e in entries if self.filter_by_level(e)]
-        logger.info(f"After level filtering: {len(filtered)} entries")
+        超过3次时只保留第一条和最后一条，第一条需要添加"(repeated N times)"标记
         
-        # 2. 过滤噪音Tag
-        filtered = [e for e in filtered if self.filter_by_tag(e)]
-        logger.info(f"After tag filtering: {len(filtered)} entries")
+        Args:
+            run: 重复段中保留的日志（不超过3条时为全部日志，否则为首尾两条）
+            run_count: 重复段的总条数
+            
+        Returns:
+            [(日志, 重复次数)]，重复次数为0表示不添加标记
+        """
+        if run_count > 3:
+            self.deduplicated_count += run_count - 2
+            return [(run[0], run_count), (run[1], 0)]
+        return [(member, 0) for member in run]
+    
+    def _emit_entry(self, entry: LogEntry, repeat_count: int) -> LogEntry:
+        """标注即将输出的日志并计入分布统计"""
+        if repeat_count:
+            entry.message = f"{entry.message} (repeated {repeat_count} times)"
+        entry.category = self.category_cache(entry.message)
+        self._output_counts[(entry.level, entry.tag)] += 1
+        return entry
+    
+    def _reset_counters(self):
+        """开始新一轮预处理前重置条数和分布统计（脱敏、去重计数保持累计）"""
+        self.total_count = 0
+        self.filtered_count = 0
+        self.pending_count = 0
+        self._output_counts = Counter()
+    
+    def process_stream(
+        self,
+        batches: Iterable[Union[LogBatch, List[LogEntry]]],
+        workers: int = 1
+    ) -> Iterator[LogBatch]:
+        """流式执行预处理流程（列式）
+        
+        逐批处理日志，每批只遍历一次（见_process_batch），输出结果与对全部日志调用process()一致，
+        跨批次的（连续或窗口内的）重复日志同样会被正确去重。
+        空批次表示数据源暂时没有新数据（如实时跟随模式），
+        此时立即输出去重时暂存的末尾日志，而不是等待下一批。
+        每次产出时pending_count为仍暂存的条数，为0表示已读入的日志都已包含在产出的批次中。
+        输入可以是LogBatch，也可以是行对象列表（如mmap解析器的延迟解码行，
+        此时先按级别和Tag过滤，再把保留下来的行转换为LogBatch）。
+        
+        workers不为1时，无状态的过滤、脱敏和事件分类在进程池中按批次并行执行（见_prepare_batch），
+        依赖前后文的模板挖掘和去重仍在当前进程中按顺序执行，输出和统计与单进程一致。
         
-        self.filtered_count = self.total_count - len(filtered)
+        Args:
+            batches: 原始日志批次迭代器（如LogcatParser.iter_log_batches）
+            workers: 预处理进程数（1表示单进程，0表示使用全部CPU核心）
+            
+        Yields:
+            预处理后的LogBatch
+        """
+        self._reset_counters()
+        workers = workers or os.cpu_count() or 1
+        prepared = workers > 1
+        if prepared:
+            batches = self._iter_prepared(batches, workers)
+        # 尚未结束的重复段：保留的日志、去重键、总条数
+        # （window模式下carry是尚未输出的各组代表日志，分组状态由window保存）
+        carry: Optional[LogBatch] = None
+        run_key = None
+        run_count = 0
+        window = self._new_window() if self.enable_deduplication and self.dedup_mode == 'window' else None
+        
+        for chunk in batches:
+            if not len(chunk):
+                if carry is None:
+                    continue
+                batch, carry, run_key, run_count = self._process_batch(
+                    carry, len(carry), run_key, run_count, flush=True, window=window, prepared=prepared)
+                self.pending_count = len(carry) if carry is not None else 0
+                yield batch
+                continue
+            
+            if not prepared:
+                self.total_count += len(chunk)
+                if not isinstance(chunk, LogBatch):
+                    chunk = self._filter_entries(chunk)
+            
+            # 暂存的重复段拼接到本批开头（改用本批的字符串表，避免重新映射整批数据）
+            start = 0
+            if carry is not None:
+                start = len(carry)
+                chunk = LogBatch.concat([self._rehome(carry, chunk), chunk])
+            
+            batch, carry, run_key, run_count = self._process_batch(
+                chunk, start, run_key, run_count, flush=False, window=window, prepared=prepared)
+            self.pending_count = len(carry) if carry is not None else 0
+            if len(batch):
+                yield batch
+        
+        if carry is not None:
+            batch, _, _, _ = self._process_batch(carry, len(carry), run_key, run_count, flush=True,
+                                                 window=window, prepared=prepared)
+            self.pending_count = 0
+            yield batch
+        
+        logger.info(f"Streaming preprocessing complete: {self.total_count} entries in, "
+                   f"{self.filtered_count} filtered, {self.deduplicated_count} deduplicated")
+    
+    def _process_batch(
+        self,
+        batch: LogBatch,
+        start: int,
+        run_key: Optional[Tuple[str, str]],
+        run_count: int,
+        flush: bool,
+        window: Optional[WindowDeduplicator] = None,
+        prepared: bool = False
+    ) -> Tuple[LogBatch, Optional[LogBatch], Optional[Tuple[str, str]], int]:
+        """对一个批次单趟执行过滤、脱敏、模板挖掘、去重、标注和分布统计
+        
+        脱敏、去重键和标注按message_id缓存，相同的Message在批次内只查找一次；
+        脱敏和标注的结果再由跨批次的LRU缓存按消息文本复用。
         
-        # 3. PII脱敏
-        if self.enable_pii_masking:
-            for entry in filtered:
-                entry.message = self.mask_pii(entry.message)
+        Args:
+            batch: 日志批次，前start行是上一批暂存的重复段（已过滤、脱敏并挖掘模板）
+            start: 暂存的行数
+            run_key: 暂存重复段的去重键
+            run_count: 暂存重复段的总条数（0表示没有）
+            flush: 是否为最后一批。为False时，末尾尚未结束的重复段不会输出，而是暂存到下一批
+            window: window模式的去重器（None表示连续去重）。其中尚未输出的组按顺序对应前start行，
+                    批次结束后组的代表日志改为指向暂存批次中的行
+            prepared: 批次是否已由_prepare_batch过滤、脱敏并计算了事件类别（此时跳过这几步）
+            
+        Returns:
+            (预处理后的批次, 暂存的重复段或None, 其去重键, 其总条数)
+        """
+        levels, tag_ids, message_ids = batch.levels, batch.tag_ids, batch.message_ids
+        template_ids, epoch_ms = batch.template_ids, batch.epoch_ms
+        tags = batch.tags.strings
+        messages = batch.messages
+        min_priority = self.min_priority if not prepared else 0
+        noisy_ids = {i for i, tag in enumerate(tags) if tag in self.filter_tags} if not prepared else set()
+        mask = self.mask_cache if self.enable_pii_masking else None
+        classify = self.category_cache
+        mine = self.template_miner.add if self.template_miner is not None else None
+        dedup = self.enable_deduplication
+        
+        masked_ids: Dict[int, Tuple[int, Tuple[int, ...]]] = {}
+        prefixes: Dict[int, str] = {}
+        categories: Dict[int, int] = {}
+        keep: List[int] = []
+        kept_message_ids = array('i')
+        kept_categories = array('i')
+        # (级别编码, tag_id)组合的输出条数，批次结束时合并到分布统计
+        output_counts: Counter = Counter()
+        
+        def emit(index: int, repeat_count: int):
+            message_id = message_ids[index]
+            if repeat_count:
+                message_id = messages.intern(f"{messages[message_id]} (repeated {repeat_count} times)")
+            if prepared and not repeat_count:
+                category = batch.categories[index]
+            else:
+                category = categories.get(message_id)
+                if category is None:
+                    category = categories[message_id] = classify(messages[message_id])
+            keep.append(index)
+            kept_message_ids.append(message_id)
+            kept_categories.append(category)
+            output_counts[(levels[index], tag_ids[index])] += 1
+        
+        def emit_group(group: DedupGroup):
+            repeat_count = self._close_group(group)
+            if repeat_count:
+                batch.repeat_counts[group.item] = repeat_count
+                batch.last_epoch_ms[group.item] = group.last_ms
+            emit(group.item, repeat_count)
+        
+        run = list(range(start)) if window is None else []
+        for i in range(start, len(batch)):
+            # 1-2. 过滤低级别日志和噪音Tag
+            tag_id = tag_ids[i]
+            if levels[i] < min_priority or tag_id in noisy_ids:
+                self.filtered_count += 1
+                continue
+            
+            # 3. PII脱敏
+            message_id = message_ids[i]
+            if mask is not None and not prepared:
+                result = masked_ids.get(message_id)
+                if result is None:
+                    masked, spans = mask(messages[message_id])
+                    result = masked_ids[message_id] = (messages.intern(masked) if spans else message_id, spans)
+                if result[1]:
+                    # 与逐行脱敏保持相同的计数
+                    self._count_masked(result[1])
+                message_id = message_ids[i] = result[0]
+            if mine is not None:
+                template_ids[i] = mine(messages[message_id])
+            
+            if not dedup:
+                emit(i, 0)
+                continue
+            
+            # 4. 去重（规则与iter_process相同）
+            prefix = prefixes.get(message_id)
+            if prefix is None:
+                message = messages[message_id]
+                prefix = prefixes[message_id] = normalize_message(message) if window is not None else message[:100]
+            key = (tags[tag_id], prefix)
+            if window is not None:
+                for group in window.add(key, epoch_ms[i], i):
+                    emit_group(group)
+                continue
+            if run_count and key == run_key and run_count < 1000:
+                run_count += 1
+                if run_count <= 3:
+                    run.append(i)
+                else:
+                    run[1:] = [i]
+                continue
+            
+            # 5. 标注并输出已结束的重复段
+            for index, repeat_count in self._close_run(run, run_count):
+                emit(index, repeat_count)
+            run = [i]
+            run_key = key
+            run_count = 1
+        
+        carry = None
+        if window is not None:
+            if flush:
+                for group in window.flush():
+                    emit_group(group)
+            elif window.pending:
+                # 尚未输出的组暂存到下一批，代表日志改为指向暂存批次中的行
+                carry = batch.select([group.item for group in window.pending])
+                for index, group in enumerate(window.pending):
+                    group.item = index
+        elif flush:
+            for index, repeat_count in self._close_run(run, run_count):
+                emit(index, repeat_count)
+            run_key, run_count = None, 0
+        elif run_count:
+            carry = batch.select(run)
+        
+        processed = batch.select(keep)
+        processed.message_ids = kept_message_ids
+        processed.categories = kept_categories
+        
+        for (level, tag_id), count in output_counts.items():
+            self._output_counts[(LEVEL_NAMES[level], tags[tag_id])] += count
+        
+        return processed, carry, run_key, run_count
+    
+    @staticmethod
+    def _rehome(carry: LogBatch, batch: LogBatch) -> LogBatch:
+        """把暂存的少量行复制到使用batch字符串表的新批次中"""
+        moved = LogBatch(batch.tags, batch.messages)
+        for (timestamp, epoch_ms, pid, tid, level, tag, message, line_number,
+             category, template_id, repeat_count, last_epoch_ms) in carry.iter_rows():
+            moved.append(timestamp, epoch_ms, pid, tid, level, tag, message, '', line_number,
+                         category, template_id, repeat_count, last_epoch_ms)
+        return moved
+    
+    def _iter_prepared(
+        self,
+        batches: Iterable[Union[LogBatch, List[LogEntry]]],
+        workers: int
+    ) -> Iterator[LogBatch]:
+        """在进程池中并行执行过滤、脱敏和事件分类，按输入顺序产出结果批次
         
-        # 4. 去重
-        deduplicated = self.deduplicate_logs(filtered)
+        子进程的计数（包括子进程中缓存的命中次数）在取回结果时累加到本对象的统计信息中。
+        空批次（暂时没有新数据）在已提交的批次全部取回后原样产出。
         
-        # 5. 标注
-        annotated = [self.annotate_log(e) for e in deduplicated]
+        Args:
+            batches: 原始日志批次迭代器
+            workers: 进程数
+            
+        Yields:
+            已过滤、脱敏并计算了事件类别的LogBatch
+        """
+        masker = self.pii_masker if self.enable_pii_masking else None
+        logger.info(f"Preprocessing in parallel ({workers} workers)")
+        
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(self.min_priority, self.filter_tags, masker, self.classifier, self.message_cache_size)
+        ) as executor:
+            pending = deque()
+            
+            def drain(in_flight: int) -> Iterator[LogBatch]:
+                # 按提交顺序取回结果，直到在途批次不超过in_flight个
+                while len(pending) > in_flight:
+                    batch, counts = pending.popleft().result()
+                    self.total_count += counts['total_count']
+                    self.filtered_count += counts['filtered_count']
+                    self.masked_count += counts['masked_count']
+                    for category, count in zip(self.pii_masker.categories, counts['masked_spans']):
+                        self.masked_spans[category] += count
+                    for cache, (hits, misses) in ((self.mask_cache, counts['mask_cache']),
+                                                  (self.category_cache, counts['category_cache'])):
+                        cache.hits += hits
+                        cache.misses += misses
+                    # 全部被过滤的批次不产出，以免被当作表示暂时没有新数据的空批次
+                    if len(batch):
+                        yield batch
+            
+            for chunk in batches:
+                if not len(chunk):
+                    yield from drain(0)
+                    yield chunk
+                    continue
+                
+                if not isinstance(chunk, LogBatch):
+                    # 行对象列表在当前进程中过滤后再转换为LogBatch；
+                    # 被过滤掉的行计入总条数，保留下来的行由子进程计数
+                    entry_count = len(chunk)
+                    chunk = self._filter_entries(chunk)
+                    self.total_count += entry_count - len(chunk)
+                pending.append(executor.submit(_prepare_batch, chunk))
+                
+                # 保持固定数量的批次在途
+                yield from drain(workers * 2 - 1)
+            
+            yield from drain(0)
+    
+    def _filter_entries(self, entries: List[LogEntry]) -> LogBatch:
+        """按级别和Tag过滤行对象列表，把保留下来的行转换为LogBatch
         
-        logger.info(f"Preprocessing complete: {len(annotated)} entries remaining")
-        return annotated
+        Args:
+            entries: 行对象列表
+            
+        Returns:
+            过滤后的LogBatch
+        """
+        batch = LogBatch.from_entries(
+            e for e in entries if self.filter_by_level(e) and self.filter_by_tag(e))
+        self.filtered_count += len(entries) - len(batch)
+        return batch
     
     def get_statistics(self) -> Dict:
-        """获取预处理统计信息"""
+        """获取预处理统计信息
+        
+        cache为结果缓存的命中统计：并行预处理时各工作进程有各自的缓存（命中和未命中数累计到这里），
+        当前进程的缓存不被填充，因此与单进程运行的cache不同；其他计数与单进程一致。
+        """
         return {
             'total_count': self.total_count,
             'filtered_count': self.filtered_count,
             'deduplicated_count': self.deduplicated_count,
             'masked_count': self.masked_count,
+            'masked_spans': dict(self.masked_spans),
+            'template_count': len(self.template_miner.templates) if self.template_miner is not None else 0,
+            'cache': {'mask': self.mask_cache.stats(), 'category': self.category_cache.stats()},
             'remaining_count': self.total_count - self.filtered_count - self.deduplicated_count
         }
     
-    def analyze_tags(self, entries: List[LogEntry]) -> Dict[str, int]:
+    def analyze_tags(self, entries: Optional[Iterable[LogEntry]] = None) -> Dict[str, int]:
         """分析Tag分布
         
         Args:
-            entries: 日志列表
+            entries: 日志列表（None表示直接使用最近一次预处理时累计的统计）
             
         Returns:
             Tag频率字典
         """
-        tag_counter = Counter(entry.tag for entry in entries)
+        if entries is None:
+            tag_counter = Counter()
+            for (_, tag), count in self._output_counts.items():
+                tag_counter[tag] += count
+        else:
+            tag_counter = Counter(entry.tag for entry in entries)
         return dict(tag_counter.most_common(20))  # 返回Top 20
     
-    def analyze_error_distribution(self, entries: List[LogEntry]) -> Dict:
+    def analyze_error_distribution(self, entries: Optional[Iterable[LogEntry]] = None) -> Dict:
         """分析错误分布
         
         Args:
-            entries: 日志列表
+            entries: 日志列表（None表示直接使用最近一次预处理时累计的统计）
             
         Returns:
             错误统计信息
         """
-        level_counter = Counter(entry.level for entry in entries)
-        
-        # 按模块统计错误
-        error_entries = [e for e in entries if e.level in ['E', 'F']]
-        error_by_tag = Counter(e.tag for e in error_entries)
+        if entries is None:
+            counts = self._output_counts.items()
+        else:
+            counts = Counter((entry.level, entry.tag) for entry in entries).items()
+        
+        # 级别分布和按模块的错误统计在一次遍历中完成
+        level_counter, error_by_tag = Counter(), Counter()
+        for (level, tag), count in counts:
+            level_counter[level] += count
+            if level in ('E', 'F'):
+                error_by_tag[tag] += count
         
         return {
             'level_distribution': dict(level_counter),
@@ -287,6 +818,87 @@ class LogPreprocessor:
             'top_error_tags': dict(error_by_tag.most_common(10))
         }
 
+# 子进程中的预处理配置和结果缓存（由_init_worker设置，在该进程处理的各批次间复用）
+_worker_stage: Optional[Tuple] = None
+
+
+def _init_worker(min_priority: int, filter_tags: Set[str], masker, classifier, cache_size: int):
+    """进程池初始化：保存过滤、脱敏和分类的配置，创建结果缓存"""
+    global _worker_stage
+    mask_cache = LRUCache(masker.mask, cache_size) if masker is not None else None
+    _worker_stage = (min_priority, filter_tags, masker, mask_cache, LRUCache(classifier.classify, cache_size))
+
+
+def _prepare_batch(batch: LogBatch) -> Tuple[LogBatch, Dict]:
+    """按级别和Tag过滤、PII脱敏并计算事件类别（在子进程中执行）
+    
+    与LogPreprocessor._process_batch的前几步相同，脱敏和分类按message_id缓存，
+    并由子进程的LRU缓存跨批次复用。
+    
+    Args:
+        batch: 原始日志批次
+        
+    Returns:
+        (保留下来的批次, 计数)。批次中的Message为脱敏后的文本，categories列为事件类别；
+        计数包括输入条数、过滤条数、脱敏条数、各类别替换的片段数和本批次的缓存命中/未命中次数
+    """
+    min_priority, filter_tags, masker, mask_cache, category_cache = _worker_stage
+    levels, tag_ids, message_ids = batch.levels, batch.tag_ids, batch.message_ids
+    messages = batch.messages
+    noisy_ids = {i for i, tag in enumerate(batch.tags.strings) if tag in filter_tags}
+    
+    masked_ids: Dict[int, Tuple[int, Tuple[int, ...]]] = {}
+    categories: Dict[int, int] = {}
+    keep: List[int] = []
+    kept_message_ids = array('i')
+    kept_categories = array('i')
+    masked_count = 0
+    masked_spans = [0] * (len(masker.categories) if masker is not None else 0)
+    
+    for i in range(len(batch)):
+        if levels[i] < min_priority or tag_ids[i] in noisy_ids:
+            continue
+        
+        message_id = message_ids[i]
+        if masker is not None:
+            result = masked_ids.get(message_id)
+            if result is None:
+                masked, spans = mask_cache(messages[message_id])
+                result = masked_ids[message_id] = (messages.intern(masked) if spans else message_id, spans)
+            for j, count in enumerate(result[1]):
+                if count:
+                    masked_count += 1
+                    masked_spans[j] += count
+            message_id = result[0]
+        
+        category = categories.get(message_id)
+        if category is None:
+            category = categories[message_id] = category_cache(messages[message_id])
+        keep.append(i)
+        kept_message_ids.append(message_id)
+        kept_categories.append(category)
+    
+    prepared = batch.select(keep)
+    prepared.message_ids = kept_message_ids
+    prepared.categories = kept_categories
+    return prepared.compact(), {
+        'total_count': len(batch),
+        'filtered_count': len(batch) - len(keep),
+        'masked_count': masked_count,
+        'masked_spans': masked_spans,
+        'mask_cache': _take_cache_counts(mask_cache),
+        'category_cache': _take_cache_counts(category_cache),
+    }
+
+
+def _take_cache_counts(cache: Optional[LRUCache]) -> Tuple[int, int]:
+    """取出子进程缓存自上次取出以来的(命中, 未命中)次数"""
+    if cache is None:
+        return 0, 0
+    counts = (cache.hits, cache.misses)
+    cache.hits = cache.misses = 0
+    return counts
+
 
 def main():
     """测试函数"""
@@ -318,21 +930,28 @@ def main():
     print(f"总条数: {stats['total_count']}")
     print(f"过滤掉: {stats['filtered_count']}")
     print(f"去重: {stats['deduplicated_count']}")
-    print(f"脱敏: {stats['masked_count']}")
+    print(f"脱敏: {stats['masked_count']} {stats['masked_spans']}")
     print(f"保留: {stats['remaining_count']}")
+    print(f"模板: {stats['template_count']}")
+    print(f"结果缓存: {stats['cache']}")
     
-    # Tag分布
-    tag_dist = preprocessor.analyze_tags(processed)
+    # Tag分布（使用预处理时累计的统计）
+    tag_dist = preprocessor.analyze_tags()
     print("\n=== Top 10 Tags ===")
     for tag, count in list(tag_dist.items())[:10]:
         print(f"{tag}: {count}")
     
     # 错误分布
-    error_dist = preprocessor.analyze_error_distribution(processed)
+    error_dist = preprocessor.analyze_error_distribution()
     print(f"\n=== 错误统计 ===")
     print(f"级别分布: {error_dist['level_distribution']}")
     print(f"总错误数: {error_dist['total_errors']}")
     print(f"错误Top Tags: {error_dist['top_error_tags']}")
+    
+    # 日志条数最多的模板
+    print("\n=== Top 5 模板 ===")
+    for template in sorted(preprocessor.template_miner.templates, key=lambda t: -t.count)[:5]:
+        print(f"[{template.template_id}] x{template.count}: {template.template}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,207 @@
+"""
+日志模板挖掘（Drain）
+
+在线增量地把日志消息归并为模板，例如
+    "Connection unstable, RSSI: -85dBm" / "Connection unstable, RSSI: -72dBm"
+归并为 "Connection unstable, RSSI: <*>"。
+
+采用Drain的固定深度解析树：先按token数分组，再按开头的若干个token逐层分支，
+叶节点中按token相似度选择最接近的模板；相似度不足时新建模板，
+足够时把不一致的位置泛化为<*>。每个模板有一个从1开始的稳定ID，
+模板文本随后续日志泛化时ID不变。
+
+作者: Log Analysis Team
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+# 参数占位符
+PARAM = '<*>'
+
+# 数字、十六进制数、版本号/IP等数字序列预先替换为占位符
+NUMBER_PATTERN = re.compile(r'\b(?:0[xX][0-9a-fA-F]+|\d+(?:[.:]\d+)*)\b')
+
+
+@dataclass
+class LogTemplate:
+    """日志模板"""
+    template_id: int  # 模板ID（从1开始）
+    tokens: List[str]  # 模板token，参数位置为<*>
+    count: int = 0  # 归入该模板的日志条数
+
+    @property
+    def template(self) -> str:
+        """模板文本"""
+        return ' '.join(self.tokens)
+
+
+class TemplateMiner:
+    """Drain在线模板挖掘器
+
+    相同的消息直接命中缓存，不再遍历解析树。
+    """
+
+    def __init__(
+        self,
+        depth: int = 4,
+        similarity_threshold: float = 0.4,
+        max_children: int = 100,
+        cache_size: int = 100000
+    ):
+        """初始化挖掘器
+
+        Args:
+            depth: 解析树深度（包括按token数分组的一层和叶节点，至少为3）
+            similarity_threshold: 归入已有模板所需的最小token相似度
+            max_children: 每个内部节点的最大子节点数，超出后新token统一走<*>分支
+            cache_size: 消息 -> 模板ID缓存的最大条数（超出后清空重建）
+        """
+        self.max_prefix = max(depth - 2, 1)
+        self.similarity_threshold = similarity_threshold
+        self.max_children = max_children
+        self.cache_size = cache_size
+
+        self.templates: List[LogTemplate] = []
+        # 解析树: {token数: {token: ... {token: [LogTemplate]}}}
+        self._root: Dict[int, Dict] = {}
+        self._cache: Dict[str, LogTemplate] = {}
+        # 新建或发生变化、尚未被pop_changed取走的模板ID
+        self._changed = set()
+        self._param_patterns: Dict[int, re.Pattern] = {}
+
+    def add(self, message: str) -> int:
+        """把一条消息归入模板并计数
+
+        Args:
+            message: 日志消息
+
+        Returns:
+            模板ID
+        """
+        template = self._cache.get(message)
+        if template is None:
+            template = self._match_or_create(message)
+            if len(self._cache) >= self.cache_size:
+                self._cache.clear()
+            self._cache[message] = template
+        template.count += 1
+        self._changed.add(template.template_id)
+        return template.template_id
+
+    def _match_or_create(self, message: str) -> LogTemplate:
+        """在解析树中查找最接近的模板，必要时泛化或新建"""
+        tokens = NUMBER_PATTERN.sub(PARAM, message).split()
+        leaf = self._leaf(tokens)
+
+        best, best_similarity, best_params = None, -1.0, -1
+        for template in leaf:
+            similarity, params = self._similarity(template.tokens, tokens)
+            if similarity > best_similarity or (similarity == best_similarity and params > best_params):
+                best, best_similarity, best_params = template, similarity, params
+
+        if best is not None and best_similarity >= self.similarity_threshold:
+            merged = [t if t == token else PARAM for t, token in zip(best.tokens, tokens)]
+            if merged != best.tokens:
+                best.tokens = merged
+                self._param_patterns.pop(best.template_id, None)
+            return best
+
+        template = LogTemplate(len(self.templates) + 1, tokens)
+        self.templates.append(template)
+        leaf.append(template)
+        return template
+
+    def _leaf(self, tokens: List[str]) -> List[LogTemplate]:
+        """沿解析树找到（必要时创建）消息所属的叶节点"""
+        node = self._root.setdefault(len(tokens), {})
+        prefix = tokens[:self.max_prefix]
+        for depth, token in enumerate(prefix):
+            # 含数字的token多半是参数，不作为分支
+            if any(char.isdigit() for char in token):
+                token = PARAM
+            child = node.get(token)
+            if child is None:
+                if len(node) >= self.max_children:
+                    token = PARAM
+                child = node.get(token)
+                if child is None:
+                    child = node[token] = [] if depth == len(prefix) - 1 else {}
+            node = child
+        if isinstance(node, dict):
+            # 空消息：token数为0，直接挂在该层
+            node = node.setdefault(PARAM, [])
+        return node
+
+    @staticmethod
+    def _similarity(template_tokens: List[str], tokens: List[str]) -> tuple:
+        """(相同token占比, 模板中参数个数)"""
+        if not tokens:
+            return 1.0, 0
+        same = params = 0
+        for t, token in zip(template_tokens, tokens):
+            if t == PARAM:
+                params += 1
+            elif t == token:
+                same += 1
+        return same / len(tokens), params
+
+    def get(self, template_id: int) -> Optional[LogTemplate]:
+        """按ID获取模板"""
+        if 0 < template_id <= len(self.templates):
+            return self.templates[template_id - 1]
+        return None
+
+    def extract_parameters(self, template_id: int, message: str) -> Optional[List[str]]:
+        """提取消息中与模板<*>对应的参数
+
+        Args:
+            template_id: 模板ID
+            message: 日志消息
+
+        Returns:
+            参数列表，消息与模板不匹配时返回None
+        """
+        pattern = self._param_patterns.get(template_id)
+        if pattern is None:
+            template = self.get(template_id)
+            if template is None:
+                return None
+            parts = [re.escape(part) for part in template.template.split(PARAM)]
+            pattern = re.compile(r'\s*' + r'(.*?)'.join(p.replace(r'\ ', r'\s+') for p in parts) + r'\s*$')
+            self._param_patterns[template_id] = pattern
+        match = pattern.match(message)
+        return list(match.groups()) if match else None
+
+    def pop_changed(self) -> List[LogTemplate]:
+        """取出自上次调用以来新建、泛化或计数发生变化的模板（用于增量持久化）"""
+        changed = [self.templates[template_id - 1] for template_id in sorted(self._changed)]
+        self._changed.clear()
+        return changed
+
+
+def main():
+    """测试函数"""
+    miner = TemplateMiner()
+    messages = [
+        "Connection unstable, RSSI: -85dBm",
+        "Connection stable, RSSI: -65dBm",
+        "Killing com.example.unusedapp (PID 10123)",
+        "Killing com.android.music (PID 2345)",
+        "Camera device 0 registered (rear camera)",
+        "Camera device 1 registered (front camera)",
+        "Battery level: 25%",
+        "Battery level: 24%",
+    ]
+    for message in messages:
+        template_id = miner.add(message)
+        print(f"{template_id:3d} {message}  ->  {miner.extract_parameters(template_id, message)}")
+
+    print("\n=== 模板 ===")
+    for template in miner.templates:
+        print(f"{template.template_id:3d} x{template.count}: {template.template}")
+
+
+if __name__ == "__main__":
+    main()
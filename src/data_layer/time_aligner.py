@@ -4,19 +4,24 @@
 功能:
 1. 统一不同来源日志的时间基准
 2. 处理时区差异
-3. 计算时间偏移量
-
-注：当前MVP版本主要处理单一日志文件，
-    后续版本将支持多文件的时间对齐（如AP侧和MCU侧日志）
+3. 计算时间偏移量（按事件频率的互相关估计不同日志源之间的时钟偏差）
+4. 多源日志按时间流式合并（如AP侧、MCU侧和内核日志）
 
 作者: Log Analysis Team
 """
 
+import heapq
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from typing import Collection, Iterable, Iterator, List, Dict, Optional, Sequence, Set, Tuple, Union
+
+import numpy as np
 from loguru import logger
 
-from src.data_layer.parsers.logcat_parser import LogEntry
+from src.data_layer.log_batch import LogBatch
+from src.data_layer.parsers.logcat_parser import NO_EPOCH, LogEntry
+
+# 参与偏移估计的日志源：LogBatch、LogBatch序列或日志条目序列
+AlignSource = Union[LogBatch, Sequence[LogBatch], Sequence[LogEntry]]
 
 
 class TimeAligner:
@@ -25,6 +30,13 @@ class TimeAligner:
     用于处理多个日志文件的时间同步问题
     """
     
+    # 每个日志源的重排缓冲区大小：源内乱序不超过该行数的日志可以被纠正
+    DEFAULT_REORDER_WINDOW = 256
+    # 偏移估计时事件计数的时间粒度（毫秒），也是估计结果的精度
+    DEFAULT_BIN_MS = 100
+    # 每个源的最大分箱数：时间跨度过大时自动加大粒度，限制内存占用
+    MAX_BINS = 1 << 24
+    
     def __init__(self, reference_year: int = 2025):
         """初始化时间对齐器
         
@@ -33,6 +45,7 @@ class TimeAligner:
         """
         self.reference_year = reference_year
         self.time_offset_map: Dict[str, timedelta] = {}  # 文件名 -> 时间偏移
+        self.source_names: List[str] = []  # 源编号(source_id) -> 源名称，由最近一次合并填写
         
         logger.info(f"TimeAligner initialized (reference_year={reference_year})")
     
@@ -62,43 +75,238 @@ class TimeAligner:
         
         return timedelta(0)
     
+    def estimate_offset(
+        self,
+        reference: AlignSource,
+        source: AlignSource,
+        bin_ms: int = DEFAULT_BIN_MS,
+        max_offset_ms: Optional[int] = None,
+        tags: Optional[Collection[str]] = None,
+        keywords: Optional[Collection[str]] = None,
+        shared_tags: bool = False
+    ) -> Optional[timedelta]:
+        """按事件频率的互相关估计source相对reference的时钟偏移
+        
+        两个源的日志时间各自按bin_ms分箱计数（减去均值），用FFT计算所有时延下的互相关，
+        取相关性最大的时延。不要求两个源同时开始，也不要求记录相同的日志，
+        只要它们对同一批事件（启动、报错风暴、周期性任务等）有反应即可。
+        LogBatch的时间列直接作为NumPy数组使用，不逐行转换。
+        
+        Args:
+            reference: 基准日志源
+            source: 待对齐的日志源
+            bin_ms: 分箱粒度（毫秒）
+            max_offset_ms: 偏移量绝对值的上限（None表示不限）
+            tags: 只统计这些Tag的日志
+            keywords: 只统计消息中含有这些关键词（忽略大小写）的日志；与tags同时指定时满足其一即可
+            shared_tags: 只统计两个源共有的Tag（与tags同时指定时取交集）
+            
+        Returns:
+            应加到source上的时间偏移量；没有可用的日志或事件频率没有起伏时返回None
+        """
+        reference, source = self._materialize(reference), self._materialize(source)
+        if shared_tags:
+            common = self._tag_set(reference) & self._tag_set(source)
+            tags = common if tags is None else common & set(tags)
+        keywords = [keyword.lower() for keyword in keywords] if keywords else None
+        
+        reference_ms = self._event_times(reference, tags, keywords)
+        source_ms = self._event_times(source, tags, keywords)
+        if not len(reference_ms) or not len(source_ms):
+            logger.warning("No events available for offset estimation")
+            return None
+        
+        result = self._cross_correlate(reference_ms, source_ms, bin_ms, max_offset_ms)
+        if result is None:
+            logger.warning("Event rates are flat, cannot estimate offset")
+            return None
+        offset_ms, score = result
+        offset = timedelta(milliseconds=offset_ms)
+        logger.info(f"Estimated time offset: {offset} (correlation={score:.3f}, "
+                    f"events={len(reference_ms)}/{len(source_ms)})")
+        return offset
+    
+    @staticmethod
+    def _materialize(source: AlignSource) -> Union[List[LogBatch], Sequence[LogEntry]]:
+        """把日志源统一为LogBatch列表或日志条目序列"""
+        if isinstance(source, LogBatch):
+            return [source]
+        if not isinstance(source, (list, tuple)):
+            source = list(source)
+        return source
+    
+    @staticmethod
+    def _tag_set(source: Union[List[LogBatch], Sequence[LogEntry]]) -> Set[str]:
+        """日志源中出现过的Tag"""
+        if source and isinstance(source[0], LogBatch):
+            tags = set()
+            for batch in source:
+                tag_ids = np.unique(np.frombuffer(batch.tag_ids, dtype=np.int32))
+                tags.update(batch.tags[tag_id] for tag_id in tag_ids.tolist())
+            return tags
+        return {entry.tag for entry in source}
+    
+    def _event_times(
+        self,
+        source: Union[List[LogBatch], Sequence[LogEntry]],
+        tags: Optional[Collection[str]],
+        keywords: Optional[List[str]]
+    ) -> np.ndarray:
+        """日志源中（经Tag/关键词筛选后）各条日志的毫秒时间戳（去掉无法解析的时间）"""
+        if source and isinstance(source[0], LogBatch):
+            parts = [self._batch_event_times(batch, tags, keywords) for batch in source]
+            return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+        
+        if tags is None and keywords is None:
+            times = np.fromiter((entry.epoch_ms for entry in source), dtype=np.int64, count=len(source))
+        else:
+            matched: Dict[str, bool] = {}
+            
+            def selected(entry) -> bool:
+                if tags is not None and entry.tag in tags:
+                    return True
+                if keywords is None:
+                    return False
+                hit = matched.get(entry.message)
+                if hit is None:
+                    message = entry.message.lower()
+                    hit = matched[entry.message] = any(keyword in message for keyword in keywords)
+                return hit
+            
+            times = np.fromiter((entry.epoch_ms for entry in source if selected(entry)), dtype=np.int64)
+        return times[times != NO_EPOCH]
+    
+    @staticmethod
+    def _batch_event_times(
+        batch: LogBatch,
+        tags: Optional[Collection[str]],
+        keywords: Optional[List[str]]
+    ) -> np.ndarray:
+        """批次中（经Tag/关键词筛选后）各行的毫秒时间戳（去掉无法解析的时间）"""
+        times = np.frombuffer(batch.epoch_ms, dtype=np.int64)
+        keep = times != NO_EPOCH
+        if tags is not None or keywords is not None:
+            # 按字符串表判断一次，再按ID整列筛选
+            selected = np.zeros(len(batch), dtype=bool)
+            if tags is not None:
+                tag_ids = [i for i, tag in enumerate(batch.tags.strings) if tag in tags]
+                selected |= np.isin(np.frombuffer(batch.tag_ids, dtype=np.int32), tag_ids)
+            if keywords is not None:
+                message_ids = [
+                    i for i, message in enumerate(batch.messages.strings)
+                    if any(keyword in message.lower() for keyword in keywords)
+                ]
+                selected |= np.isin(np.frombuffer(batch.message_ids, dtype=np.int32), message_ids)
+            keep &= selected
+        return times[keep]
+    
+    def _cross_correlate(
+        self,
+        reference_ms: np.ndarray,
+        source_ms: np.ndarray,
+        bin_ms: int,
+        max_offset_ms: Optional[int]
+    ) -> Optional[Tuple[int, float]]:
+        """FFT互相关，返回(偏移毫秒数, 归一化相关系数)，没有有效时延时返回None"""
+        reference_start, source_start = int(reference_ms.min()), int(source_ms.min())
+        span = max(int(reference_ms.max()) - reference_start, int(source_ms.max()) - source_start)
+        if span // bin_ms >= self.MAX_BINS:
+            bin_ms = span // self.MAX_BINS + 1
+            logger.warning(f"Time span too large, using {bin_ms}ms bins for offset estimation")
+        
+        reference_counts = np.bincount((reference_ms - reference_start) // bin_ms).astype(np.float64)
+        source_counts = np.bincount((source_ms - source_start) // bin_ms).astype(np.float64)
+        reference_counts -= reference_counts.mean()
+        source_counts -= source_counts.mean()
+        norm = np.linalg.norm(reference_counts) * np.linalg.norm(source_counts)
+        if norm == 0:
+            return None
+        
+        # 补零到2的幂，避免循环相关的回绕
+        n_reference, n_source = len(reference_counts), len(source_counts)
+        size = 1 << (n_reference + n_source - 1).bit_length()
+        correlation = np.fft.irfft(
+            np.conj(np.fft.rfft(reference_counts, size)) * np.fft.rfft(source_counts, size), size
+        )
+        # correlation[k] = sum(reference[i] * source[i + k])，负时延位于末尾
+        lags = np.concatenate((np.arange(n_source), np.arange(-(n_reference - 1), 0)))
+        values = np.concatenate((correlation[:n_source], correlation[size - n_reference + 1:]))
+        # source分箱i + k与reference分箱i对应同一时刻
+        offsets = (reference_start - source_start) - lags * bin_ms
+        if max_offset_ms is not None:
+            allowed = np.abs(offsets) <= max_offset_ms
+            if not allowed.any():
+                return None
+            values = np.where(allowed, values, -np.inf)
+        
+        best = int(np.argmax(values))
+        return int(offsets[best]), float(values[best] / norm)
+    
     def apply_offset(
         self,
-        entries: List[LogEntry],
+        entries: Union[List[LogEntry], LogBatch],
         offset: timedelta
-    ) -> List[LogEntry]:
+    ) -> Union[List[LogEntry], LogBatch]:
         """应用时间偏移
         
+        LogBatch直接在毫秒时间列上整列平移（时间戳字符串按需生成）。
+        日志条目列表的时间保存在各个对象上，只能逐条修改（时间戳字符串每秒只格式化一次），
+        大批量日志应以LogBatch传入。两种输入平移的字段相同（包括去重的最后时间）。
+        
         Args:
-            entries: 日志条目列表
+            entries: 日志条目列表或LogBatch
             offset: 时间偏移量
             
         Returns:
-            调整后的日志列表
+            调整后的日志列表（原地修改）
         """
         if offset == timedelta(0):
             return entries
         
         logger.info(f"Applying time offset: {offset} to {len(entries)} entries")
         
+        offset_ms = offset // timedelta(milliseconds=1)
+        if isinstance(entries, LogBatch):
+            entries.shift_epoch_ms(offset_ms)
+            return entries
+        
+        last_second = None
+        second_prefix = None
         for entry in entries:
-            if entry.datetime_obj:
-                entry.datetime_obj += offset
-                # 更新时间戳字符串
-                entry.timestamp = entry.datetime_obj.strftime("%m-%d %H:%M:%S.%f")[:-3]
+            datetime_obj = entry.datetime_obj
+            if datetime_obj:
+                datetime_obj += offset
+                entry.datetime_obj = datetime_obj
+                # 更新时间戳字符串（同一秒内复用 "MM-DD HH:MM:SS"）
+                second = datetime_obj.replace(microsecond=0)
+                if second != last_second:
+                    last_second = second
+                    second_prefix = second.strftime("%m-%d %H:%M:%S")
+                entry.timestamp = f"{second_prefix}.{datetime_obj.microsecond // 1000:03d}"
+            if entry.last_epoch_ms != NO_EPOCH:
+                entry.last_epoch_ms += offset_ms
         
         return entries
     
     def align_multiple_sources(
         self,
-        log_sources: Dict[str, List[LogEntry]],
-        reference_source: str
-    ) -> Dict[str, List[LogEntry]]:
+        log_sources: Dict[str, Union[List[LogEntry], LogBatch]],
+        reference_source: str,
+        bin_ms: int = DEFAULT_BIN_MS,
+        max_offset_ms: Optional[int] = None,
+        tags: Optional[Collection[str]] = None,
+        keywords: Optional[Collection[str]] = None,
+        shared_tags: bool = False
+    ) -> Dict[str, Union[List[LogEntry], LogBatch]]:
         """对齐多个日志源的时间
         
+        每个源相对参考源的偏移由estimate_offset按事件频率的互相关估计；
+        无法估计时退回到对齐两个源的第一条日志时间。
+        
         Args:
-            log_sources: 日志源字典 {源名称: 日志列表}
+            log_sources: 日志源字典 {源名称: 日志列表或LogBatch}
             reference_source: 作为基准的日志源名称
+            bin_ms / max_offset_ms / tags / keywords / shared_tags: 见estimate_offset
             
         Returns:
             时间对齐后的日志源字典
@@ -107,14 +315,13 @@ class TimeAligner:
             logger.warning(f"Reference source '{reference_source}' not found")
             return log_sources
         
-        # 获取参考时间（取参考源的第一条日志时间）
         ref_entries = log_sources[reference_source]
-        if not ref_entries or not ref_entries[0].datetime_obj:
+        ref_times = self._event_times(self._materialize(ref_entries), None, None)
+        if not len(ref_times):
             logger.warning("Reference source has no valid datetime")
             return log_sources
         
-        reference_time = ref_entries[0].datetime_obj
-        logger.info(f"Using reference time: {reference_time} from source '{reference_source}'")
+        logger.info(f"Aligning {len(log_sources) - 1} sources to '{reference_source}'")
         
         # 对齐其他源
         aligned_sources = {}
@@ -124,7 +331,12 @@ class TimeAligner:
                 continue
             
             # 计算偏移
-            offset = self.calculate_offset(entries, reference_time)
+            offset = self.estimate_offset(ref_entries, entries, bin_ms=bin_ms, max_offset_ms=max_offset_ms,
+                                          tags=tags, keywords=keywords, shared_tags=shared_tags)
+            if offset is None:
+                times = self._event_times(self._materialize(entries), None, None)
+                offset = timedelta(milliseconds=int(ref_times[0] - times[0])) if len(times) else timedelta(0)
+                logger.info(f"Falling back to first-timestamp offset for '{source_name}': {offset}")
             self.time_offset_map[source_name] = offset
             
             # 应用偏移
@@ -165,28 +377,81 @@ class TimeAligner:
     
     def merge_and_sort(
         self,
-        log_sources: Dict[str, List[LogEntry]]
+        log_sources: Dict[str, Iterable[LogEntry]],
+        reorder_window: int = DEFAULT_REORDER_WINDOW
     ) -> List[LogEntry]:
         """合并多个日志源并按时间排序
         
         Args:
-            log_sources: 日志源字典
+            log_sources: 日志源字典 {源名称: 日志列表或迭代器}
+            reorder_window: 每个源的重排缓冲区大小（见iter_merged）
             
         Returns:
-            合并且排序后的日志列表
+            合并且排序后的日志列表（entry.source_id为所属源在log_sources中的序号）
         """
-        merged = []
-        for source_name, entries in log_sources.items():
-            # 为每条日志添加源标识
-            for entry in entries:
-                entry.tag = f"[{source_name}]{entry.tag}"
-            merged.extend(entries)
-        
-        # 按时间排序
-        merged.sort(key=lambda e: e.datetime_obj if e.datetime_obj else datetime.min)
+        merged = list(self.iter_merged(log_sources, reorder_window))
         
         logger.info(f"Merged {len(merged)} entries from {len(log_sources)} sources")
         return merged
+    
+    def iter_merged(
+        self,
+        log_sources: Dict[str, Iterable[LogEntry]],
+        reorder_window: int = DEFAULT_REORDER_WINDOW
+    ) -> Iterator[LogEntry]:
+        """流式合并多个日志源（k路堆归并）
+        
+        每个源本身基本按时间有序，只需在各源的当前日志之间用堆选出最早的一条，
+        内存占用只与源的个数和重排缓冲区大小有关，不需要把所有源同时读入内存。
+        源内少量乱序的日志先经过一个大小为reorder_window的小顶堆纠正；
+        时间相同的日志按源的顺序、源内的原始顺序输出（与稳定排序一致）。
+        没有时间的日志（如堆栈续行）沿用同一源中前一条日志的时间，紧跟在它后面输出。
+        
+        源标识写入entry.source_id（源在log_sources中的序号，名称见self.source_names），
+        不再修改Tag。
+        
+        Args:
+            log_sources: 日志源字典 {源名称: 日志列表或迭代器}
+            reorder_window: 每个源的重排缓冲区大小（0表示不重排）
+            
+        Yields:
+            按时间排序的日志条目
+        """
+        self.source_names = list(log_sources)
+        streams = [
+            self._iter_source(entries, source_id, reorder_window)
+            for source_id, entries in enumerate(log_sources.values())
+        ]
+        for _, _, _, entry in heapq.merge(*streams):
+            yield entry
+    
+    @staticmethod
+    def _iter_source(
+        entries: Iterable[LogEntry],
+        source_id: int,
+        reorder_window: int
+    ) -> Iterator[Tuple[datetime, int, int, LogEntry]]:
+        """按(时间, 源编号, 源内序号, 日志)产出单个源的日志，经重排缓冲区局部排序"""
+        buffer: List[Tuple[datetime, int, int, LogEntry]] = []
+        current = datetime.min
+        for seq, entry in enumerate(entries):
+            entry.source_id = source_id
+            datetime_obj = entry.datetime_obj
+            if datetime_obj is not None:
+                current = datetime_obj
+            item = (current, source_id, seq, entry)
+            if len(buffer) < reorder_window:
+                heapq.heappush(buffer, item)
+            else:
+                yield heapq.heappushpop(buffer, item)
+        while buffer:
+            yield heapq.heappop(buffer)
+    
+    def source_name(self, entry: LogEntry) -> str:
+        """日志所属源的名称（按最近一次合并的源编号）"""
+        if 0 <= entry.source_id < len(self.source_names):
+            return self.source_names[entry.source_id]
+        return ''
 
 
 def main():
@@ -232,7 +497,7 @@ def main():
     # 显示前5条
     print("\n=== 合并后的前5条日志 ===")
     for entry in merged[:5]:
-        print(f"[{entry.timestamp}] {entry.tag}: {entry.message[:60]}")
+        print(f"[{entry.timestamp}] [{aligner.source_name(entry)}]{entry.tag}: {entry.message[:60]}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,115 @@
+"""
+滑动窗口去重
+
+多线程交错输出时，同一条循环报错往往被其他线程的日志隔开，连续去重无法合并。
+这里按(Tag, 归一化消息)分组：组内第一条日志作为代表，其后window_lines行、
+window_ms毫秒以内出现的相同日志只计数，不再输出；窗口结束时输出代表日志、
+重复次数以及最后一次出现的时间，之后再出现则开始新的一组。
+
+输出保持代表日志原来的先后顺序：较早开始的组尚未结束时，后面已结束的组也要等待，
+因此输出最多延迟一个窗口，内存占用只与窗口大小有关。
+
+作者: Log Analysis Team
+"""
+
+from collections import deque
+from typing import Any, Deque, Dict, Hashable, List
+
+from src.data_layer.parsers.logcat_parser import NO_EPOCH
+from src.data_layer.template_miner import NUMBER_PATTERN, PARAM
+
+
+def normalize_message(message: str) -> str:
+    """归一化消息：数字、十六进制数等替换为<*>，只取前100个字符"""
+    return NUMBER_PATTERN.sub(PARAM, message)[:100]
+
+
+class DedupGroup:
+    """一组重复日志"""
+
+    __slots__ = ('key', 'item', 'first_position', 'first_ms', 'count', 'last_ms', 'open')
+
+    def __init__(self, key: Hashable, item: Any, position: int, epoch_ms: int):
+        self.key = key
+        self.item = item  # 代表日志（日志条目或批次中的行下标，由调用方决定）
+        self.first_position = position
+        self.first_ms = epoch_ms
+        self.count = 1
+        self.last_ms = epoch_ms
+        self.open = True  # 是否还能合并后续日志
+
+
+class WindowDeduplicator:
+    """滑动窗口去重器
+
+    只负责分组，不关心日志的具体表示：add()传入去重键、时间和代表日志，
+    返回已经结束、可以按顺序输出的组。
+    """
+
+    def __init__(self, window_lines: int = 1000, window_ms: int = 10000):
+        """初始化去重器
+
+        Args:
+            window_lines: 组的行数窗口（从代表日志起算，同时也是等待输出的组数上限）
+            window_ms: 组的时间窗口（毫秒，从代表日志起算；时间无法解析的日志只按行数判断）
+        """
+        self.window_lines = window_lines
+        self.window_ms = window_ms
+        self.position = 0
+        # 仍可合并的组: {去重键: 组}
+        self._groups: Dict[Hashable, DedupGroup] = {}
+        # 按代表日志顺序排列的、尚未输出的组
+        self.pending: Deque[DedupGroup] = deque()
+
+    def _expired(self, group: DedupGroup, position: int, epoch_ms: int) -> bool:
+        """组的窗口是否已经结束"""
+        if position - group.first_position >= self.window_lines:
+            return True
+        return (epoch_ms != NO_EPOCH and group.first_ms != NO_EPOCH
+                and epoch_ms - group.first_ms > self.window_ms)
+
+    def add(self, key: Hashable, epoch_ms: int, item: Any) -> List[DedupGroup]:
+        """加入一条日志
+
+        Args:
+            key: 去重键
+            epoch_ms: 毫秒时间戳（NO_EPOCH表示未知）
+            item: 日志（成为新组的代表时保存在组中）
+
+        Returns:
+            本条日志到来后结束的组（按代表日志的顺序）
+        """
+        position = self.position
+        self.position += 1
+
+        pending = self.pending
+        closed = []
+        while pending and (not pending[0].open or self._expired(pending[0], position, epoch_ms)):
+            group = pending.popleft()
+            if group.open:
+                group.open = False
+                del self._groups[group.key]
+            closed.append(group)
+
+        group = self._groups.get(key)
+        if group is not None and self._expired(group, position, epoch_ms):
+            # 时间乱序时较晚的组可能先于队首结束：不再合并，但仍按顺序等待输出
+            group.open = False
+            group = None
+        if group is not None:
+            group.count += 1
+            if epoch_ms != NO_EPOCH:
+                group.last_ms = epoch_ms
+        else:
+            group = self._groups[key] = DedupGroup(key, item, position, epoch_ms)
+            pending.append(group)
+        return closed
+
+    def flush(self) -> List[DedupGroup]:
+        """结束所有组并返回（数据结束或暂时没有新数据时调用）"""
+        closed = list(self.pending)
+        self.pending.clear()
+        self._groups.clear()
+        for group in closed:
+            group.open = False
+        return closed
@@ -8,6 +8,7 @@ Streamlit Web界面
 
 import streamlit as st
 import os
+import threading
 import yaml
 from pathlib import Path
 from datetime import datetime
@@ -131,20 +132,12 @@ def main():
         # 文件上传
         uploaded_file = st.file_uploader(
             "上传日志文件",
-            type=['log', 'txt'],
-            help="支持 .log 和 .txt 格式的Android Logcat日志"
+            type=['log', 'txt', 'gz', 'bz2', 'xz', 'zip'],
+            help="支持 .log 和 .txt 格式的Android Logcat日志，以及 .gz/.bz2/.xz/.zip 压缩包"
         )
         
         if uploaded_file:
-            # 保存上传的文件
-            temp_dir = project_root / "data" / "temp"
-            temp_dir.mkdir(parents=True, exist_ok=True)
-            
-            temp_file_path = temp_dir / uploaded_file.name
-            with open(temp_file_path, 'wb') as f:
-                f.write(uploaded_file.getbuffer())
-            
-            # 加载日志
+            # 加载日志（直接从上传的文件流式解析，压缩包边解压边解析，不落盘）
             if st.button("🚀 解析并加载日志", use_container_width=True):
                 with st.spinner("正在解析日志..."):
                     agent = init_agent()
@@ -152,7 +145,8 @@ def main():
                     # 生成会话ID（使用文件名+时间戳）
                     session_id = f"{uploaded_file.name.split('.')[0]}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
                     
-                    result = agent.load_logs(str(temp_file_path), session_id=session_id)
+                    uploaded_file.seek(0)
+                    result = agent.load_logs(uploaded_file, session_id=session_id)
                     
                     if result['success']:
                         st.success(f"✅ {result['message']}")
@@ -183,6 +177,35 @@ def main():
         
         st.divider()
         
+        # 实时跟随（台架测试时分析持续写入的日志）
+        st.header("📡 实时跟随")
+        follow_path = st.text_input(
+            "日志文件路径",
+            help="跟随持续写入的日志文件（如 adb logcat -v threadtime > bench.log），新日志约1秒内可查询"
+        )
+        
+        if 'follow_stop_event' in st.session_state:
+            if st.button("⏹️ 停止跟随", use_container_width=True):
+                st.session_state.pop('follow_stop_event').set()
+                st.rerun()
+        elif st.button("▶️ 开始跟随", use_container_width=True, disabled=not follow_path):
+            agent = init_agent()
+            session_id = f"follow_{Path(follow_path).stem}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            stop_event = threading.Event()
+            threading.Thread(
+                target=agent.follow_logs,
+                args=(follow_path,),
+                kwargs={'session_id': session_id, 'stop_event': stop_event},
+                daemon=True
+            ).start()
+            
+            st.session_state['follow_stop_event'] = stop_event
+            st.session_state['current_session_id'] = session_id
+            st.session_state['log_loaded'] = True
+            st.rerun()
+        
+        st.divider()
+        
         # 显示当前会话信息
         if 'current_session_id' in st.session_state:
             st.success(f"✅ 当前会话: {st.session_state['current_session_id']}")
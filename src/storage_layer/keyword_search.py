@@ -10,158 +10,1059 @@
 作者: Log Analysis Team
 """
 
+import heapq
+import os
 import sqlite3
-from typing import List, Dict, Optional, Tuple
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from itertools import islice
+from typing import Callable, Iterable, Iterator, List, Dict, Optional, Tuple, TypeVar, Union
 from pathlib import Path
 from loguru import logger
 from datetime import datetime
 
-from src.data_layer.parsers.logcat_parser import LogEntry
+from src.data_layer.incident_classifier import IncidentClassifier
+from src.data_layer.log_batch import LEVEL_CODES, LEVEL_NAMES, LogBatch
+from src.data_layer.parsers.logcat_parser import (
+    NO_EPOCH,
+    LogEntry,
+    datetime_to_epoch_ms,
+    epoch_ms_to_datetime,
+)
+from src.data_layer.template_miner import LogTemplate
+from src.storage_layer.sqlite_pool import SQLitePool
+
+T = TypeVar('T')
 
 
 class KeywordSearchEngine:
     """基于SQLite FTS5的关键词检索引擎
     
     使用SQLite的FTS5（Full-Text Search）扩展实现高效的全文检索
+    
+    时间以整数毫秒时间戳（epoch_ms列）存储和比较，
+    查询结果中的ISO格式datetime字段在返回时才生成。
+    
+    每个会话的日志、Tag字典、模板和全文索引存放在单独的分片数据库文件中，
+    db_path本身是只记录会话、别名和入库缓存的目录库。删除会话就是删除分片文件；
+    不指定会话的查询由线程池在所有分片上并行执行后合并结果。
+    日志id的高位是会话编号（session_key << SESSION_ID_SHIFT），由id即可找到所在分片。
+    
+    数据库访问经SQLitePool（目录库和每个分片各一个）：写操作交给唯一的写线程顺序执行，
+    查询使用每个线程各自的只读连接（WAL快照），入库期间其他线程的搜索不会被阻塞。
+    
+    大量日志入库时使用bulk_load(session_id)：对该会话暂停逐行同步FTS的触发器、放宽同步策略并合并事务，
+    结束时一次性为新插入的行建立全文索引。
+    
+    日志以紧凑格式存储：级别和Tag在logs表中都是整数编码（tags表为字典），
+    不存储原始行；查询结果中的文本字段在返回时还原。
+    
+    每个分片的总条数、时间范围、级别和每分钟条数保存在统计汇总表中，随insert_logs增量更新，
+    get_statistics和get_minute_counts只读取汇总表。
+    """
+    
+    # 目录库格式版本（PRAGMA user_version）：2为按会话分片，1为单文件紧凑格式，0为旧格式
+    SCHEMA_VERSION = 2
+    
+    # 日志id = session_key << SESSION_ID_SHIFT | 分片内序号
+    SESSION_ID_SHIFT = 40
+    
+    # 日志级别编码（按严重程度递增，与LogBatch共用同一张表），logs.level列存储下标
+    LEVELS = tuple(LEVEL_NAMES)
+    LEVEL_CODES = LEVEL_CODES
+    
+    # 查询结果的列和连接：由Tag字典还原Tag（logs表别名为l）
+    LOG_COLUMNS = "l.*, t.tag"
+    LOG_JOINS = "LEFT JOIN tags t ON t.tag_id = l.tag_id"
+    
+    # 插入后同步FTS表的触发器（批量导入期间暂时删除）
+    FTS_INSERT_TRIGGER = """
+        CREATE TRIGGER IF NOT EXISTS logs_ai AFTER INSERT ON logs BEGIN
+            INSERT INTO logs_fts(rowid, tag, message)
+            VALUES (new.id, (SELECT tag FROM tags WHERE tag_id = new.tag_id), new.message);
+        END
     """
     
+    # 批量导入期间的PRAGMA（结束后恢复原值；WAL模式保持不变）
+    BULK_PRAGMAS = {
+        'synchronous': 'OFF',  # 导入中断时会话不会记入入库缓存，可以重新导入
+        'cache_size': -262144,  # 256MB页缓存，减少索引B树的换页
+        'temp_store': 'MEMORY',
+    }
+    
+    # 批量导入时每个事务的最大行数
+    BULK_COMMIT_ROWS = 500000
+    
+    # 跨会话查询的最大并行分片数
+    MAX_QUERY_WORKERS = 8
+    
+    # 同时保持打开的分片数上限：超出时关闭最近最少使用、且没有调用正在使用的分片（写线程和所有连接）
+    MAX_OPEN_SHARDS = 32
+    
     def __init__(self, db_path: str = "./data/logs.db"):
         """初始化搜索引擎
         
         Args:
-            db_path: SQLite数据库路径
+            db_path: 目录库路径（分片文件放在同一目录下的"<文件名>_sessions"目录中）
         """
         self.db_path = db_path
+        self.shard_dir = Path(db_path).parent / f"{Path(db_path).stem}_sessions"
         
         # 确保数据目录存在
-        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.shard_dir.mkdir(parents=True, exist_ok=True)
+        
+        # 已打开的分片（按最近使用排序）: {session_key: 连接池}；_shard_users为正在使用各分片的调用数
+        self._shards: 'OrderedDict[int, SQLitePool]' = OrderedDict()
+        self._shard_users: Counter = Counter()
+        self._shards_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=min(self.MAX_QUERY_WORKERS, os.cpu_count() or 1), thread_name_prefix="shard-query"
+        )
         
-        # 创建数据库连接（允许跨线程使用）
-        self.conn = sqlite3.connect(db_path, check_same_thread=False)
-        self.conn.row_factory = sqlite3.Row  # 以字典形式返回结果
+        # 批量导入状态（见bulk_load）: {session_key: 该会话分片的批量导入状态}
+        self._bulk_states: Dict[int, Dict] = {}
+        self._bulk_lock = threading.Lock()
+        # Tag字典缓存: {session_key: {Tag: tag_id}}，只在对应分片的写线程中访问
+        # （分片关闭时也由_close_shard提交到写线程中丢弃）
+        self._tag_cache: Dict[int, Dict[str, int]] = {}
         
-        # 创建表和索引
-        self._create_tables()
+        # 创建目录库的连接池，并在写连接上创建表（旧格式的数据库在此拆分为分片）
+        self._pool = SQLitePool(db_path, setup=self._create_tables)
         
         logger.info(f"KeywordSearchEngine initialized (db={db_path})")
     
-    def _create_tables(self):
-        """创建数据库表和FTS索引"""
-        cursor = self.conn.cursor()
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """当前线程的目录库只读连接（结果以sqlite3.Row返回）"""
+        return self._pool.reader()
+    
+    def _create_tables(self, conn: sqlite3.Connection):
+        """创建目录库的表（在目录库的写连接上执行）"""
+        cursor = conn.cursor()
+        version = cursor.execute("PRAGMA user_version").fetchone()[0]
+        legacy = cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'logs'").fetchone() is not None
+        if legacy and version == 1:
+            # 单文件紧凑格式的会话表没有AUTOINCREMENT，改名后由拆分时复制编号
+            cursor.execute("ALTER TABLE sessions RENAME TO compact_sessions")
+        
+        # 会话目录：session_key决定分片文件名和日志id的高位，AUTOINCREMENT保证删除后不会复用
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_key INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT NOT NULL UNIQUE
+            )
+        """)
+        
+        # 入库缓存：内容哈希 -> 已入库的会话
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS ingest_cache (
+                content_hash TEXT PRIMARY KEY,
+                session_id TEXT NOT NULL,
+                log_count INTEGER,
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        
+        # 会话别名：重复加载同一内容时，新会话指向已有会话的数据
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS session_aliases (
+                session_id TEXT PRIMARY KEY,
+                target_session_id TEXT NOT NULL
+            )
+        """)
+        
+        # 旧版本的单文件数据库：日志按会话拆分到分片
+        if legacy:
+            self._split_into_shards(conn, version)
+        
+        cursor.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+        conn.commit()
+        logger.info("Session catalog tables created")
+    
+    def _create_shard_tables(self, conn: sqlite3.Connection, session_key: int):
+        """创建分片数据库的表、索引和FTS索引（在分片的写连接上执行）"""
+        cursor = conn.cursor()
         
-        # 主日志表
+        # 主日志表（紧凑格式）：级别、Tag为整数编码，时间为毫秒时间戳；
+        # 不存储原始行（由line_number定位原文件中的行），timestamp只在无法由epoch_ms还原时存储
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS logs (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp TEXT NOT NULL,
-                datetime TEXT,
+                epoch_ms INTEGER,
                 pid INTEGER,
                 tid INTEGER,
-                level TEXT,
-                tag TEXT,
+                level INTEGER,
+                tag_id INTEGER NOT NULL,
                 message TEXT,
-                raw_line TEXT,
                 line_number INTEGER,
-                session_id TEXT,
-                created_at TEXT DEFAULT CURRENT_TIMESTAMP
+                category INTEGER NOT NULL DEFAULT 0,
+                template_id INTEGER NOT NULL DEFAULT 0,
+                repeat_count INTEGER NOT NULL DEFAULT 1,
+                last_epoch_ms INTEGER,
+                timestamp TEXT
+            )
+        """)
+        
+        # 日志id从session_key << SESSION_ID_SHIFT开始分配
+        cursor.execute("""
+            INSERT INTO sqlite_sequence (name, seq)
+            SELECT 'logs', ? WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'logs')
+        """, (session_key << self.SESSION_ID_SHIFT,))
+        
+        # Tag字典：count为该Tag入库的日志条数
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS tags (
+                tag_id INTEGER PRIMARY KEY,
+                tag TEXT NOT NULL UNIQUE,
+                count INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        
+        # 日志模板：count为该模板的日志条数（包括被去重合并的）
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS templates (
+                template_id INTEGER PRIMARY KEY,
+                template TEXT NOT NULL,
+                count INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        
+        # 统计汇总表：与日志在同一个事务中增量更新，get_statistics不再扫描logs；
+        # Tag的计数即tags.count。分片创建于汇总表之前时，由已有日志回填
+        has_stats = cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'session_stats'").fetchone() is not None
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS session_stats (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                total_count INTEGER NOT NULL DEFAULT 0,
+                start_ms INTEGER,
+                end_ms INTEGER
             )
         """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS level_counts (
+                level INTEGER PRIMARY KEY,
+                count INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        # 每分钟的日志条数（minute = epoch_ms // 60000）
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS minute_counts (
+                minute INTEGER PRIMARY KEY,
+                count INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        if not has_stats:
+            self._rebuild_stats(conn)
+        
+        # 时间范围查询：按时间直接定位范围并免去排序
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_epoch_ms
+            ON logs(epoch_ms)
+        """)
+        
+        # 事件类别索引：只包含有类别的日志（通常很少），按时间排列
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_incident
+            ON logs(epoch_ms) WHERE category != 0
+        """)
+        
+        # 模板聚合索引：按级别定位后直接在索引内按模板分组计数，无需回表
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_level_template
+            ON logs(level, template_id)
+        """)
         
-        # 创建索引以加速查询
+        # 带级别过滤的时间范围查询：级别等值定位后按时间范围顺序读取
         cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_datetime 
-            ON logs(datetime)
+            CREATE INDEX IF NOT EXISTS idx_level_epoch
+            ON logs(level, epoch_ms)
         """)
         
+        # 上下文查询：按行号范围读取，免去排序
         cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_level 
-            ON logs(level)
+            CREATE INDEX IF NOT EXISTS idx_line
+            ON logs(line_number)
         """)
         
+        # Tag过滤：在Tag字典中模糊匹配得到tag_id后，按tag_id定位并按时间读取
         cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_tag 
-            ON logs(tag)
+            CREATE INDEX IF NOT EXISTS idx_tag_epoch
+            ON logs(tag_id, epoch_ms)
         """)
         
+        # FTS5全文索引的内容来源：logs表中没有Tag文本，由Tag字典补全
         cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_session 
-            ON logs(session_id)
+            CREATE VIEW IF NOT EXISTS logs_text AS
+            SELECT l.id, t.tag, l.message
+            FROM logs l
+            LEFT JOIN tags t ON t.tag_id = l.tag_id
         """)
         
         # FTS5全文索引表（用于高效的全文搜索）
         cursor.execute("""
             CREATE VIRTUAL TABLE IF NOT EXISTS logs_fts USING fts5(
-                tag, 
+                tag,
                 message,
-                content='logs',
+                content='logs_text',
                 content_rowid='id'
             )
         """)
         
-        # 触发器：自动同步数据到FTS表
-        cursor.execute("""
-            CREATE TRIGGER IF NOT EXISTS logs_ai AFTER INSERT ON logs BEGIN
-                INSERT INTO logs_fts(rowid, tag, message) 
-                VALUES (new.id, new.tag, new.message);
-            END
-        """)
+        # 触发器：自动同步数据到FTS表（批量导入中断后也在此恢复）
+        cursor.execute(self.FTS_INSERT_TRIGGER)
         
         cursor.execute("""
             CREATE TRIGGER IF NOT EXISTS logs_ad AFTER DELETE ON logs BEGIN
-                INSERT INTO logs_fts(logs_fts, rowid, tag, message) 
-                VALUES('delete', old.id, old.tag, old.message);
+                INSERT INTO logs_fts(logs_fts, rowid, tag, message)
+                VALUES('delete', old.id, (SELECT tag FROM tags WHERE tag_id = old.tag_id), old.message);
             END
         """)
         
         cursor.execute("""
             CREATE TRIGGER IF NOT EXISTS logs_au AFTER UPDATE ON logs BEGIN
-                INSERT INTO logs_fts(logs_fts, rowid, tag, message) 
-                VALUES('delete', old.id, old.tag, old.message);
-                INSERT INTO logs_fts(rowid, tag, message) 
-                VALUES (new.id, new.tag, new.message);
+                INSERT INTO logs_fts(logs_fts, rowid, tag, message)
+                VALUES('delete', old.id, (SELECT tag FROM tags WHERE tag_id = old.tag_id), old.message);
+                INSERT INTO logs_fts(rowid, tag, message)
+                VALUES (new.id, (SELECT tag FROM tags WHERE tag_id = new.tag_id), new.message);
             END
         """)
+    
+    def _shard_path(self, session_key: int) -> Path:
+        """会话的分片数据库文件路径"""
+        return self.shard_dir / f"session_{session_key}.db"
+    
+    @contextmanager
+    def _using_shard(self, session_key: Optional[int], create: bool = False) -> Iterator[Optional[SQLitePool]]:
+        """打开（或取得已打开的）会话分片，with语句期间持有（持有中的分片不会被关闭）
+        
+        退出时若打开的分片超过MAX_OPEN_SHARDS，关闭最近最少使用的空闲分片。
+        
+        Args:
+            session_key: 会话编号
+            create: 分片文件不存在时是否创建
+        
+        Yields:
+            分片的连接池，分片不存在（且不创建）时为None
+        """
+        pool = None
+        if session_key is not None:
+            with self._shards_lock:
+                pool = self._shards.get(session_key)
+                if pool is None and (create or self._shard_path(session_key).exists()):
+                    pool = self._shards[session_key] = SQLitePool(
+                        str(self._shard_path(session_key)),
+                        setup=lambda conn: self._create_shard_tables(conn, session_key)
+                    )
+                if pool is not None:
+                    self._shards.move_to_end(session_key)
+                    self._shard_users[session_key] += 1
+        if pool is None:
+            yield None
+            return
+        
+        try:
+            yield pool
+        finally:
+            with self._shards_lock:
+                self._shard_users[session_key] -= 1
+                idle = self._evict_idle_shards()
+            for idle_key, shard in idle:
+                self._close_shard(idle_key, shard)
+    
+    def _evict_idle_shards(self) -> List[Tuple[int, SQLitePool]]:
+        """打开的分片超过MAX_OPEN_SHARDS时，从目录中移除最近最少使用的空闲分片（持有_shards_lock时调用）
+        
+        Returns:
+            被移除、需要由调用方关闭（见_close_shard）的(session_key, 连接池)
+        """
+        evicted = []
+        for session_key in list(self._shards):
+            if len(self._shards) <= self.MAX_OPEN_SHARDS:
+                break
+            if self._shard_users[session_key] <= 0:
+                del self._shard_users[session_key]
+                evicted.append((session_key, self._shards.pop(session_key)))
+        return evicted
+    
+    def _close_shard(self, session_key: int, shard: SQLitePool):
+        """关闭已从目录中移除的分片
+        
+        Tag字典缓存随分片一起丢弃（重新打开时由tags表加载）。丢弃操作提交到分片的写线程，
+        排在已提交的写操作之后执行，因此不会与_register_tags同时访问，也不会被之后的写操作重新填充。
+        """
+        shard.write(lambda conn: self._tag_cache.pop(session_key, None))
+        shard.close()
+    
+    def _split_into_shards(self, conn: sqlite3.Connection, version: int):
+        """把旧版本单文件数据库中的日志按会话拆分到分片，然后删除旧表并回收空间（在目录库的写连接上执行）
+        
+        旧格式（每行存储文本的会话ID、级别、Tag和原始行）和单文件紧凑格式都先转换为
+        统一的临时视图migrate_rows，再逐个会话写入分片；日志id变为session_key << SESSION_ID_SHIFT加原id。
+        """
+        cursor = conn.cursor()
+        start = time.perf_counter()
+        tables = {row['name'] for row in cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        # 迁移中修改旧表时不再维护旧的全文索引（分片的全文索引在拆分后由迁移后的文本重建）
+        for trigger in ('logs_ai', 'logs_ad', 'logs_au'):
+            cursor.execute(f"DROP TRIGGER IF EXISTS main.{trigger}")
+        
+        if version == 0:
+            # 旧版本数据库只有ISO字符串的datetime列，补充epoch_ms列
+            self._migrate_epoch_ms(cursor)
+            # 旧版本数据库的事件类别是消息前缀（[CRASH]等），补充category列并去掉前缀
+            self._migrate_category(cursor)
+            # 旧版本数据库没有模板ID，补充template_id列（旧数据为0，表示未挖掘）
+            self._migrate_template_id(cursor)
+            # 旧版本数据库没有窗口去重的重复次数和最后出现时间
+            self._migrate_repeat_columns(cursor)
+            # 没有会话ID的旧日志归入default会话（与入库时的默认值一致）
+            cursor.execute("UPDATE logs SET session_id = 'default' WHERE session_id IS NULL")
+            
+            level_case = ' '.join(f"WHEN '{level}' THEN {code}" for level, code in self.LEVEL_CODES.items())
+            # 与_format_timestamp一致：能由epoch_ms还原的时间戳文本不再存储
+            cursor.execute(f"""
+                CREATE TEMP VIEW migrate_rows AS
+                SELECT session_id, id, epoch_ms, pid, tid, CASE level {level_case} END AS level,
+                       COALESCE(tag, '') AS tag, message, line_number, category, template_id,
+                       repeat_count, last_epoch_ms,
+                       CASE WHEN epoch_ms IS NOT NULL
+                                 AND timestamp = strftime('%m-%d %H:%M:%S', epoch_ms / 1000, 'unixepoch')
+                                                 || printf('.%03d', epoch_ms % 1000)
+                            THEN NULL ELSE timestamp END AS timestamp
+                FROM main.logs
+            """)
+            cursor.execute("""
+                INSERT OR IGNORE INTO sessions (session_id)
+                SELECT session_id FROM main.logs GROUP BY session_id ORDER BY MIN(id)
+            """)
+        else:
+            # 单文件紧凑格式：沿用原有的session_key
+            cursor.execute("INSERT INTO sessions (session_key, session_id) SELECT session_key, session_id FROM compact_sessions")
+            cursor.execute("""
+                CREATE TEMP VIEW migrate_rows AS
+                SELECT s.session_id, l.id, l.epoch_ms, l.pid, l.tid, l.level, t.tag, l.message, l.line_number,
+                       l.category, l.template_id, l.repeat_count, l.last_epoch_ms, l.timestamp
+                FROM main.logs l
+                JOIN main.compact_sessions s ON s.session_key = l.session_key
+                JOIN main.tags t ON t.session_key = l.session_key AND t.tag_id = l.tag_id
+            """)
+        conn.commit()
+        
+        migrated = 0
+        sessions = cursor.execute("SELECT session_key, session_id FROM sessions ORDER BY session_key").fetchall()
+        for session_key, session_id in sessions:
+            with self._using_shard(session_key, create=True) as shard:
+                # 分片按批量导入处理：结束时一次性建立全文索引
+                state = shard.write(self._begin_bulk_load)
+                cursor.execute("ATTACH DATABASE ? AS shard", (str(self._shard_path(session_key)),))
+                # 与入库时一样，tag_id按Tag在会话中首次出现的顺序分配
+                cursor.execute("""
+                    INSERT INTO shard.tags (tag_id, tag, count)
+                    SELECT ROW_NUMBER() OVER (ORDER BY MIN(id)), tag, COUNT(*)
+                    FROM migrate_rows WHERE session_id = ? GROUP BY tag
+                """, (session_id,))
+                cursor.execute("""
+                    INSERT INTO shard.logs (id, epoch_ms, pid, tid, level, tag_id, message, line_number,
+                                            category, template_id, repeat_count, last_epoch_ms, timestamp)
+                    SELECT (? << ?) + r.id, r.epoch_ms, r.pid, r.tid, r.level, t.tag_id, r.message, r.line_number,
+                           r.category, r.template_id, r.repeat_count, r.last_epoch_ms, r.timestamp
+                    FROM migrate_rows r
+                    JOIN shard.tags t ON t.tag = r.tag
+                    WHERE r.session_id = ?
+                    ORDER BY r.id
+                """, (session_key, self.SESSION_ID_SHIFT, session_id))
+                migrated += cursor.rowcount
+                if 'templates' in tables:
+                    cursor.execute("""
+                        INSERT INTO shard.templates (template_id, template, count)
+                        SELECT template_id, template, count FROM main.templates WHERE session_id = ?
+                    """, (session_id,))
+                conn.commit()
+                cursor.execute("DETACH DATABASE shard")
+                shard.write(lambda shard_conn, state=state: self._finish_split(shard_conn, state))
+        
+        cursor.execute("DROP VIEW temp.migrate_rows")
+        cursor.execute("DROP VIEW IF EXISTS main.logs_text")
+        for table in ('logs_fts', 'logs', 'tags', 'templates', 'compact_sessions'):
+            cursor.execute(f"DROP TABLE IF EXISTS main.{table}")
+        cursor.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+        conn.commit()
+        # 回收旧表占用的空间
+        conn.execute("VACUUM")
+        logger.info(f"Split {migrated} logs of {len(sessions)} sessions into shards "
+                    f"in {time.perf_counter() - start:.2f}s")
+    
+    def _finish_split(self, conn: sqlite3.Connection, state: Dict):
+        """拆分出的分片写入日志后（在分片的写连接上执行）：重新统计汇总表，建立全文索引"""
+        self._rebuild_stats(conn)
+        self._end_bulk_load(conn, state, optimize=True)
+    
+    def _rebuild_stats(self, conn: sqlite3.Connection):
+        """由logs表重新生成分片的统计汇总表（在分片的写连接上执行，由调用方提交）"""
+        conn.execute("DELETE FROM session_stats")
+        conn.execute("DELETE FROM level_counts")
+        conn.execute("DELETE FROM minute_counts")
+        conn.execute("""
+            INSERT INTO session_stats (id, total_count, start_ms, end_ms)
+            SELECT 1, COUNT(*), MIN(epoch_ms), MAX(epoch_ms) FROM logs
+        """)
+        conn.execute("""
+            INSERT INTO level_counts (level, count)
+            SELECT level, COUNT(*) FROM logs WHERE level IS NOT NULL GROUP BY level
+        """)
+        conn.execute("""
+            INSERT INTO minute_counts (minute, count)
+            SELECT epoch_ms / 60000, COUNT(*) FROM logs WHERE epoch_ms IS NOT NULL GROUP BY 1
+        """)
+    
+    def _migrate_epoch_ms(self, cursor: sqlite3.Cursor):
+        """为旧版本的logs表添加epoch_ms列，并由datetime列回填"""
+        columns = {row[1] for row in cursor.execute("PRAGMA table_info(logs)")}
+        if 'epoch_ms' in columns:
+            return
+        
+        cursor.execute("ALTER TABLE logs ADD COLUMN epoch_ms INTEGER")
+        # julianday按UTC换算，与datetime_to_epoch_ms对不带时区时间的处理一致
+        cursor.execute("""
+            UPDATE logs 
+            SET epoch_ms = CAST(round((julianday(datetime) - 2440587.5) * 86400000) AS INTEGER)
+            WHERE datetime IS NOT NULL
+        """)
+        cursor.execute("DROP INDEX IF EXISTS idx_datetime")
+        logger.info("Migrated logs table: added epoch_ms column")
+    
+    def _migrate_category(self, cursor: sqlite3.Cursor):
+        """为旧版本的logs表添加category列，由消息开头的[CRASH]/[ANR]/[MEMORY]前缀回填，并从消息中去掉前缀"""
+        columns = {row[1] for row in cursor.execute("PRAGMA table_info(logs)")}
+        if 'category' in columns:
+            return
+        
+        cursor.execute("ALTER TABLE logs ADD COLUMN category INTEGER NOT NULL DEFAULT 0")
+        # 旧版本按CRASH、ANR、MEMORY的顺序依次添加前缀，最长为"[MEMORY] [ANR] [CRASH] "
+        bits = IncidentClassifier().bits
+        cursor.execute(f"""
+            UPDATE logs 
+            SET category = (instr(substr(message, 1, 23), '[CRASH] ') > 0) * {bits['CRASH']}
+                         | (instr(substr(message, 1, 15), '[ANR] ') > 0) * {bits['ANR']}
+                         | (substr(message, 1, 9) = '[MEMORY] ') * {bits['MEMORY']}
+            WHERE message LIKE '[%'
+        """)
+        # 按前缀在消息中的顺序依次去掉（与category一样只看消息开头）
+        for prefix in ('[MEMORY] ', '[ANR] ', '[CRASH] '):
+            cursor.execute(
+                "UPDATE logs SET message = substr(message, ?) WHERE category != 0 AND substr(message, 1, ?) = ?",
+                (len(prefix) + 1, len(prefix), prefix)
+            )
+        logger.info("Migrated logs table: added category column")
+    
+    def _migrate_template_id(self, cursor: sqlite3.Cursor):
+        """为旧版本的logs表添加template_id列"""
+        columns = {row[1] for row in cursor.execute("PRAGMA table_info(logs)")}
+        if 'template_id' in columns:
+            return
+        
+        cursor.execute("ALTER TABLE logs ADD COLUMN template_id INTEGER NOT NULL DEFAULT 0")
+        logger.info("Migrated logs table: added template_id column")
+    
+    def _migrate_repeat_columns(self, cursor: sqlite3.Cursor):
+        """为旧版本的logs表添加repeat_count和last_epoch_ms列"""
+        columns = {row[1] for row in cursor.execute("PRAGMA table_info(logs)")}
+        if 'repeat_count' in columns:
+            return
+        
+        cursor.execute("ALTER TABLE logs ADD COLUMN repeat_count INTEGER NOT NULL DEFAULT 1")
+        cursor.execute("ALTER TABLE logs ADD COLUMN last_epoch_ms INTEGER")
+        logger.info("Migrated logs table: added repeat_count and last_epoch_ms columns")
+    
+    @staticmethod
+    def _to_epoch_ms(value: Union[str, datetime, int]) -> int:
+        """将查询参数中的时间（ISO字符串/datetime/毫秒时间戳）转换为毫秒时间戳"""
+        if isinstance(value, int):
+            return value
+        if isinstance(value, str):
+            value = datetime.fromisoformat(value)
+        return datetime_to_epoch_ms(value.replace(tzinfo=None))
+    
+    @staticmethod
+    def _format_timestamp(epoch_ms: int) -> str:
+        """由毫秒时间戳还原logcat格式的时间戳文本（MM-DD HH:MM:SS.mmm）"""
+        # isoformat()为YYYY-MM-DDTHH:MM:SS[.ffffff]，切片比strftime快得多
+        iso = epoch_ms_to_datetime(epoch_ms).isoformat()
+        return f"{iso[5:10]} {iso[11:19]}.{epoch_ms % 1000:03d}"
+    
+    @classmethod
+    def _level_name(cls, code: Optional[int]) -> Optional[str]:
+        """级别编码还原为级别字母"""
+        return cls.LEVELS[code] if code is not None else None
+    
+    
+    @classmethod
+    def _rows_to_dicts(cls, rows: Iterable[sqlite3.Row], session_id: str) -> List[Dict]:
+        """查询结果（LOG_COLUMNS）转换为字典列表
+        
+        还原级别字母和未存储的timestamp，补充分片所属的session_id，
+        并由epoch_ms、last_epoch_ms生成ISO格式的datetime、last_datetime字段
+        """
+        logs = []
+        for row in rows:
+            log = dict(row)
+            log['session_id'] = session_id
+            log['level'] = cls._level_name(log['level'])
+            epoch_ms = log.get('epoch_ms')
+            if epoch_ms is not None:
+                iso = log['datetime'] = epoch_ms_to_datetime(epoch_ms).isoformat()
+                if log['timestamp'] is None:
+                    # 同_format_timestamp，复用已生成的ISO字符串
+                    log['timestamp'] = f"{iso[5:10]} {iso[11:19]}.{epoch_ms % 1000:03d}"
+            else:
+                log['datetime'] = None
+            last_epoch_ms = log.get('last_epoch_ms')
+            log['last_datetime'] = (epoch_ms_to_datetime(last_epoch_ms).isoformat()
+                                    if last_epoch_ms is not None else None)
+            logs.append(log)
+        return logs
+    
+    def find_ingest(self, content_hash: str) -> Optional[str]:
+        """查找内容哈希对应的已入库会话
+        
+        Args:
+            content_hash: 入库缓存键（日志内容哈希，通常再加上配置摘要，见ingest_cache_key）
+        
+        Returns:
+            会话ID，未入库（或数据已被清除）时返回None
+        """
+        row = self.conn.execute(
+            "SELECT session_id FROM ingest_cache WHERE content_hash = ?", (content_hash,)
+        ).fetchone()
+        if row is None:
+            return None
+        
+        session_id = row['session_id']
+        with self._using_shard(self._session_key(session_id)) as shard:
+            if shard is None or shard.reader().execute("SELECT 1 FROM logs LIMIT 1").fetchone() is None:
+                return None
+        return session_id
+    
+    def record_ingest(self, content_hash: str, session_id: str, log_count: int):
+        """记录一次完整的入库（内容哈希 -> 会话）
+        
+        Args:
+            content_hash: 入库缓存键（日志内容哈希，通常再加上配置摘要，见ingest_cache_key）
+            session_id: 会话ID
+            log_count: 入库的日志条数
+        """
+        row = (content_hash, self.resolve_session(session_id), log_count)
+        
+        def write(conn: sqlite3.Connection):
+            conn.execute(
+                "INSERT OR REPLACE INTO ingest_cache (content_hash, session_id, log_count) VALUES (?, ?, ?)", row
+            )
+            conn.commit()
+        
+        self._pool.write(write)
+    
+    def alias_session(self, session_id: str, target_session_id: str):
+        """让session_id指向target_session_id的数据（不复制任何日志）
+        
+        Args:
+            session_id: 新会话ID
+            target_session_id: 已有数据的会话ID
+        """
+        target_session_id = self.resolve_session(target_session_id)
+        if session_id == target_session_id:
+            return
+        
+        def write(conn: sqlite3.Connection):
+            conn.execute(
+                "INSERT OR REPLACE INTO session_aliases (session_id, target_session_id) VALUES (?, ?)",
+                (session_id, target_session_id)
+            )
+            conn.commit()
+        
+        self._pool.write(write)
+        logger.info(f"Session {session_id} now refers to {target_session_id}")
+    
+    def resolve_session(self, session_id: Optional[str]) -> Optional[str]:
+        """解析会话别名，返回实际存放数据的会话ID
+        
+        Args:
+            session_id: 会话ID（None原样返回）
+        
+        Returns:
+            实际的会话ID
+        """
+        if session_id is None:
+            return None
+        row = self.conn.execute(
+            "SELECT target_session_id FROM session_aliases WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        return row['target_session_id'] if row else session_id
+    
+    def _session_key(
+        self,
+        session_id: Optional[str],
+        cursor: Optional[Union[sqlite3.Connection, sqlite3.Cursor]] = None
+    ) -> Optional[int]:
+        """查询会话ID（已解析别名）在目录库中的编号
+        
+        Args:
+            session_id: 会话ID
+            cursor: 执行查询的目录库连接或游标（默认使用当前线程的只读连接）
+        
+        Returns:
+            session_key，会话不存在时返回None
+        """
+        if session_id is None:
+            return None
+        row = (cursor or self.conn).execute(
+            "SELECT session_key FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        return row['session_key'] if row else None
+    
+    def _register_session(self, session_id: str) -> int:
+        """取得会话的编号，新会话先在目录库中登记（分片由_using_shard(create=True)创建）
         
-        self.conn.commit()
-        logger.info("Database tables and FTS index created")
+        Returns:
+            session_key
+        """
+        session_key = self._session_key(session_id)
+        if session_key is None:
+            def write(conn: sqlite3.Connection) -> int:
+                conn.execute("INSERT OR IGNORE INTO sessions (session_id) VALUES (?)", (session_id,))
+                conn.commit()
+                return self._session_key(session_id, conn)
+            
+            session_key = self._pool.write(write)
+        return session_key
+    
+    def _session_shards(self, session_id: Optional[str]) -> List[Tuple[str, int]]:
+        """查询涉及的会话
+        
+        Args:
+            session_id: 会话ID（可以是别名；为空时为全部会话）
+        
+        Returns:
+            [(会话ID, session_key)]，会话不存在时为空列表
+        """
+        if session_id:
+            rows = self.conn.execute(
+                "SELECT session_key, session_id FROM sessions WHERE session_id = ?", (self.resolve_session(session_id),)
+            ).fetchall()
+        else:
+            rows = self.conn.execute("SELECT session_key, session_id FROM sessions ORDER BY session_key").fetchall()
+        return [(row['session_id'], row['session_key']) for row in rows]
+    
+    def _fan_out(
+        self,
+        shards: List[Tuple[str, int]],
+        func: Callable[[str, sqlite3.Connection], T]
+    ) -> List[T]:
+        """在每个分片的只读快照上执行func(会话ID, 连接)
+        
+        只有一个分片时直接在当前线程执行，多个分片时由线程池并行执行。
+        
+        Returns:
+            各分片的结果（与shards顺序一致，跳过分片文件不存在的会话）
+        """
+        def run(item: Tuple[str, int]) -> Optional[T]:
+            session_id, session_key = item
+            with self._using_shard(session_key) as shard:
+                if shard is None:
+                    return None
+                with shard.snapshot() as conn:
+                    return func(session_id, conn)
+        
+        results = [run(item) for item in shards] if len(shards) <= 1 else self._executor.map(run, shards)
+        return [result for result in results if result is not None]
+    
+    def _query_logs(self, session_id: Optional[str], query: str, params: List, limit: int) -> List[Dict]:
+        """在会话（未指定时为全部会话）的分片上执行日志查询，按时间合并为前limit条
+        
+        Args:
+            session_id: 会话ID（可以是别名；为空时查询全部会话）
+            query: 选取LOG_COLUMNS的查询，不含ORDER BY和LIMIT
+            params: 查询参数
+            limit: 返回结果数量限制
+        
+        Returns:
+            按epoch_ms排序的日志列表（没有时间的日志在前，与ORDER BY一致）
+        """
+        query += " ORDER BY l.epoch_ms LIMIT ?"
+        params = [*params, limit]
+        results = self._fan_out(
+            self._session_shards(session_id),
+            lambda shard_session_id, conn: self._rows_to_dicts(conn.execute(query, params), shard_session_id)
+        )
+        if len(results) == 1:
+            return results[0]
+        
+        # 各分片的结果已按时间排序，归并即可
+        merged = heapq.merge(*results, key=lambda log: (log['epoch_ms'] is not None, log['epoch_ms'] or 0))
+        return list(islice(merged, limit))
     
-    def insert_logs(self, entries: List[LogEntry], session_id: str = "default") -> int:
+    def insert_logs(self, entries: Union[List[LogEntry], LogBatch], session_id: str = "default") -> int:
         """批量插入日志
         
         Args:
-            entries: 日志条目列表
+            entries: 日志条目列表或LogBatch
             session_id: 会话ID（用于区分不同的日志文件）
-            
+        
         Returns:
             插入的日志条数
         """
-        cursor = self.conn.cursor()
-        
-        insert_data = []
-        for entry in entries:
-            insert_data.append((
-                entry.timestamp,
-                entry.datetime_obj.isoformat() if entry.datetime_obj else None,
-                entry.pid,
-                entry.tid,
-                entry.level,
-                entry.tag,
-                entry.message,
-                entry.raw_line,
-                entry.line_number,
-                session_id
-            ))
-        
-        cursor.executemany("""
-            INSERT INTO logs (timestamp, datetime, pid, tid, level, tag, message, raw_line, line_number, session_id)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, insert_data)
-        
-        self.conn.commit()
+        if isinstance(entries, LogBatch):
+            # 列式批次直接按行取字段，不创建LogEntry对象
+            rows = entries.iter_rows()
+            tag_counts = Counter({entries.tags[i]: n for i, n in Counter(entries.tag_ids).items()})
+        else:
+            rows = ((entry.timestamp, entry.epoch_ms, entry.pid, entry.tid, entry.level,
+                     entry.tag, entry.message, entry.line_number, entry.category,
+                     entry.template_id, entry.repeat_count, entry.last_epoch_ms)
+                    for entry in entries)
+            tag_counts = Counter(entry.tag for entry in entries)
+        
+        session_key = self._register_session(session_id)
+        
+        # 持有分片直到写入提交（未提交的Tag登记不会因分片被关闭而丢失）
+        with self._using_shard(session_key, create=True) as shard:
+            # 批次中出现的Tag先在分片的写线程中登记到字典（新Tag分配编码）
+            tag_ids = shard.write(lambda conn: self._register_tags(conn, session_key, tag_counts))
+            level_codes = self.LEVEL_CODES
+            
+            insert_data = []
+            # 相邻日志大多在同一秒内，按秒缓存时间戳文本的前缀
+            second, prefix = None, None
+            for (timestamp, epoch_ms, pid, tid, level, tag, message, line_number,
+                 category, template_id, repeat_count, last_epoch_ms) in rows:
+                if epoch_ms == NO_EPOCH:
+                    epoch_ms = None
+                else:
+                    if epoch_ms // 1000 != second:
+                        second = epoch_ms // 1000
+                        prefix = self._format_timestamp(second * 1000)[:-3]
+                    # 能由epoch_ms还原的时间戳文本不存储
+                    if timestamp == f"{prefix}{epoch_ms % 1000:03d}":
+                        timestamp = None
+                insert_data.append((
+                    epoch_ms,
+                    pid,
+                    tid,
+                    level_codes[level],
+                    tag_ids[tag],
+                    message,
+                    line_number,
+                    category,
+                    template_id,
+                    repeat_count,
+                    last_epoch_ms if last_epoch_ms != NO_EPOCH else None,
+                    timestamp
+                ))
+            
+            # 统计汇总的增量（级别、每分钟条数、时间范围）
+            level_counts = Counter(row[3] for row in insert_data)
+            epochs = [row[0] for row in insert_data if row[0] is not None]
+            minute_counts = Counter(epoch_ms // 60000 for epoch_ms in epochs)
+            start_ms, end_ms = (min(epochs), max(epochs)) if epochs else (None, None)
+            
+            # 行数据在调用线程中准备好，写线程只负责执行
+            def write(conn: sqlite3.Connection):
+                conn.executemany("""
+                    INSERT INTO logs (epoch_ms, pid, tid, level, tag_id, message, line_number,
+                                      category, template_id, repeat_count, last_epoch_ms, timestamp)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, insert_data)
+                # Tag计数与日志在同一个事务中更新
+                conn.executemany(
+                    "UPDATE tags SET count = count + ? WHERE tag_id = ?",
+                    [(count, tag_ids[tag]) for tag, count in tag_counts.items()]
+                )
+                # 统计汇总表同样在这个事务中累加
+                conn.execute("""
+                    UPDATE session_stats
+                    SET total_count = total_count + ?,
+                        start_ms = COALESCE(MIN(start_ms, ?), start_ms, ?),
+                        end_ms = COALESCE(MAX(end_ms, ?), end_ms, ?)
+                """, (len(insert_data), start_ms, start_ms, end_ms, end_ms))
+                conn.executemany("""
+                    INSERT INTO level_counts (level, count) VALUES (?, ?)
+                    ON CONFLICT(level) DO UPDATE SET count = count + excluded.count
+                """, level_counts.items())
+                conn.executemany("""
+                    INSERT INTO minute_counts (minute, count) VALUES (?, ?)
+                    ON CONFLICT(minute) DO UPDATE SET count = count + excluded.count
+                """, minute_counts.items())
+                
+                state = self._bulk_states.get(session_key)
+                if state is not None:
+                    # 该会话正在批量导入时合并为大事务
+                    state['pending'] += len(insert_data)
+                    if state['pending'] >= self.BULK_COMMIT_ROWS:
+                        conn.commit()
+                        state['pending'] = 0
+                else:
+                    conn.commit()
+            
+            shard.write(write)
         
         logger.info(f"Inserted {len(entries)} log entries (session={session_id})")
         return len(entries)
     
+    def _register_tags(self, conn: sqlite3.Connection, session_key: int, tags: Iterable[str]) -> Dict[str, int]:
+        """在分片的Tag字典中登记Tag（在分片的写连接上执行）
+        
+        Returns:
+            会话的{Tag: tag_id}
+        """
+        known = self._tag_cache.get(session_key)
+        if known is None:
+            known = self._tag_cache[session_key] = {
+                row['tag']: row['tag_id'] for row in conn.execute("SELECT tag, tag_id FROM tags")
+            }
+        
+        new_tags = [tag for tag in tags if tag not in known]
+        if new_tags:
+            next_id = max(known.values(), default=0) + 1
+            for tag_id, tag in enumerate(new_tags, next_id):
+                known[tag] = tag_id
+            conn.executemany("INSERT INTO tags (tag_id, tag) VALUES (?, ?)", [(known[tag], tag) for tag in new_tags])
+        return known
+    
+    @contextmanager
+    def bulk_load(self, session_id: str, optimize: bool = True) -> Iterator[None]:
+        """会话的批量导入模式（with语句中多次调用insert_logs）
+        
+        只影响session_id这一个会话：进入时在其分片上放宽同步策略（BULK_PRAGMAS），
+        删除逐行写入FTS表的触发器；期间该会话的insert_logs每BULK_COMMIT_ROWS行才提交一次，
+        其他会话（包括其他线程的实时跟随）的写入照常逐批提交并立即可查。
+        退出时（包括异常退出）用一条INSERT ... SELECT为新插入的行建立全文索引，恢复触发器和PRAGMA，
+        并可选地合并FTS索引段（optimize）。同一会话嵌套或多个线程同时使用时，
+        第一个进入的调用开始批量导入，最后一个退出的调用结束批量导入。
+        
+        期间该会话新插入的日志在结束前无法被查询到，实时跟随等需要立即可查的场景不应使用。
+        
+        Args:
+            session_id: 批量导入的会话ID
+            optimize: 结束时是否执行FTS optimize（合并索引段，加快后续搜索）
+        """
+        session_key = self._register_session(session_id)
+        # 批量导入期间一直持有分片（未提交的数据不会因分片被关闭而丢失）
+        with self._using_shard(session_key, create=True) as shard:
+            with self._bulk_lock:
+                state = self._bulk_states.get(session_key)
+                if state is None:
+                    state = self._bulk_states[session_key] = shard.write(self._begin_bulk_load)
+                state['depth'] += 1
+            try:
+                yield
+            finally:
+                with self._bulk_lock:
+                    state['depth'] -= 1
+                    # 期间会话被清除时状态已被丢弃
+                    if state['depth'] == 0 and self._bulk_states.get(session_key) is state:
+                        del self._bulk_states[session_key]
+                        shard.write(lambda conn: self._end_bulk_load(conn, state, optimize))
+    
+    def _begin_bulk_load(self, conn: sqlite3.Connection) -> Dict:
+        """开始批量导入（在分片的写连接上执行），返回结束时需要的状态"""
+        conn.commit()
+        previous = {name: conn.execute(f"PRAGMA {name}").fetchone()[0] for name in self.BULK_PRAGMAS}
+        for name, value in self.BULK_PRAGMAS.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        
+        first_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM logs").fetchone()[0]
+        conn.execute("DROP TRIGGER IF EXISTS logs_ai")
+        conn.commit()
+        return {'previous': previous, 'first_id': first_id, 'start': time.perf_counter(), 'pending': 0, 'depth': 0}
+    
+    def _end_bulk_load(self, conn: sqlite3.Connection, state: Dict, optimize: bool):
+        """结束批量导入（在分片的写连接上执行）：补建全文索引，恢复触发器和PRAGMA"""
+        try:
+            # AUTOINCREMENT保证新插入的行id都大于导入前的最大id
+            cursor = conn.execute("""
+                INSERT INTO logs_fts(rowid, tag, message)
+                SELECT id, tag, message FROM logs_text WHERE id > ?
+            """, (state['first_id'],))
+            indexed = cursor.rowcount
+            conn.execute(self.FTS_INSERT_TRIGGER)
+            conn.commit()
+            if optimize:
+                conn.execute("INSERT INTO logs_fts(logs_fts) VALUES('optimize')")
+                conn.commit()
+            logger.info(f"Bulk load finished: {indexed} rows indexed in {time.perf_counter() - state['start']:.2f}s")
+        finally:
+            for name, value in state['previous'].items():
+                conn.execute(f"PRAGMA {name} = {value}")
+    
+    def save_templates(self, session_id: str, templates: Iterable[LogTemplate]):
+        """保存（新增或更新）会话的日志模板
+        
+        Args:
+            session_id: 会话ID
+            templates: 模板列表（如TemplateMiner.pop_changed()的返回值）
+        """
+        rows = [(t.template_id, t.template, t.count) for t in templates]
+        if not rows:
+            return
+        
+        def write(conn: sqlite3.Connection):
+            conn.executemany("""
+                INSERT INTO templates (template_id, template, count) VALUES (?, ?, ?)
+                ON CONFLICT(template_id) DO UPDATE SET template = excluded.template, count = excluded.count
+            """, rows)
+            conn.commit()
+        
+        with self._using_shard(self._register_session(session_id), create=True) as shard:
+            shard.write(write)
+    
+    def get_top_templates(
+        self,
+        session_id: Optional[str] = None,
+        levels: str = 'EF',
+        limit: int = 10
+    ) -> List[Dict]:
+        """按入库日志条数统计出现最多的模板
+        
+        Args:
+            session_id: 会话ID过滤（可选）
+            levels: 参与统计的日志级别（默认只统计E和F）
+            limit: 返回的模板数量
+        
+        Returns:
+            模板列表，每项包含template_id、template、count（入库的该级别日志条数）、
+            total_count（该模板在会话中的全部日志条数，包括被去重合并的）以及一条示例日志
+        """
+        level_list = [self.LEVEL_CODES.get(level) for level in levels]
+        query = f"""
+            SELECT top.template_id, tp.template, top.count, tp.count AS total_count,
+                   l.level, t.tag, l.message AS example
+            FROM (
+                SELECT template_id, COUNT(*) AS count, MIN(id) AS first_id
+                FROM logs
+                WHERE level IN ({','.join('?' * len(level_list))}) AND template_id != 0
+                GROUP BY template_id ORDER BY count DESC LIMIT ?
+            ) AS top
+            JOIN logs l ON l.id = top.first_id
+            {self.LOG_JOINS}
+            LEFT JOIN templates tp ON tp.template_id = top.template_id
+            ORDER BY top.count DESC
+        """
+        params = [*level_list, limit]
+        
+        def top_templates(shard_session_id: str, conn: sqlite3.Connection) -> List[Dict]:
+            return [{'session_id': shard_session_id, **row} for row in map(dict, conn.execute(query, params))]
+        
+        # 每个分片各取前limit个，合并后再取前limit个
+        results = self._fan_out(self._session_shards(session_id), top_templates)
+        templates = heapq.nlargest(limit, (t for result in results for t in result), key=lambda t: t['count'])
+        for template in templates:
+            template['level'] = self._level_name(template['level'])
+        
+        logger.info(f"Top templates (levels={levels}) returned {len(templates)} results")
+        return templates
+    
     def search_keywords(
         self,
         keywords: str,
@@ -181,17 +1082,17 @@ class KeywordSearchEngine:
             start_time: 开始时间 (ISO格式字符串，可选)
             end_time: 结束时间 (ISO格式字符串，可选)
             limit: 返回结果数量限制
-            
+        
         Returns:
             匹配的日志列表
         """
-        cursor = self.conn.cursor()
-        
-        # 构建查询
-        query = """
-            SELECT l.* 
-            FROM logs l
-            JOIN logs_fts fts ON l.id = fts.rowid
+        # 构建查询：CROSS JOIN固定以全文索引为外层，代价取决于命中行数；
+        # 否则规划器可能沿时间索引逐行检查是否命中，罕见关键词时要扫描整个会话
+        query = f"""
+            SELECT {self.LOG_COLUMNS}
+            FROM logs_fts fts
+            CROSS JOIN logs l ON l.id = fts.rowid
+            {self.LOG_JOINS}
             WHERE fts.logs_fts MATCH ?
         """
         
@@ -200,75 +1101,53 @@ class KeywordSearchEngine:
         # 添加过滤条件
         if level:
             query += " AND l.level = ?"
-            params.append(level)
+            params.append(self.LEVEL_CODES.get(level))
         
         if tag:
-            query += " AND l.tag LIKE ?"
+            # Tag先在Tag字典中模糊匹配，日志只按tag_id比较
+            query += " AND l.tag_id IN (SELECT tag_id FROM tags WHERE tag LIKE ?)"
             params.append(f"%{tag}%")
         
         if start_time:
-            query += " AND l.datetime >= ?"
-            params.append(start_time)
+            query += " AND l.epoch_ms >= ?"
+            params.append(self._to_epoch_ms(start_time))
         
         if end_time:
-            query += " AND l.datetime <= ?"
-            params.append(end_time)
-        
-        if session_id:
-            query += " AND l.session_id = ?"
-            params.append(session_id)
-        
-        query += " ORDER BY l.datetime LIMIT ?"
-        params.append(limit)
-        
-        cursor.execute(query, params)
-        results = cursor.fetchall()
+            query += " AND l.epoch_ms <= ?"
+            params.append(self._to_epoch_ms(end_time))
         
-        # 转换为字典列表
-        logs = [dict(row) for row in results]
+        logs = self._query_logs(session_id, query, params, limit)
         
         logger.info(f"Keyword search '{keywords}' returned {len(logs)} results")
         return logs
     
     def get_logs_by_time_range(
         self,
-        start_time: str,
-        end_time: str,
+        start_time: Union[str, datetime, int],
+        end_time: Union[str, datetime, int],
         level: Optional[str] = None,
         session_id: Optional[str] = None,
         limit: int = 100
     ) -> List[Dict]:
-        """根据时间范围获取日志
+        """根据时间范围获取日志（按epoch_ms整数索引做范围查询）
         
         Args:
-            start_time: 开始时间 (ISO格式)
-            end_time: 结束时间 (ISO格式)
+            start_time: 开始时间 (ISO格式、datetime或毫秒时间戳)
+            end_time: 结束时间 (ISO格式、datetime或毫秒时间戳)
             level: 日志级别过滤 (可选)
             limit: 返回结果数量限制
-            
+        
         Returns:
             日志列表
         """
-        cursor = self.conn.cursor()
-        
-        query = "SELECT * FROM logs WHERE datetime >= ? AND datetime <= ?"
-        params = [start_time, end_time]
+        query = f"SELECT {self.LOG_COLUMNS} FROM logs l {self.LOG_JOINS} WHERE l.epoch_ms >= ? AND l.epoch_ms <= ?"
+        params = [self._to_epoch_ms(start_time), self._to_epoch_ms(end_time)]
         
         if level:
-            query += " AND level = ?"
-            params.append(level)
-        
-        if session_id:
-            query += " AND session_id = ?"
-            params.append(session_id)
-        
-        query += " ORDER BY datetime LIMIT ?"
-        params.append(limit)
-        
-        cursor.execute(query, params)
-        results = cursor.fetchall()
+            query += " AND l.level = ?"
+            params.append(self.LEVEL_CODES.get(level))
         
-        logs = [dict(row) for row in results]
+        logs = self._query_logs(session_id, query, params, limit)
         
         logger.info(f"Time range query returned {len(logs)} results")
         return logs
@@ -280,28 +1159,38 @@ class KeywordSearchEngine:
             tag: Tag名称（支持模糊匹配）
             session_id: 会话ID过滤（可选）
             limit: 返回结果数量限制
-            
+        
         Returns:
             日志列表
         """
-        cursor = self.conn.cursor()
-        
-        query = "SELECT * FROM logs WHERE tag LIKE ?"
-        params = [f"%{tag}%"]
-        
-        if session_id:
-            query += " AND session_id = ?"
-            params.append(session_id)
+        # 先在Tag字典中模糊匹配出tag_id，再按(tag_id, epoch_ms)索引读取日志；
+        # CROSS JOIN固定以Tag字典为外层，避免规划器为省去排序而沿时间索引扫描整个会话
+        query = f"""
+            SELECT {self.LOG_COLUMNS} FROM tags t
+            CROSS JOIN logs l ON l.tag_id = t.tag_id
+            WHERE t.tag LIKE ?
+        """
+        logs = self._query_logs(session_id, query, [f"%{tag}%"], limit)
         
-        query += " ORDER BY datetime LIMIT ?"
-        params.append(limit)
+        logger.info(f"Tag filter '{tag}' returned {len(logs)} results")
+        return logs
+    
+    def filter_by_category(self, category_mask: int, session_id: Optional[str] = None, limit: int = 100) -> List[Dict]:
+        """根据事件类别过滤日志（使用类别索引，不做全文匹配）
         
-        cursor.execute(query, params)
+        Args:
+            category_mask: 类别位掩码（命中其中任意一个类别即返回，见IncidentClassifier.mask_of）
+            session_id: 会话ID过滤（可选）
+            limit: 返回结果数量限制
         
-        results = cursor.fetchall()
-        logs = [dict(row) for row in results]
+        Returns:
+            日志列表
+        """
+        # category != 0 与部分索引的条件一致，查询才能使用该索引
+        query = f"SELECT {self.LOG_COLUMNS} FROM logs l {self.LOG_JOINS} WHERE l.category != 0 AND (l.category & ?) != 0"
+        logs = self._query_logs(session_id, query, [category_mask], limit)
         
-        logger.info(f"Tag filter '{tag}' returned {len(logs)} results")
+        logger.info(f"Category filter {category_mask:#x} returned {len(logs)} results")
         return logs
     
     def get_context(self, log_id: int, window_size: int = 50) -> List[Dict]:
@@ -310,14 +1199,26 @@ class KeywordSearchEngine:
         Args:
             log_id: 日志ID
             window_size: 上下文窗口大小（前后各N行）
-            
+        
         Returns:
             包含上下文的日志列表
         """
-        cursor = self.conn.cursor()
-        
-        # 获取目标日志的行号和会话ID
-        cursor.execute("SELECT line_number, session_id FROM logs WHERE id = ?", (log_id,))
+        # 日志id的高位就是所在分片的会话编号
+        session_key = log_id >> self.SESSION_ID_SHIFT
+        row = self.conn.execute("SELECT session_id FROM sessions WHERE session_key = ?", (session_key,)).fetchone()
+        with self._using_shard(session_key if row else None) as shard:
+            if shard is None:
+                logger.warning(f"Log ID {log_id} not found")
+                return []
+            
+            # 两条查询使用同一个快照
+            with shard.snapshot() as conn:
+                return self._get_context(conn.cursor(), row['session_id'], log_id, window_size)
+    
+    def _get_context(self, cursor: sqlite3.Cursor, session_id: str, log_id: int, window_size: int) -> List[Dict]:
+        """get_context的查询部分（在日志所在分片上执行）"""
+        # 获取目标日志的行号
+        cursor.execute("SELECT line_number FROM logs WHERE id = ?", (log_id,))
         row = cursor.fetchone()
         
         if not row:
@@ -325,19 +1226,17 @@ class KeywordSearchEngine:
             return []
         
         target_line = row['line_number']
-        session_id = row['session_id']
         
         # 获取前后N行
-        cursor.execute("""
-            SELECT * FROM logs 
-            WHERE session_id = ? 
-            AND line_number >= ? 
-            AND line_number <= ?
-            ORDER BY line_number
-        """, (session_id, target_line - window_size, target_line + window_size))
+        cursor.execute(f"""
+            SELECT {self.LOG_COLUMNS} FROM logs l {self.LOG_JOINS}
+            WHERE l.line_number >= ?
+            AND l.line_number <= ?
+            ORDER BY l.line_number
+        """, (target_line - window_size, target_line + window_size))
         
         results = cursor.fetchall()
-        logs = [dict(row) for row in results]
+        logs = self._rows_to_dicts(results, session_id)
         
         logger.info(f"Context for log {log_id}: {len(logs)} lines")
         return logs
@@ -347,93 +1246,151 @@ class KeywordSearchEngine:
         
         Args:
             session_id: 会话ID (可选，不指定则统计全部)
-            
+        
         Returns:
             统计信息字典
         """
-        cursor = self.conn.cursor()
+        # 每个分片只读取与日志同一事务更新的统计汇总表（同一个快照），入库进行中也保持一致
+        results = self._fan_out(self._session_shards(session_id), self._get_statistics)
         
-        # 总日志数
-        if session_id:
-            cursor.execute("SELECT COUNT(*) as count FROM logs WHERE session_id = ?", (session_id,))
-        else:
-            cursor.execute("SELECT COUNT(*) as count FROM logs")
-        total_count = cursor.fetchone()['count']
+        level_dist: Counter = Counter()
+        tag_counts: Counter = Counter()
+        for result in results:
+            level_dist.update(result['level_distribution'])
+            tag_counts.update(result['tags'])
+        start_ms = min((r['start_ms'] for r in results if r['start_ms'] is not None), default=None)
+        end_ms = max((r['end_ms'] for r in results if r['end_ms'] is not None), default=None)
+        
+        return {
+            'total_count': sum(result['total_count'] for result in results),
+            'level_distribution': dict(level_dist),
+            'top_tags': dict(tag_counts.most_common(10)),
+            'time_range': {
+                'start': epoch_ms_to_datetime(start_ms).isoformat() if start_ms is not None else None,
+                'end': epoch_ms_to_datetime(end_ms).isoformat() if end_ms is not None else None
+            }
+        }
+    
+    def _get_statistics(self, session_id: str, conn: sqlite3.Connection) -> Dict:
+        """get_statistics在一个分片上的查询部分（只读取统计汇总表，与日志条数无关）"""
+        cursor = conn.cursor()
+        
+        # 总日志数和时间范围
+        cursor.execute("SELECT total_count, start_ms, end_ms FROM session_stats")
+        summary = cursor.fetchone()
         
         # 按级别统计
-        if session_id:
-            cursor.execute("""
-                SELECT level, COUNT(*) as count 
-                FROM logs 
-                WHERE session_id = ?
-                GROUP BY level
-            """, (session_id,))
-        else:
-            cursor.execute("SELECT level, COUNT(*) as count FROM logs GROUP BY level")
-        level_dist = {row['level']: row['count'] for row in cursor.fetchall()}
+        cursor.execute("SELECT level, count FROM level_counts WHERE count > 0")
+        level_dist = {self._level_name(row['level']): row['count'] for row in cursor.fetchall()}
         
-        # 按Tag统计（Top 10）
-        if session_id:
-            cursor.execute("""
-                SELECT tag, COUNT(*) as count 
-                FROM logs 
-                WHERE session_id = ?
-                GROUP BY tag 
-                ORDER BY count DESC 
-                LIMIT 10
-            """, (session_id,))
-        else:
-            cursor.execute("""
-                SELECT tag, COUNT(*) as count 
-                FROM logs 
-                GROUP BY tag 
-                ORDER BY count DESC 
-                LIMIT 10
-            """)
+        # 按Tag统计：直接读取Tag字典中维护的计数，合并各分片后再取Top 10
+        cursor.execute("SELECT tag, count FROM tags WHERE count > 0")
         tag_dist = {row['tag']: row['count'] for row in cursor.fetchall()}
         
-        # 时间范围
-        if session_id:
-            cursor.execute("""
-                SELECT MIN(datetime) as start_time, MAX(datetime) as end_time 
-                FROM logs 
-                WHERE session_id = ? AND datetime IS NOT NULL
-            """, (session_id,))
-        else:
-            cursor.execute("""
-                SELECT MIN(datetime) as start_time, MAX(datetime) as end_time 
-                FROM logs 
-                WHERE datetime IS NOT NULL
-            """)
-        time_range = cursor.fetchone()
-        
         return {
-            'total_count': total_count,
+            'total_count': summary['total_count'],
             'level_distribution': level_dist,
-            'top_tags': tag_dist,
-            'time_range': {
-                'start': time_range['start_time'],
-                'end': time_range['end_time']
-            }
+            'tags': tag_dist,
+            'start_ms': summary['start_ms'],
+            'end_ms': summary['end_ms'],
         }
     
+    def get_minute_counts(
+        self,
+        session_id: Optional[str] = None,
+        start_time: Optional[Union[str, datetime, int]] = None,
+        end_time: Optional[Union[str, datetime, int]] = None
+    ) -> List[Dict]:
+        """按分钟统计日志条数（读取统计汇总表，不扫描日志）
+        
+        Args:
+            session_id: 会话ID (可选，不指定则统计全部)
+            start_time: 开始时间 (ISO格式、datetime或毫秒时间戳，可选)
+            end_time: 结束时间 (ISO格式、datetime或毫秒时间戳，可选)
+        
+        Returns:
+            按时间排序的列表，每项包含minute（该分钟开始时间的ISO格式字符串）和count
+        """
+        query = "SELECT minute, count FROM minute_counts WHERE count > 0"
+        params = []
+        
+        if start_time is not None:
+            query += " AND minute >= ?"
+            params.append(self._to_epoch_ms(start_time) // 60000)
+        
+        if end_time is not None:
+            query += " AND minute <= ?"
+            params.append(self._to_epoch_ms(end_time) // 60000)
+        
+        results = self._fan_out(
+            self._session_shards(session_id),
+            lambda shard_session_id, conn: conn.execute(query, params).fetchall()
+        )
+        counts: Counter = Counter()
+        for rows in results:
+            counts.update({row['minute']: row['count'] for row in rows})
+        
+        return [
+            {'minute': epoch_ms_to_datetime(minute * 60000).isoformat(), 'count': count}
+            for minute, count in sorted(counts.items())
+        ]
+    
     def clear_session(self, session_id: str):
         """清除指定会话的日志
         
+        清除的是别名会话时只删除别名；清除实际会话时，从目录库中删除会话、指向它的别名和入库缓存记录，
+        然后关闭并删除会话的分片文件（日志、Tag字典、模板、统计汇总表和全文索引都在其中）。
+        
         Args:
             session_id: 会话ID
         """
-        cursor = self.conn.cursor()
-        cursor.execute("DELETE FROM logs WHERE session_id = ?", (session_id,))
-        self.conn.commit()
+        def write(conn: sqlite3.Connection) -> Tuple[bool, Optional[int]]:
+            cursor = conn.cursor()
+            
+            # 别名会话只删除别名本身，不影响被指向的数据
+            cursor.execute("DELETE FROM session_aliases WHERE session_id = ?", (session_id,))
+            if cursor.rowcount:
+                conn.commit()
+                return True, None
+            
+            session_key = self._session_key(session_id, cursor)
+            cursor.execute("DELETE FROM sessions WHERE session_key = ?", (session_key,))
+            cursor.execute("DELETE FROM session_aliases WHERE target_session_id = ?", (session_id,))
+            cursor.execute("DELETE FROM ingest_cache WHERE session_id = ?", (session_id,))
+            conn.commit()
+            return False, session_key
+        
+        alias, session_key = self._pool.write(write)
+        if alias:
+            logger.info(f"Cleared session alias: {session_id}")
+            return
         
+        if session_key is not None:
+            self._drop_shard(session_key)
         logger.info(f"Cleared logs for session: {session_id}")
     
+    def _drop_shard(self, session_key: int):
+        """关闭并删除会话的分片文件（会话已从目录库中删除）"""
+        with self._shards_lock:
+            shard = self._shards.pop(session_key, None)
+        if shard is not None:
+            self._close_shard(session_key, shard)
+        with self._bulk_lock:
+            self._bulk_states.pop(session_key, None)
+        
+        path = self._shard_path(session_key)
+        for suffix in ('', '-wal', '-shm'):
+            Path(f"{path}{suffix}").unlink(missing_ok=True)
+    
     def close(self):
-        """关闭数据库连接"""
-        if self.conn:
-            self.conn.close()
-            logger.info("Database connection closed")
+        """关闭数据库连接（目录库和所有分片的写线程和读连接）"""
+        self._executor.shutdown(wait=True)
+        with self._shards_lock:
+            shards, self._shards = list(self._shards.values()), OrderedDict()
+        for shard in shards:
+            shard.close()
+        self._pool.close()
+        logger.info("Database connection closed")
 
 
 def main():
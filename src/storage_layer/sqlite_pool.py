@@ -0,0 +1,138 @@
+"""
+SQLite连接池
+
+一个专用的写线程独占唯一的可写连接，所有写操作经队列交给它顺序执行；
+读操作使用每个线程各自的只读连接。数据库使用WAL模式，读连接不会被写事务阻塞，
+每条查询（或snapshot()中的一组查询）看到的是开始时已提交数据的一致快照，
+因此一个会话入库时，其他会话的搜索可以同时进行。
+
+作者: Log Analysis Team
+"""
+
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Optional, TypeVar
+
+from loguru import logger
+
+T = TypeVar('T')
+
+
+class SQLitePool:
+    """单写多读的SQLite连接池"""
+
+    def __init__(
+        self,
+        db_path: str,
+        setup: Optional[Callable[[sqlite3.Connection], None]] = None,
+        timeout: float = 30.0
+    ):
+        """初始化连接池（写线程就绪、setup执行完成后返回）
+
+        Args:
+            db_path: SQLite数据库路径
+            setup: 在写连接上执行的初始化函数（建表、迁移等）
+            timeout: 等待数据库锁的秒数
+        """
+        self.db_path = db_path
+        self.timeout = timeout
+        self._queue: 'queue.Queue[Optional[tuple]]' = queue.Queue()
+        # 读连接: {线程: 连接}，线程结束后由下一次新建读连接时回收
+        self._readers: Dict[threading.Thread, sqlite3.Connection] = {}
+        self._readers_lock = threading.Lock()
+        self._closed = False
+        self._writer_conn: Optional[sqlite3.Connection] = None
+
+        self._writer = threading.Thread(target=self._run_writer, name="sqlite-writer", daemon=True)
+        self._writer.start()
+        self.write(lambda conn: self._init_writer(conn, setup))
+
+    def _init_writer(self, conn: sqlite3.Connection, setup: Optional[Callable[[sqlite3.Connection], None]]):
+        """写连接初始化：切换到WAL模式并执行setup"""
+        conn.execute("PRAGMA journal_mode = WAL")
+        # WAL模式下NORMAL只在检查点时同步，掉电最多丢失最近的事务，不会损坏数据库
+        conn.execute("PRAGMA synchronous = NORMAL")
+        if setup is not None:
+            setup(conn)
+        conn.commit()
+
+    def _run_writer(self):
+        """写线程：依次执行队列中的写操作"""
+        conn = self._writer_conn = sqlite3.connect(self.db_path, timeout=self.timeout)
+        conn.row_factory = sqlite3.Row
+        try:
+            while True:
+                job = self._queue.get()
+                if job is None:
+                    break
+                func, future = job
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    future.set_result(func(conn))
+                except BaseException as e:
+                    future.set_exception(e)
+        finally:
+            conn.close()
+
+    def write(self, func: Callable[[sqlite3.Connection], T]) -> T:
+        """在写线程上执行func(写连接)并返回结果（异常原样抛出）
+
+        func负责提交事务；在写线程内部再次调用时直接执行。
+        """
+        if threading.current_thread() is self._writer:
+            return func(self._writer_conn)
+        if self._closed:
+            raise sqlite3.ProgrammingError("Cannot operate on a closed SQLitePool")
+        future: Future = Future()
+        self._queue.put((func, future))
+        return future.result()
+
+    def reader(self) -> sqlite3.Connection:
+        """当前线程的只读连接（首次调用时创建）"""
+        thread = threading.current_thread()
+        conn = self._readers.get(thread)
+        if conn is not None:
+            return conn
+        if self._closed:
+            raise sqlite3.ProgrammingError("Cannot operate on a closed SQLitePool")
+
+        uri = Path(self.db_path).resolve().as_uri() + "?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, timeout=self.timeout, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        with self._readers_lock:
+            for dead in [t for t in self._readers if not t.is_alive()]:
+                self._readers.pop(dead).close()
+            self._readers[thread] = conn
+        return conn
+
+    @contextmanager
+    def snapshot(self) -> Iterator[sqlite3.Connection]:
+        """在一个读事务中执行多条查询，所有查询看到同一个快照"""
+        conn = self.reader()
+        if conn.in_transaction:
+            # 嵌套调用：沿用外层的快照
+            yield conn
+            return
+        conn.execute("BEGIN")
+        try:
+            yield conn
+        finally:
+            conn.execute("COMMIT")
+
+    def close(self):
+        """停止写线程并关闭所有连接"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._writer.join()
+        with self._readers_lock:
+            for conn in self._readers.values():
+                conn.close()
+            self._readers.clear()
+        logger.info(f"SQLitePool closed (db={self.db_path})")
@@ -12,12 +12,13 @@
 
 import chromadb
 from chromadb.config import Settings
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Union
 from pathlib import Path
 from loguru import logger
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import time
 
+from src.data_layer.log_batch import LogBatch
 from src.data_layer.parsers.logcat_parser import LogEntry
 
 
@@ -97,12 +98,15 @@ class VectorSearchEngine:
             'level': entry.level,
             'tag': entry.tag,
             'line_number': entry.line_number,
-            'session_id': session_id
+            'session_id': session_id,
+            'category': entry.category,  # 事件类别位掩码
+            'template_id': entry.template_id,  # 日志模板ID
+            'repeat_count': entry.repeat_count  # 窗口去重时代表的日志条数
         }
     
     def insert_logs(
         self,
-        entries: List[LogEntry],
+        entries: Union[List[LogEntry], LogBatch],
         session_id: str = "default",
         batch_size: int = 2000
     ) -> int:
@@ -122,7 +126,7 @@ class VectorSearchEngine:
           c) 减少需要索引的日志数量（只索引ERROR/WARN级别）
         
         Args:
-            entries: 日志条目列表
+            entries: 日志条目列表或LogBatch
             session_id: 会话ID
             batch_size: 批处理大小（默认2000，建议1000-5000）
             
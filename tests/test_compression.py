@@ -0,0 +1,84 @@
+"""
+压缩日志读取测试
+
+作者: Log Analysis Team
+"""
+
+import bz2
+import gzip
+import io
+import lzma
+import zipfile
+from pathlib import Path
+
+import pytest
+from loguru import logger
+
+from src.data_layer.parsers.compression import source_compression
+from src.data_layer.parsers.logcat_parser import LogcatParser
+
+SAMPLE_LOG = Path(__file__).parent / "sample_logs" / "android_logcat_sample.log"
+
+
+def zip_bytes(data: bytes) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("logcat.log", data)
+    return buffer.getvalue()
+
+
+COMPRESSORS = {
+    'gzip': gzip.compress,
+    'bz2': bz2.compress,
+    'xz': lzma.compress,
+    'zip': zip_bytes,
+}
+
+
+def parse(source):
+    """返回(条目字典列表, 统计信息)"""
+    parser = LogcatParser()
+    entries = [entry.to_dict() for entry in parser.parse_file(source)]
+    return entries, parser.get_statistics()
+
+
+@pytest.fixture(scope="module")
+def expected():
+    logger.remove()
+    return parse(str(SAMPLE_LOG))
+
+
+@pytest.mark.parametrize("compression", COMPRESSORS)
+def test_compressed_file_matches_plain_text(tmp_path, expected, compression):
+    """压缩文件的解析结果与未压缩的文件一致"""
+    path = tmp_path / f"logcat.{compression}"
+    path.write_bytes(COMPRESSORS[compression](SAMPLE_LOG.read_bytes()))
+
+    assert source_compression(str(path)) == compression
+    assert parse(str(path)) == expected
+
+
+@pytest.mark.parametrize("compression", [None, *COMPRESSORS])
+def test_uploaded_file_object_matches_plain_text(expected, compression):
+    """上传的二进制文件对象（压缩或未压缩）的解析结果一致，且文件对象不被关闭"""
+    data = SAMPLE_LOG.read_bytes()
+    upload = io.BytesIO(COMPRESSORS[compression](data) if compression else data)
+
+    assert source_compression(upload) == compression
+    assert parse(upload) == expected
+    assert not upload.closed
+
+
+def test_zip_members_are_read_in_order(tmp_path):
+    """zip中的多个文件按顺序读取，行号连续，与依次拼接的文本一致"""
+    logger.remove()
+    data = SAMPLE_LOG.read_bytes()
+    half = data.index(b"\n", len(data) // 2) + 1
+    path = tmp_path / "logcat.zip"
+    with zipfile.ZipFile(path, 'w') as archive:
+        archive.writestr("part1.log", data[:half])
+        archive.writestr("part2.log", data[half:])
+
+    plain = tmp_path / "logcat.log"
+    plain.write_bytes(data)
+    assert parse(str(path)) == parse(str(plain))
@@ -0,0 +1,21 @@
+"""
+日志内容哈希测试
+
+作者: Log Analysis Team
+"""
+
+from io import BytesIO
+
+from src.data_layer.content_hash import hash_log_source, ingest_cache_key
+
+
+def test_ingest_cache_key_depends_on_settings():
+    """内容相同但预处理配置不同时，入库缓存键不同"""
+    content_hash = hash_log_source(BytesIO(b"11-26 14:00:05.123  1234  1256 I SystemServer: ready\n"))
+    consecutive = {'min_log_level': 'I', 'dedup_mode': 'consecutive'}
+
+    assert ingest_cache_key(content_hash, consecutive) == ingest_cache_key(content_hash, dict(consecutive))
+    assert ingest_cache_key(content_hash, consecutive) != ingest_cache_key(
+        content_hash, {'min_log_level': 'I', 'dedup_mode': 'window'})
+    assert ingest_cache_key(content_hash, consecutive) != ingest_cache_key(
+        content_hash, {'min_log_level': 'W', 'dedup_mode': 'consecutive'})
@@ -0,0 +1,340 @@
+"""
+KeywordSearchEngine测试
+
+作者: Log Analysis Team
+"""
+
+import os
+import sqlite3
+import threading
+from collections import Counter
+from pathlib import Path
+
+import pytest
+from loguru import logger
+
+from benchmarks.bench_storage_schema import build_legacy
+from src.data_layer.incident_classifier import IncidentClassifier
+from src.data_layer.log_batch import LogBatch
+from src.data_layer.parsers.logcat_parser import NO_EPOCH, LogcatParser, epoch_ms_to_datetime
+from src.data_layer.preprocessor import LogPreprocessor
+from src.storage_layer.keyword_search import KeywordSearchEngine
+
+SAMPLE_LOG = Path(__file__).parent / "sample_logs" / "android_logcat_sample.log"
+
+
+@pytest.fixture
+def engine(tmp_path):
+    logger.remove()
+    engine = KeywordSearchEngine(db_path=str(tmp_path / "logs.db"))
+    yield engine
+    engine.close()
+
+
+@pytest.fixture(scope="module")
+def entries():
+    return LogcatParser().parse_file(str(SAMPLE_LOG))
+
+
+def test_bulk_load_only_affects_its_session(engine, entries):
+    """一个线程批量导入时，另一个线程写入的其他会话立即可查"""
+    loading = threading.Event()
+    release = threading.Event()
+
+    def upload():
+        with engine.bulk_load("upload_session"):
+            engine.insert_logs(entries, session_id="upload_session")
+            loading.set()
+            release.wait(timeout=30)
+
+    uploader = threading.Thread(target=upload)
+    uploader.start()
+    try:
+        assert loading.wait(timeout=30)
+        engine.insert_logs(entries, session_id="follow_session")
+
+        assert engine.get_statistics("follow_session")['total_count'] == len(entries)
+        assert engine.search_keywords("camera", session_id="follow_session")
+        # 批量导入中的会话在结束前还不可查
+        assert engine.get_statistics("upload_session")['total_count'] == 0
+        assert engine.search_keywords("camera", session_id="upload_session") == []
+    finally:
+        release.set()
+        uploader.join()
+
+    assert engine.get_statistics("upload_session")['total_count'] == len(entries)
+    assert engine.search_keywords("camera", session_id="upload_session")
+
+
+def open_fds() -> int:
+    return len(os.listdir("/proc/self/fd"))
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc/self/fd"), reason="needs /proc/self/fd")
+def test_open_shards_are_bounded(engine, entries):
+    """会话数不断增加时，打开的分片、线程和文件描述符数量不随之增长"""
+    engine.MAX_OPEN_SHARDS = 4
+
+    def add_sessions(start: int, count: int):
+        for i in range(start, start + count):
+            engine.insert_logs(entries[:10], session_id=f"session_{i}")
+            # 不指定会话的查询访问所有分片
+            engine.get_statistics()
+            engine.search_keywords("camera")
+
+    add_sessions(0, 10)
+    threads, fds = threading.active_count(), open_fds()
+    add_sessions(10, 40)
+
+    assert len(engine._shards) <= engine.MAX_OPEN_SHARDS
+    assert threading.active_count() <= threads
+    assert open_fds() <= fds
+    assert engine.get_statistics()['total_count'] == 50 * 10
+
+
+# 最初版本的logs表：事件类别以消息前缀表示，没有category列
+LEGACY_SCHEMA = """
+    CREATE TABLE logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp TEXT NOT NULL,
+        datetime TEXT,
+        pid INTEGER,
+        tid INTEGER,
+        level TEXT,
+        tag TEXT,
+        message TEXT,
+        raw_line TEXT,
+        line_number INTEGER,
+        session_id TEXT,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE VIRTUAL TABLE logs_fts USING fts5(tag, message, content='logs', content_rowid='id');
+    CREATE TRIGGER logs_ai AFTER INSERT ON logs BEGIN
+        INSERT INTO logs_fts(rowid, tag, message) VALUES (new.id, new.tag, new.message);
+    END;
+    CREATE TRIGGER logs_au AFTER UPDATE ON logs BEGIN
+        INSERT INTO logs_fts(logs_fts, rowid, tag, message) VALUES('delete', old.id, old.tag, old.message);
+        INSERT INTO logs_fts(rowid, tag, message) VALUES (new.id, new.tag, new.message);
+    END;
+"""
+
+
+def test_legacy_category_prefixes_are_migrated(tmp_path):
+    """旧数据库的[CRASH]等前缀迁移为category，并从消息和全文索引中去掉"""
+    logger.remove()
+    db_path = str(tmp_path / "legacy.db")
+    conn = sqlite3.connect(db_path)
+    conn.executescript(LEGACY_SCHEMA)
+    conn.executemany(
+        "INSERT INTO logs (timestamp, datetime, pid, tid, level, tag, message, raw_line, line_number, session_id) "
+        "VALUES (?, ?, 1, 1, 'E', 'Camera', ?, '', ?, 'old')",
+        [("11-26 14:00:05.123", "2025-11-26T14:00:05.123000", message, i)
+         for i, message in enumerate(["[CRASH] camera died", "[MEMORY] [ANR] [CRASH] camera stuck",
+                                      "camera ready"], start=1)]
+    )
+    conn.commit()
+    conn.close()
+
+    engine = KeywordSearchEngine(db_path=db_path)
+    try:
+        bits = IncidentClassifier().bits
+        messages = {log['message']: log['category'] for log in engine.search_keywords("camera", session_id="old")}
+        assert messages == {
+            "camera died": bits['CRASH'],
+            "camera stuck": bits['MEMORY'] | bits['ANR'] | bits['CRASH'],
+            "camera ready": 0,
+        }
+        # 全文索引由去掉前缀后的消息重建
+        assert engine.search_keywords("ANR", session_id="old") == []
+        assert len(engine.filter_by_category(bits['CRASH'], session_id="old")) == 2
+    finally:
+        engine.close()
+
+
+def test_legacy_schema_is_migrated_to_compact(tmp_path):
+    """旧格式（逐行存储文本字段和原始行）的数据库打开时迁移为紧凑格式，各会话的日志和统计不变"""
+    logger.remove()
+    batches = list(LogPreprocessor(min_log_level='V').process_stream(
+        LogcatParser().iter_log_batches(str(SAMPLE_LOG), batch_size=20)))
+    legacy_path = str(tmp_path / "legacy.db")
+    compact_path = str(tmp_path / "compact.db")
+    build_legacy(legacy_path, batches, "a")
+    conn = sqlite3.connect(legacy_path)
+    conn.execute("UPDATE logs SET session_id = 'a' WHERE line_number % 2 = 0")
+    conn.execute("UPDATE logs SET session_id = 'b' WHERE line_number % 2 = 1")
+    conn.commit()
+    conn.close()
+
+    compact = KeywordSearchEngine(db_path=compact_path)
+    for batch in batches:
+        compact.insert_logs(batch.select([i for i in range(len(batch)) if batch.line_numbers[i] % 2 == 0]),
+                            session_id="a")
+    for batch in batches:
+        compact.insert_logs(batch.select([i for i in range(len(batch)) if batch.line_numbers[i] % 2 == 1]),
+                            session_id="b")
+
+    def snapshot(engine, session_id):
+        logs = engine.get_logs_by_time_range(0, 2**62, session_id=session_id, limit=1000)
+        for log in logs:
+            log.pop('id')
+        return (logs, engine.get_statistics(session_id=session_id),
+                len(engine.search_keywords("camera", session_id=session_id, limit=1000)))
+
+    migrated = KeywordSearchEngine(db_path=legacy_path)
+    try:
+        for session_id in ("a", "b"):
+            logs, stats, matches = snapshot(migrated, session_id)
+            assert logs and matches
+            assert (logs, stats, matches) == snapshot(compact, session_id)
+        assert migrated.get_statistics()['total_count'] == sum(len(batch) for batch in batches)
+    finally:
+        migrated.close()
+        compact.close()
+
+    conn = sqlite3.connect(legacy_path)
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert 'logs' not in tables and 'logs_fts' not in tables
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == KeywordSearchEngine.SCHEMA_VERSION
+    conn.close()
+
+
+def tag_dictionary(engine: KeywordSearchEngine, session_id: str):
+    """返回({Tag: 字典中的计数}, {Tag: 全表扫描logs得到的条数})"""
+    with engine._using_shard(engine._session_key(session_id)) as shard:
+        conn = shard.reader()
+        stored = {tag: count for tag, count in conn.execute("SELECT tag, count FROM tags")}
+        scanned = {tag: count for tag, count in conn.execute(
+            "SELECT t.tag, COUNT(*) FROM logs l JOIN tags t ON t.tag_id = l.tag_id GROUP BY t.tag")}
+    return stored, scanned
+
+
+def test_tag_dictionary_counts(engine, entries):
+    """Tag字典的计数与日志一致：LogBatch和LogEntry入库、分片关闭后重新打开、清除会话后重新入库"""
+    batch = LogBatch.from_entries(entries)
+    expected = Counter(entry.tag for entry in entries)
+    # 每次入库后关闭空闲分片，Tag字典由tags表重新加载
+    engine.MAX_OPEN_SHARDS = 1
+
+    engine.insert_logs(batch.slice(0, 20), session_id="a")
+    engine.insert_logs(entries[:30], session_id="b")
+    engine.insert_logs(entries[20:], session_id="a")
+    engine.insert_logs(batch.slice(30), session_id="b")
+
+    for session_id in ("a", "b"):
+        stored, scanned = tag_dictionary(engine, session_id)
+        assert stored == scanned == expected
+    # 计数相同的Tag在第10名处的取舍不固定，只比较计数
+    top_counts = sorted(count for _, count in expected.most_common(10))
+    top_tags = engine.get_statistics("a")['top_tags']
+    assert top_tags.items() <= expected.items() and sorted(top_tags.values()) == top_counts
+    top_tags = engine.get_statistics()['top_tags']
+    assert all(count == 2 * expected[tag] for tag, count in top_tags.items())
+    assert sorted(top_tags.values()) == [2 * count for count in top_counts]
+    camera = sum(count for tag, count in expected.items() if "Camera" in tag)
+    assert len(engine.filter_by_tag("Camera", session_id="a", limit=1000)) == camera
+    assert engine.filter_by_tag("NoSuchTag", session_id="a") == []
+
+    engine.clear_session("a")
+    assert engine.get_statistics("a")['top_tags'] == {}
+    assert tag_dictionary(engine, "b")[0] == expected
+
+    engine.insert_logs(entries[:10], session_id="a")
+    stored, scanned = tag_dictionary(engine, "a")
+    assert stored == scanned == Counter(entry.tag for entry in entries[:10])
+
+
+def stats_tables(engine: KeywordSearchEngine, session_id: str):
+    """返回(统计汇总表的内容, 全表扫描logs得到的相同统计)，各为(总数, 最早, 最晚, {级别: 条数}, {分钟: 条数})"""
+    with engine._using_shard(engine._session_key(session_id)) as shard:
+        conn = shard.reader()
+        stored = (
+            *conn.execute("SELECT total_count, start_ms, end_ms FROM session_stats").fetchone(),
+            dict(conn.execute("SELECT level, count FROM level_counts WHERE count > 0").fetchall()),
+            dict(conn.execute("SELECT minute, count FROM minute_counts WHERE count > 0").fetchall()),
+        )
+        scanned = (
+            *conn.execute("SELECT COUNT(*), MIN(epoch_ms), MAX(epoch_ms) FROM logs").fetchone(),
+            dict(conn.execute("SELECT level, COUNT(*) FROM logs GROUP BY level").fetchall()),
+            dict(conn.execute("SELECT epoch_ms / 60000, COUNT(*) FROM logs WHERE epoch_ms IS NOT NULL "
+                              "GROUP BY 1").fetchall()),
+        )
+    return tuple(stored), tuple(scanned)
+
+
+def test_stats_tables_match_full_scan(engine, entries):
+    """统计汇总表与全表扫描一致：逐批入库、批量导入、清除会话后重新入库"""
+    batch = LogBatch.from_entries(entries)
+    # 时间无法解析的日志只计入总数和级别
+    untimed = LogBatch(batch.tags, batch.messages)
+    untimed.append("", NO_EPOCH, 1, 1, 'E', "Kernel", "no timestamp", "", 1)
+
+    engine.insert_logs(batch.slice(0, 25), session_id="a")
+    engine.insert_logs(untimed, session_id="a")
+    engine.insert_logs(entries[25:], session_id="a")
+    with engine.bulk_load("b"):
+        engine.insert_logs(batch, session_id="b")
+        engine.insert_logs(untimed, session_id="b")
+
+    for session_id in ("a", "b"):
+        stored, scanned = stats_tables(engine, session_id)
+        assert stored == scanned
+        assert stored[0] == len(entries) + 1
+        stats = engine.get_statistics(session_id)
+        assert stats['total_count'] == stored[0]
+        assert stats['level_distribution'] == {engine._level_name(level): count for level, count in stored[3].items()}
+        assert stats['time_range']['start'] == epoch_ms_to_datetime(stored[1]).isoformat()
+        assert [item['count'] for item in engine.get_minute_counts(session_id)] == \
+            [count for _, count in sorted(stored[4].items())]
+    assert engine.get_statistics()['total_count'] == 2 * (len(entries) + 1)
+
+    engine.clear_session("a")
+    assert engine.get_statistics("a")['total_count'] == 0
+    assert engine.get_statistics()['total_count'] == len(entries) + 1
+    assert engine.get_minute_counts("a") == []
+
+    engine.insert_logs(entries[:10], session_id="a")
+    stored, scanned = stats_tables(engine, "a")
+    assert stored == scanned
+    assert stored[0] == 10
+
+
+class ThreadCheckedDict(dict):
+    """记录访问线程的字典"""
+
+    def __init__(self):
+        super().__init__()
+        self.threads = set()
+
+    def get(self, *args):
+        self.threads.add(threading.current_thread().name)
+        return super().get(*args)
+
+    def pop(self, *args):
+        self.threads.add(threading.current_thread().name)
+        return super().pop(*args)
+
+    def __setitem__(self, key, value):
+        self.threads.add(threading.current_thread().name)
+        super().__setitem__(key, value)
+
+
+def test_tag_cache_is_only_used_on_writer_threads(engine, entries):
+    """Tag字典缓存的读取、填充和丢弃（分片被关闭、会话被清除）都在分片的写线程中执行"""
+    engine._tag_cache = ThreadCheckedDict()
+    engine.MAX_OPEN_SHARDS = 2
+
+    def insert(worker: int):
+        for i in range(5):
+            engine.insert_logs(entries[:10], session_id=f"session_{worker}_{i % 3}")
+
+    threads = [threading.Thread(target=insert, args=(worker,)) for worker in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for worker in range(4):
+        engine.clear_session(f"session_{worker}_0")
+
+    assert engine._tag_cache.threads == {"sqlite-writer"}
+    assert len(engine._tag_cache) <= engine.MAX_OPEN_SHARDS
+    assert engine.get_statistics()['total_count'] == 4 * 3 * 10
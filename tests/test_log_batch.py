@@ -0,0 +1,39 @@
+"""
+LogBatch测试
+
+作者: Log Analysis Team
+"""
+
+import pytest
+
+from src.data_layer.log_batch import LEVEL_CODES, LogBatch
+from src.data_layer.parsers.logcat_parser import NO_EPOCH
+from src.storage_layer.keyword_search import KeywordSearchEngine
+
+RAW_LINE = "11-26 14:00:05.123  1234  1256 W SystemServer: low memory"
+
+
+def test_raw_line_is_not_stored():
+    """不保存原始行：iter_rows不包含原始行，LogEntry.raw_line由字段重新生成"""
+    batch = LogBatch()
+    batch.append("11-26 14:00:05.123", NO_EPOCH, 1234, 1256, 'W', "SystemServer", "low memory", RAW_LINE, 1)
+
+    assert not hasattr(batch, 'raw_lines')
+    assert next(batch.iter_rows())[6:8] == ("low memory", 1)
+    assert batch.logcat_line_at(0) == RAW_LINE
+    assert next(iter(batch.select([0]))).raw_line == RAW_LINE
+
+
+def test_level_codes_match_keyword_search():
+    """LogBatch与KeywordSearchEngine使用同一张级别编码表"""
+    assert LEVEL_CODES == KeywordSearchEngine.LEVEL_CODES
+    assert list(LEVEL_CODES) == ['V', 'D', 'I', 'W', 'E', 'F', 'A']
+
+
+def test_unknown_level_is_rejected():
+    """未知级别抛出ValueError，且不追加半行数据"""
+    batch = LogBatch()
+    with pytest.raises(ValueError, match="'Q'"):
+        batch.append("11-26 14:00:05.123", NO_EPOCH, 1234, 1256, 'Q', "SystemServer", "low memory", RAW_LINE, 1)
+    assert len(batch) == 0
+    assert not batch.raw_timestamps
@@ -0,0 +1,46 @@
+"""
+LogFollower检查点测试
+
+作者: Log Analysis Team
+"""
+
+import os
+import threading
+
+from src.data_layer.parsers.log_follower import LogFollower
+from src.data_layer.preprocessor import LogPreprocessor
+
+LINES = [
+    "11-26 14:00:05.123  1234  1256 I SystemServer: System server startup complete",
+    "11-26 14:00:05.234  1234  1256 I ActivityManager: Start proc com.android.systemui",
+    "11-26 14:00:06.345  2345  2345 I WifiService: WiFi service started",
+] + ["11-26 14:00:07.456  2345  2345 W WifiService: scan failed"] * 5
+
+
+def test_checkpoint_waits_for_preprocessor_carry(tmp_path):
+    """去重暂存的日志输出并入库之前，检查点不会越过它们"""
+    log_path = tmp_path / "follow.log"
+    log_path.write_text("\n".join(LINES) + "\n")
+    checkpoint_path = tmp_path / "checkpoint.json"
+
+    stop_event = threading.Event()
+    follower = LogFollower(str(log_path), flush_interval=0, poll_interval=0.01,
+                           checkpoint_path=str(checkpoint_path))
+    preprocessor = LogPreprocessor()
+
+    outputs = []
+    for batch in preprocessor.process_stream(follower.iter_batches(stop_event)):
+        outputs.append((len(batch), preprocessor.pending_count))
+        # 与LogAnalysisAgent.follow_logs相同：没有暂存的日志时才推进检查点
+        if not preprocessor.pending_count:
+            follower.commit()
+            stop_event.set()
+        else:
+            # 末尾的重复段还暂存在预处理器中，产出批次本身不保存检查点
+            assert not checkpoint_path.exists()
+
+    # 先输出3条不同的日志（5条重复日志暂存为首尾两条），空闲时再输出合并后的重复日志
+    assert outputs == [(3, 2), (2, 0)]
+    resumed = LogFollower(str(log_path), checkpoint_path=str(checkpoint_path))
+    assert resumed.offset == os.path.getsize(log_path)
+    assert resumed.line_number == len(LINES)
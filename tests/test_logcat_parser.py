@@ -0,0 +1,119 @@
+"""
+LogcatParser测试
+
+作者: Log Analysis Team
+"""
+
+import os
+
+import pytest
+from loguru import logger
+
+from benchmarks.synthetic import generate_logcat
+from src.data_layer.parsers import logcat_parser
+from src.data_layer.parsers.logcat_parser import LogcatParser
+
+
+@pytest.fixture(scope="module")
+def synthetic_log(tmp_path_factory):
+    """合成日志，每隔若干行插入无法解析的行"""
+    logger.remove()
+    directory = tmp_path_factory.mktemp("logs")
+    source = directory / "source.log"
+    generate_logcat(str(source), 4000)
+    path = directory / "synthetic_logcat.log"
+    with open(source, encoding='utf-8') as f, open(path, 'w', encoding='utf-8') as out:
+        for i, line in enumerate(f):
+            out.write(line)
+            if i % 97 == 0:
+                out.write("    at com.example.Foo.bar(Foo.java:42)\n")
+    return str(path)
+
+
+def test_parallel_parse_matches_single_process(synthetic_log):
+    """多进程解析的日志、行号和统计与单进程一致"""
+    sequential = LogcatParser()
+    expected = [entry.to_dict() for entry in sequential.parse_file(synthetic_log)]
+
+    parallel = LogcatParser()
+    # 分片调小，使小文件也切分为多个分片
+    parallel.SHARD_SIZE_BYTES = os.path.getsize(synthetic_log) // 4
+    entries = [entry.to_dict() for entry in parallel.parse_file_parallel(synthetic_log, workers=2)]
+
+    assert entries == expected
+    assert [entry['line_number'] for entry in entries] == [entry['line_number'] for entry in expected]
+    assert parallel.get_statistics() == sequential.get_statistics()
+    assert sequential.get_statistics()['failed_count'] > 0
+
+
+def test_small_file_is_parsed_in_process(synthetic_log, monkeypatch):
+    """小于一个分片的文件不启动进程池"""
+    def no_pool(*args, **kwargs):
+        raise AssertionError("process pool started for a small file")
+
+    monkeypatch.setattr(logcat_parser, 'ProcessPoolExecutor', no_pool)
+    parser = LogcatParser()
+    entries = parser.parse_file_parallel(synthetic_log, workers=4)
+
+    assert len(entries) == parser.get_statistics()['parsed_count'] > 0
+
+
+# 快速路径能解析的行：同一秒内的行复用该秒的基准值，秒变化后（包括回到之前的秒）重新计算
+FAST_PATH_LINES = [
+    "11-26 14:00:05.123  1234  1256 I SystemServer: System server startup complete",
+    "11-26 14:00:05.456  1234  1256 W SystemServer: same second",
+    "11-26 14:00:06.001  1234  1256 E SystemServer: next second",
+    "11-26 14:00:05.999  1234  1256 D SystemServer: back to the previous second",
+    "11-26 14:00:06.500  1234  1256 I Some Tag With Spaces: tag with spaces",
+    "11-26 14:00:06.500  1234  1256 I Tag  : padded tag",
+    "11-26 14:00:06.500  1234  1256 I ActivityManager: key: value: more colons",
+    "11-26 14:00:06.500  1234  1256 I chatty:",
+    "11-26 14:00:06.500  1234  1256 I chatty:   ",
+    "11-26 14:00:06.500  1234  1256 I Tag:no space after the colon",
+    "11-26 14:00:06.500 1234 1256 V Tag: single spaces",
+    "11-26 14:00:06.500\t1234\t1256\tF\tTag: tabs",
+    "02-30 14:00:06.500  1234  1256 I Tag: invalid date",
+    "02-30 14:00:06.600  1234  1256 I Tag: invalid date in the cached second",
+    "11-26 14:00:06.500  1234  1256 I Tag: trailing spaces   ",
+]
+
+# 快速路径不处理、交给正则的行（其中一部分正则也不匹配）
+REGEX_PATH_LINES = [
+    "11-26  14:00:06.500  1234  1256 I Tag: two spaces between date and time",
+    "11-26 14:00:06.5  1234  1256 I Tag: short milliseconds",
+    "1-26 14:00:06.500  1234  1256 I Tag: one digit month",
+    "11-26 14:00:06.500  1234  1256 X Tag: unknown level",
+    "11-26 14:00:06.500  12a4  1256 I Tag: bad pid",
+    "11-26 14:00:06.500  1234  1256 I : empty tag",
+    "11-26 14:00:06.500  1234  1256 I no colon at all",
+    "    at com.example.Foo.bar(Foo.java:42)",
+    "--------- beginning of main",
+]
+
+
+def test_fast_path_matches_regex_path():
+    """threadtime快速路径与正则路径的解析结果和统计一致"""
+    logger.remove()
+    fast, regex = LogcatParser(use_fast_path=True), LogcatParser(use_fast_path=False)
+
+    for line_number, line in enumerate(FAST_PATH_LINES + REGEX_PATH_LINES, start=1):
+        assert fast._parse_row(line, line_number) == regex._parse_row(line, line_number), line
+    assert fast.get_statistics() == regex.get_statistics()
+
+
+def test_fast_path_coverage():
+    """规整的threadtime行走快速路径，其余行回退到正则"""
+    logger.remove()
+    parser = LogcatParser()
+
+    for line_number, line in enumerate(FAST_PATH_LINES, start=1):
+        assert parser._split_threadtime(line.strip(), line_number) is not None, line
+    for line_number, line in enumerate(REGEX_PATH_LINES, start=1):
+        assert parser._split_threadtime(line.strip(), line_number) is None, line
+
+
+def test_fast_path_matches_regex_path_on_file(synthetic_log):
+    """整个文件的解析结果一致"""
+    fast = LogcatParser(use_fast_path=True).parse_file(synthetic_log)
+    regex = LogcatParser(use_fast_path=False).parse_file(synthetic_log)
+    assert [entry.to_dict() for entry in fast] == [entry.to_dict() for entry in regex]
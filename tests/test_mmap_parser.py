@@ -0,0 +1,93 @@
+"""
+MmapLogcatParser测试
+
+作者: Log Analysis Team
+"""
+
+import pytest
+from loguru import logger
+
+from benchmarks.synthetic import generate_logcat
+from src.data_layer.parsers.logcat_parser import LogcatParser
+from src.data_layer.parsers.mmap_parser import LazyLogEntry, MmapLogcatParser
+from src.data_layer.preprocessor import LogPreprocessor
+
+LINES = [
+    "11-26 14:00:05.123  1234  1256 I SystemServer: System server startup complete",
+    "",
+    "   11-26 14:00:05.234  1234  1256 W ActivityManager: leading whitespace",
+    "    at com.example.Foo.bar(Foo.java:42)",
+    "11-26 14:00:06.345  2345  2345 E WifiService: key: value   ",
+    "--------- beginning of main",
+    "11-26 14:00:07.456  2345  2345 D Some Tag: last line without newline",
+]
+
+
+@pytest.fixture(scope="module")
+def synthetic_log(tmp_path_factory):
+    logger.remove()
+    path = tmp_path_factory.mktemp("logs") / "synthetic_logcat.log"
+    generate_logcat(str(path), 3000)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write("    at com.example.Foo.bar(Foo.java:42)\n")
+    return str(path)
+
+
+def parse_both(path: str):
+    """返回(mmap后端的结果, 文本后端的结果)，各为(条目字典列表, 统计信息)"""
+    mapped, text = MmapLogcatParser(), LogcatParser()
+    mapped_entries = [entry.to_dict() for entry in mapped.parse_file(path)]
+    text_entries = [entry.to_dict() for entry in text.parse_file(path)]
+    return (mapped_entries, mapped.get_statistics()), (text_entries, text.get_statistics())
+
+
+def test_mmap_matches_text_backend(synthetic_log):
+    """mmap后端与文本后端的条目、行号和统计一致"""
+    mapped, text = parse_both(synthetic_log)
+    assert mapped == text
+    assert text[1]['failed_count'] == 1
+
+
+@pytest.mark.parametrize("newline", ["\n", "\r\n", "\r"])
+def test_mmap_line_endings_match_text_backend(tmp_path, newline):
+    """\\r\\n和单独的\\r与文本后端一样按行结束符处理，行号一致"""
+    logger.remove()
+    path = tmp_path / "endings.log"
+    path.write_bytes(newline.join(LINES).encode('utf-8'))
+
+    mapped, text = parse_both(str(path))
+    assert mapped == text
+    assert [entry['line_number'] for entry in mapped[0]] == [1, 3, 5, 7]
+
+
+def test_mmap_mixed_line_endings(tmp_path):
+    """同一文件中混用的行结束符"""
+    logger.remove()
+    path = tmp_path / "mixed.log"
+    path.write_bytes("\r\n".join(LINES[:3]).encode('utf-8') + b"\r" + "\n".join(LINES[3:]).encode('utf-8'))
+
+    mapped, text = parse_both(str(path))
+    assert mapped == text
+
+
+def test_batches_stay_valid_until_iteration_ends(synthetic_log):
+    """每一批（包括最后一批）在被使用时都可以解码，遍历结束后释放映射"""
+    parser = MmapLogcatParser()
+    batches = []
+    for batch in parser.iter_batches(synthetic_log, batch_size=1000):
+        assert all(entry.message is not None for entry in batch)
+        batches.append(batch)
+
+    assert isinstance(batches[-1][-1], LazyLogEntry)
+    with pytest.raises(ValueError):
+        batches[-1][-1].raw_line
+
+
+def test_mmap_pipeline_matches_text_pipeline(synthetic_log):
+    """经过预处理后的结果与文本后端一致"""
+    def run(parser):
+        preprocessor = LogPreprocessor()
+        return [row for batch in preprocessor.process_stream(parser.iter_log_batches(synthetic_log, batch_size=700))
+                for row in batch.iter_rows()]
+
+    assert run(MmapLogcatParser()) == run(LogcatParser())
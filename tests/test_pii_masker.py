@@ -0,0 +1,71 @@
+"""
+PIIMasker测试
+
+作者: Log Analysis Team
+"""
+
+import pytest
+from loguru import logger
+
+from benchmarks.bench_pii_masking import generate_messages, legacy_mask
+from src.data_layer.log_batch import LogBatch
+from src.data_layer.parsers.logcat_parser import NO_EPOCH
+from src.data_layer.pii_masker import PIIMasker
+from src.data_layer.preprocessor import LogPreprocessor
+
+# (原文, 脱敏后的文本, 各类别（PHONE, EMAIL, IP, COORD）替换的片段数)
+CASES = [
+    ("user 13812345678 login", "user [PHONE] login", (1, 0, 0, 0)),
+    ("call 13812345678 or 15900001111", "call [PHONE] or [PHONE]", (2, 0, 0, 0)),
+    ("+8613812345678", "+86[PHONE]", (1, 0, 0, 0)),
+    ("mail dev.team-1@mail.example.com now", "mail [EMAIL] now", (0, 1, 0, 0)),
+    ("connect 192.168.1.20:8080 ok", "connect [IP]:8080 ok", (0, 0, 1, 0)),
+    ("location 39.9042123,116.4073963", "location [COORD],[COORD]", (0, 0, 0, 2)),
+    ("gps -33.8688197 151.2092955", "gps [COORD] [COORD]", (0, 0, 0, 2)),
+    ("user 13812345678 mail a@b.io from 10.0.0.1", "user [PHONE] mail [EMAIL] from [IP]", (1, 1, 1, 0)),
+    # 前面的规则替换后，后面的规则匹配替换后的文本
+    ("13812345678@163.com", "[PHONE]@163.com", (1, 0, 0, 0)),
+    # 命中预筛选但不是PII
+    ("version 1.2.3 build 45", "version 1.2.3 build 45", ()),
+    ("temperature 36.5 C", "temperature 36.5 C", ()),
+    ("@Override", "@Override", ()),
+    # 不命中预筛选
+    ("Camera open failed: error -38", "Camera open failed: error -38", ()),
+    ("", "", ()),
+]
+
+
+@pytest.mark.parametrize("text, masked, spans", CASES)
+def test_each_rule_matches_search_and_sub(text, masked, spans):
+    """每条规则的结果与原来的search()+sub()实现一致，片段数按类别统计"""
+    assert PIIMasker().mask(text) == (masked, spans)
+    assert legacy_mask(text) == (masked, spans)
+
+
+@pytest.mark.parametrize("pii_rate", [0.01, 0.5])
+def test_prefilter_does_not_change_results(pii_rate):
+    """预筛选只跳过不可能含PII的消息：结果与不预筛选、与原始实现都一致"""
+    messages = generate_messages(5000, pii_rate, seed=1)
+    masker, unfiltered = PIIMasker(), PIIMasker(prefilter=None)
+
+    results = [masker.mask(message) for message in messages]
+    assert results == [unfiltered.mask(message) for message in messages]
+    assert results == [legacy_mask(message) for message in messages]
+    assert sum(1 for _, spans in results if spans) > 0
+
+
+def test_preprocessor_counts_spans_per_category():
+    """masked_count按"条目×类别"计数，masked_spans按类别累计替换的片段数（重复的消息同样计数）"""
+    logger.remove()
+    messages = [text for text, _, _ in CASES] + ["call 13812345678 or 15900001111"]
+    batch = LogBatch()
+    for line_number, message in enumerate(messages, start=1):
+        batch.append("11-26 14:00:05.123", NO_EPOCH, 1234, line_number, 'I', "Tag", message, "", line_number)
+
+    preprocessor = LogPreprocessor(enable_deduplication=False, enable_template_mining=False)
+    output = [row[6] for processed in preprocessor.process_stream(iter([batch])) for row in processed.iter_rows()]
+
+    assert output == [masked for _, masked, _ in CASES] + ["call [PHONE] or [PHONE]"]
+    stats = preprocessor.get_statistics()
+    assert stats['masked_spans'] == {'PHONE': 8, 'EMAIL': 2, 'IP': 2, 'COORD': 4}
+    assert stats['masked_count'] == 12
@@ -0,0 +1,129 @@
+"""
+LogPreprocessor测试
+
+作者: Log Analysis Team
+"""
+
+import pytest
+from loguru import logger
+
+from benchmarks.synthetic import generate_logcat
+from src.data_layer.log_batch import LogBatch
+from src.data_layer.parsers.logcat_parser import NO_EPOCH, LogcatParser
+from src.data_layer.preprocessor import LogPreprocessor
+
+
+@pytest.fixture(scope="module")
+def synthetic_batches(tmp_path_factory):
+    logger.remove()
+    path = str(tmp_path_factory.mktemp("logs") / "synthetic_logcat.log")
+    generate_logcat(path, 6000)
+    return list(LogcatParser().iter_log_batches(path, batch_size=500))
+
+
+def run_stream(batches, workers: int, **kwargs):
+    """返回(输出的行, 统计信息)；预处理会原地修改批次，每次使用副本"""
+    preprocessor = LogPreprocessor(**kwargs)
+    rows = []
+    for batch in preprocessor.process_stream(iter([b.slice(0) for b in batches]), workers=workers):
+        rows.extend(batch.iter_rows())
+    return rows, preprocessor.get_statistics()
+
+
+@pytest.mark.parametrize("dedup_mode", LogPreprocessor.DEDUP_MODES)
+def test_parallel_stream_matches_single_process(synthetic_batches, dedup_mode):
+    """多进程预处理的输出行和计数与单进程一致（结果缓存按进程独立，不参与比较）"""
+    seq_rows, seq_stats = run_stream(synthetic_batches, 1, dedup_mode=dedup_mode)
+    par_rows, par_stats = run_stream(synthetic_batches, 2, dedup_mode=dedup_mode)
+
+    assert par_rows == seq_rows
+    seq_stats.pop('cache')
+    par_stats.pop('cache')
+    assert par_stats == seq_stats
+    assert seq_stats['total_count'] == sum(len(b) for b in synthetic_batches)
+
+
+BASE_MS = 1764165600000
+
+# 两个线程交错输出：WifiService的重复报错被SystemServer的日志隔开，且报错中的数字各不相同
+INTERLEAVED = [
+    (0, 'W', "WifiService", "scan failed, retry 1 in 500 ms"),
+    (100, 'I', "SystemServer", "checking battery level"),
+    (200, 'W', "WifiService", "scan failed, retry 2 in 1000 ms"),
+    (300, 'I', "SystemServer", "battery level 80"),
+    (400, 'W', "WifiService", "scan failed, retry 3 in 2000 ms"),
+    (500, 'I', "SystemServer", "checking battery level"),
+    (700, 'W', "WifiService", "scan failed, retry 4 in 4000 ms"),
+]
+
+
+def make_batches(rows, batch_size: int):
+    """由(相对毫秒, 级别, Tag, Message)构造批次"""
+    batches = []
+    for start in range(0, len(rows), batch_size):
+        batch = LogBatch()
+        for line_number, (offset_ms, level, tag, message) in enumerate(rows[start:start + batch_size], start=start + 1):
+            batch.append("11-26 14:00:00.000", BASE_MS + offset_ms, 1234, 1256, level, tag, message, "", line_number)
+        batches.append(batch)
+    return batches
+
+
+def window_rows(batches, **kwargs):
+    preprocessor = LogPreprocessor(dedup_mode='window', enable_template_mining=False, **kwargs)
+    rows = [row for batch in preprocessor.process_stream(iter(batches)) for row in batch.iter_rows()]
+    stats = preprocessor.get_statistics()
+    # 批次内按message_id复用脱敏结果，缓存命中数随批次划分变化
+    stats.pop('cache')
+    return rows, stats
+
+
+def test_consecutive_is_default_dedup_mode():
+    """默认只合并连续重复的日志，被其他日志隔开的重复日志原样保留"""
+    preprocessor = LogPreprocessor(enable_template_mining=False)
+    assert preprocessor.dedup_mode == 'consecutive'
+
+    rows = [row for batch in preprocessor.process_stream(iter(make_batches(INTERLEAVED, 100)))
+            for row in batch.iter_rows()]
+    assert len(rows) == len(INTERLEAVED)
+
+
+def test_window_dedup_groups_interleaved_repeats():
+    """窗口内数字不同的重复日志合并到第一条，记录重复次数和最后出现的时间"""
+    rows, stats = window_rows(make_batches(INTERLEAVED, 100))
+
+    # (message, line_number, repeat_count, last_epoch_ms)
+    assert [(row[6], row[7], row[10], row[11]) for row in rows] == [
+        ("scan failed, retry 1 in 500 ms (repeated 4 times)", 1, 4, BASE_MS + 700),
+        ("checking battery level (repeated 2 times)", 2, 2, BASE_MS + 500),
+        ("battery level 80", 4, 1, NO_EPOCH),
+    ]
+    assert stats['deduplicated_count'] == 4
+
+
+def test_window_dedup_starts_new_group_after_window():
+    """超出行数或时间窗口后再出现的日志开始新的一组"""
+    rows, _ = window_rows(make_batches(INTERLEAVED, 100), dedup_window_lines=3)
+    assert [(row[7], row[10]) for row in rows] == [(1, 2), (2, 1), (4, 1), (5, 2), (6, 1)]
+
+    rows, _ = window_rows(make_batches(INTERLEAVED, 100), dedup_window_ms=300)
+    assert [(row[7], row[10]) for row in rows] == [(1, 2), (2, 1), (4, 1), (5, 2), (6, 1)]
+
+
+@pytest.mark.parametrize("batch_size", [1, 2, 3, 5])
+def test_window_dedup_groups_span_batch_boundaries(batch_size):
+    """跨批次的组与整批处理的结果和统计一致"""
+    expected, expected_stats = window_rows(make_batches(INTERLEAVED, 100))
+    rows, stats = window_rows(make_batches(INTERLEAVED, batch_size))
+    assert rows == expected
+    assert stats == expected_stats
+
+
+def test_window_dedup_flushes_groups_on_idle_batch():
+    """空批次（暂时没有新数据）立即输出尚未结束的组"""
+    preprocessor = LogPreprocessor(dedup_mode='window', enable_template_mining=False)
+    batches = make_batches(INTERLEAVED[:3], 100) + [LogBatch()]
+
+    outputs = []
+    for batch in preprocessor.process_stream(iter(batches)):
+        outputs.append(([(row[7], row[10]) for row in batch.iter_rows()], preprocessor.pending_count))
+    assert outputs == [([(1, 2), (2, 1)], 0)]
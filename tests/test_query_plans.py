@@ -0,0 +1,95 @@
+"""
+KeywordSearchEngine查询计划回归测试
+
+在两个会话的小数据库上执行常用查询，通过分片读连接的trace回调截获实际执行的SQL，
+检查EXPLAIN QUERY PLAN使用了预期的索引，且没有全表扫描logs。
+
+作者: Log Analysis Team
+"""
+
+import sqlite3
+from pathlib import Path
+from typing import List, Tuple
+
+import pytest
+from loguru import logger
+
+from src.data_layer.parsers.logcat_parser import LogcatParser
+from src.data_layer.preprocessor import LogPreprocessor
+from src.storage_layer.keyword_search import KeywordSearchEngine
+
+SAMPLE_LOG = Path(__file__).parent / "sample_logs" / "android_logcat_sample.log"
+SESSIONS = ("session_a", "session_b")
+
+# 只包含部分行的索引：沿该索引扫描不是全表扫描
+PARTIAL_INDEXES = ('idx_incident',)
+
+
+@pytest.fixture(scope="module")
+def engine(tmp_path_factory):
+    logger.remove()
+    engine = KeywordSearchEngine(db_path=str(tmp_path_factory.mktemp("plans") / "logs.db"))
+    batches = list(LogPreprocessor(min_log_level='V').process_stream(
+        LogcatParser().iter_log_batches(str(SAMPLE_LOG), batch_size=20)))
+    for session_id in SESSIONS:
+        for batch in batches:
+            engine.insert_logs(batch, session_id=session_id)
+    yield engine
+    engine.close()
+
+
+def query_plans(engine: KeywordSearchEngine, query) -> List[str]:
+    """执行一次查询，返回其中访问logs表的SQL的查询计划（每步一行）"""
+    # 单个会话的查询在当前线程中执行，使用当前线程的分片读连接
+    statements: List[Tuple[sqlite3.Connection, str]] = []
+    conns = [shard.reader() for shard in list(engine._shards.values())]
+    for conn in conns:
+        conn.set_trace_callback(lambda sql, conn=conn: statements.append((conn, sql)))
+    try:
+        query()
+    finally:
+        for conn in conns:
+            conn.set_trace_callback(None)
+
+    plans = []
+    for conn, sql in statements:
+        if sql.lstrip().upper().startswith('SELECT') and ' logs' in sql:
+            plans.extend(row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}"))
+    assert plans, "no query on the logs table was traced"
+    return plans
+
+
+def session_bounds(engine: KeywordSearchEngine, session_id: str) -> Tuple[int, int, int]:
+    """会话的(最早时间, 最晚时间, 最小日志id)"""
+    with engine._using_shard(engine._session_key(session_id)) as shard:
+        return tuple(shard.reader().execute("SELECT MIN(epoch_ms), MAX(epoch_ms), MIN(id) FROM logs").fetchone())
+
+
+def make_query(engine: KeywordSearchEngine, name: str):
+    first_ms, last_ms, first_id = session_bounds(engine, "session_b")
+    return {
+        'time_range': lambda: engine.get_logs_by_time_range(first_ms, last_ms, session_id="session_b"),
+        'time_range_level': lambda: engine.get_logs_by_time_range(first_ms, last_ms, level='E',
+                                                                  session_id="session_b"),
+        'context': lambda: engine.get_context(first_id + 10, window_size=5),
+        'tag': lambda: engine.filter_by_tag("Camera", session_id="session_b"),
+        'category': lambda: engine.filter_by_category(0b111, session_id="session_b"),
+        'top_templates': lambda: engine.get_top_templates(session_id="session_b"),
+    }[name]
+
+
+@pytest.mark.parametrize("name, index", [
+    ('time_range', 'idx_epoch_ms'),
+    ('time_range_level', 'idx_level_epoch'),
+    ('context', 'idx_line'),
+    ('tag', 'idx_tag_epoch'),
+    ('category', 'idx_incident'),
+    ('top_templates', 'idx_level_template'),
+])
+def test_query_uses_index(engine, name, index):
+    plans = query_plans(engine, make_query(engine, name))
+
+    assert any(index in step for step in plans), plans
+    full_scans = [step for step in plans if step.split()[:2] in (['SCAN', 'logs'], ['SCAN', 'l'])
+                  and not any(partial in step for partial in PARTIAL_INDEXES)]
+    assert not full_scans, plans
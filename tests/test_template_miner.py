@@ -0,0 +1,88 @@
+"""
+TemplateMiner测试
+
+作者: Log Analysis Team
+"""
+
+import pytest
+from loguru import logger
+
+from benchmarks.synthetic import generate_logcat
+from src.data_layer.parsers.logcat_parser import LogcatParser
+from src.data_layer.preprocessor import LogPreprocessor
+from src.data_layer.template_miner import TemplateMiner
+from src.storage_layer.keyword_search import KeywordSearchEngine
+
+
+@pytest.fixture(scope="module")
+def synthetic_log(tmp_path_factory):
+    logger.remove()
+    path = str(tmp_path_factory.mktemp("logs") / "synthetic_logcat.log")
+    generate_logcat(path, 5000)
+    return path
+
+
+def test_template_id_is_stable_when_generalized():
+    """模板随后续日志泛化为<*>时ID不变，参数可以按模板提取"""
+    miner = TemplateMiner()
+    first = miner.add("Connection unstable, RSSI: -85dBm on wlan0")
+    assert miner.add("Connection unstable, RSSI: -72dBm on wlan0") == first
+    assert miner.add("Connection unstable, RSSI: -85dBm on wlan0") == first
+    assert miner.add("Camera open failed") != first
+
+    template = miner.get(first)
+    assert template.template == "Connection unstable, RSSI: <*> on wlan0"
+    assert template.count == 3
+    assert miner.extract_parameters(first, "Connection unstable, RSSI: -60dBm on wlan0") == ["-60dBm"]
+
+
+def test_pop_changed_reports_each_change_once():
+    """pop_changed只返回上次调用之后新建、泛化或计数变化的模板"""
+    miner = TemplateMiner()
+    a = miner.add("Start proc 1234 for activity")
+    b = miner.add("Camera open failed")
+    assert [t.template_id for t in miner.pop_changed()] == [a, b]
+    assert miner.pop_changed() == []
+
+    miner.add("Start proc 5678 for activity")
+    assert [t.template_id for t in miner.pop_changed()] == [a]
+
+
+def mined_ids(path: str, batch_size: int, **miner_kwargs):
+    """返回(每条输出日志的(行号, 模板ID), {模板ID: (模板文本, 条数)})"""
+    miner = TemplateMiner(**miner_kwargs)
+    preprocessor = LogPreprocessor(min_log_level='V', template_miner=miner)
+    rows = [(row[7], row[9])
+            for batch in preprocessor.process_stream(LogcatParser().iter_log_batches(path, batch_size=batch_size))
+            for row in batch.iter_rows()]
+    return rows, {t.template_id: (t.template, t.count) for t in miner.templates}
+
+
+@pytest.mark.parametrize("batch_size", [1, 37, 1000])
+def test_template_ids_are_stable_across_batches(synthetic_log, batch_size):
+    """模板ID与批次划分无关：逐批挖掘与整个文件一次挖掘的结果一致"""
+    expected = mined_ids(synthetic_log, 100000)
+    assert mined_ids(synthetic_log, batch_size) == expected
+    assert all(template_id > 0 for _, template_id in expected[0])
+
+
+def test_template_ids_survive_cache_reset(synthetic_log):
+    """消息缓存清空重建不影响模板ID"""
+    assert mined_ids(synthetic_log, 500, cache_size=10) == mined_ids(synthetic_log, 500)
+
+
+def test_incremental_saves_match_final_templates(synthetic_log, tmp_path):
+    """每批入库后只保存变化的模板，最终保存的模板与挖掘器一致"""
+    engine = KeywordSearchEngine(db_path=str(tmp_path / "logs.db"))
+    preprocessor = LogPreprocessor(min_log_level='V')
+    miner = preprocessor.template_miner
+    try:
+        for batch in preprocessor.process_stream(LogcatParser().iter_log_batches(synthetic_log, batch_size=300)):
+            engine.insert_logs(batch, session_id="s")
+            engine.save_templates("s", miner.pop_changed())
+
+        with engine._using_shard(engine._session_key("s")) as shard:
+            stored = shard.reader().execute("SELECT template_id, template, count FROM templates").fetchall()
+        assert sorted(map(tuple, stored)) == [(t.template_id, t.template, t.count) for t in miner.templates]
+    finally:
+        engine.close()
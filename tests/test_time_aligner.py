@@ -0,0 +1,168 @@
+"""
+TimeAligner测试
+
+作者: Log Analysis Team
+"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from loguru import logger
+
+from src.data_layer.log_batch import LogBatch
+from src.data_layer.parsers.logcat_parser import NO_EPOCH, LogEntry, datetime_to_epoch_ms
+from src.data_layer.time_aligner import TimeAligner
+
+BASE_TIME = datetime(2025, 11, 26, 14, 0, 0)
+
+
+def make_entry(offset_ms, tag: str = "Tag", line_number: int = 0) -> LogEntry:
+    """offset_ms为None表示没有时间（如堆栈续行）"""
+    datetime_obj = BASE_TIME + timedelta(milliseconds=offset_ms) if offset_ms is not None else None
+    timestamp = datetime_obj.strftime("%m-%d %H:%M:%S.%f")[:-3] if datetime_obj else ""
+    return LogEntry(timestamp, datetime_obj, 1234, 1256, 'I', tag, f"message {line_number}", "", line_number)
+
+
+def make_source(name: str, offsets_ms):
+    return [make_entry(offset_ms, name, line_number) for line_number, offset_ms in enumerate(offsets_ms, start=1)]
+
+
+@pytest.fixture
+def aligner():
+    logger.remove()
+    return TimeAligner()
+
+
+def test_merge_orders_by_time_and_sets_source_id(aligner):
+    """按时间归并；时间相同时按源的顺序，source_id为源的序号，Tag不变"""
+    sources = {
+        'ap': make_source('ap', [0, 100, 200, 300]),
+        'mcu': make_source('mcu', [50, 100, 250]),
+        'kernel': make_source('kernel', [100, 400]),
+    }
+    merged = aligner.merge_and_sort(sources)
+
+    assert [(aligner.source_name(entry), entry.line_number) for entry in merged] == [
+        ('ap', 1), ('mcu', 1), ('ap', 2), ('mcu', 2), ('kernel', 1),
+        ('ap', 3), ('mcu', 3), ('ap', 4), ('kernel', 2),
+    ]
+    assert [entry.source_id for entry in merged if entry.tag == 'mcu'] == [1, 1, 1]
+    assert aligner.source_names == ['ap', 'mcu', 'kernel']
+
+
+def test_merge_reorder_window(aligner):
+    """源内乱序不超过重排缓冲区的日志被纠正；缓冲区为0时保持源内顺序"""
+    offsets = [0, 300, 100, 200, 400, 350]
+
+    merged = aligner.merge_and_sort({'ap': make_source('ap', offsets)}, reorder_window=4)
+    assert [entry.line_number for entry in merged] == [1, 3, 4, 2, 6, 5]
+
+    merged = aligner.merge_and_sort({'ap': make_source('ap', offsets)}, reorder_window=0)
+    assert [entry.line_number for entry in merged] == [1, 2, 3, 4, 5, 6]
+
+    # 缓冲区小于乱序的行数时只能部分纠正
+    offsets = [0, 300, 200, 100]
+    merged = aligner.merge_and_sort({'ap': make_source('ap', offsets)}, reorder_window=1)
+    assert [entry.line_number for entry in merged] == [1, 3, 4, 2]
+    merged = aligner.merge_and_sort({'ap': make_source('ap', offsets)}, reorder_window=2)
+    assert [entry.line_number for entry in merged] == [1, 4, 3, 2]
+
+
+def test_merge_keeps_untimed_entries_after_their_predecessor(aligner):
+    """没有时间的日志紧跟同一源中的前一条日志输出"""
+    sources = {
+        'ap': make_source('ap', [0, 200, None, None, 400]),
+        'mcu': make_source('mcu', [100, 200, 300]),
+    }
+    merged = aligner.merge_and_sort(sources)
+
+    assert [(entry.tag, entry.line_number) for entry in merged] == [
+        ('ap', 1), ('mcu', 1), ('ap', 2), ('ap', 3), ('ap', 4), ('mcu', 2), ('mcu', 3), ('ap', 5),
+    ]
+
+
+def test_merge_is_streaming(aligner):
+    """输入可以是迭代器，只按需从各源读取"""
+    consumed = []
+
+    def source(name, offsets_ms):
+        for entry in make_source(name, offsets_ms):
+            consumed.append((name, entry.line_number))
+            yield entry
+
+    merged = aligner.iter_merged({
+        'ap': source('ap', range(0, 100000, 10)),
+        'mcu': source('mcu', range(5, 100000, 10)),
+    }, reorder_window=8)
+    first = [next(merged) for _ in range(4)]
+
+    assert [(entry.tag, entry.line_number) for entry in first] == [('ap', 1), ('mcu', 1), ('ap', 2), ('mcu', 2)]
+    assert len(consumed) < 40
+
+
+def event_times_ms(seed: int):
+    """一分钟内的事件时间（毫秒）：稀疏的背景日志加上几次随机的日志风暴"""
+    rng = np.random.default_rng(seed)
+    background = rng.uniform(0, 60000, 300)
+    bursts = [rng.normal(center, 150, 80) for center in rng.uniform(5000, 55000, 6)]
+    return np.sort(np.concatenate([background, *bursts])).astype(np.int64)
+
+
+def make_batch(offsets_ms) -> LogBatch:
+    batch = LogBatch()
+    base_ms = datetime_to_epoch_ms(BASE_TIME)
+    for line_number, offset_ms in enumerate(offsets_ms, start=1):
+        batch.append("", base_ms + int(offset_ms), 1234, 1256, 'I', "Tag", "message", "", line_number)
+    return batch
+
+
+@pytest.mark.parametrize("skew_ms", [2345, -7890, 120])
+@pytest.mark.parametrize("as_batch", [True, False])
+def test_estimate_offset_recovers_skew(aligner, skew_ms, as_batch):
+    """source的时钟比reference慢skew_ms时，估计出的偏移为+skew_ms（误差不超过一个分箱）"""
+    events = event_times_ms(seed=7)
+    rng = np.random.default_rng(11)
+    # source只记录了部分事件，并有少量自己的日志
+    source_events = np.sort(np.concatenate([rng.choice(events, len(events) * 2 // 3, replace=False),
+                                            rng.uniform(0, 60000, 50).astype(np.int64)])) - skew_ms
+    make = make_batch if as_batch else (lambda offsets: make_source('src', offsets.tolist()))
+
+    offset = aligner.estimate_offset(make(events), make(source_events))
+
+    error_ms = abs(offset / timedelta(milliseconds=1) - skew_ms)
+    assert error_ms <= TimeAligner.DEFAULT_BIN_MS
+    assert error_ms < 1000
+
+
+def test_estimate_offset_respects_max_offset(aligner):
+    """超出max_offset_ms的时延不参与比较"""
+    events = event_times_ms(seed=3)
+    assert aligner.estimate_offset(make_batch(events), make_batch(events - 5000), max_offset_ms=1000) != \
+        timedelta(milliseconds=5000)
+    assert aligner.estimate_offset(make_batch(events), make_batch(events - 5000), max_offset_ms=6000) == \
+        timedelta(milliseconds=5000)
+
+
+def test_estimate_offset_without_events(aligner):
+    """没有可用的日志或事件频率没有起伏时返回None"""
+    assert aligner.estimate_offset(make_batch([]), make_batch([0, 100])) is None
+    assert aligner.estimate_offset(make_batch([0, 100]), make_batch([50, 150])) is None
+
+
+def test_apply_offset_list_matches_batch(aligner):
+    """日志条目列表与LogBatch平移后的时间、时间戳字符串和去重的最后时间一致"""
+    offsets = [0, 999, 1000, 61500, None]
+    entries = make_source('ap', offsets)
+    entries[1].last_epoch_ms = entries[1].epoch_ms + 500
+    batch = LogBatch.from_entries(entries)
+    offset = timedelta(seconds=-3, milliseconds=250)
+
+    aligner.apply_offset(entries, offset)
+    aligner.apply_offset(batch, offset)
+
+    assert [(entry.timestamp, entry.epoch_ms, entry.last_epoch_ms) for entry in entries] == \
+        [(entry.timestamp, entry.epoch_ms, entry.last_epoch_ms) for entry in batch]
+    assert entries[0].timestamp == "11-26 13:59:57.250"
+    assert entries[1].last_epoch_ms == datetime_to_epoch_ms(BASE_TIME) + 999 + 500 - 2750
+    assert entries[-1].epoch_ms == NO_EPOCH